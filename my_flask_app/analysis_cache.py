@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+# gpt-4o 이미지 분석 결과 디스크 캐시
+# - 키: sha256(디코딩된 이미지 바이트) + 프롬프트 버전
+# - 값: LLM이 반환한 속성 JSON 문자열
+# - 프롬프트 문구가 바뀌면 버전이 달라지므로 이전 결과는 자동으로 적중하지 않음
+# - ◀◀ [신규] S3 키 기록 (s3_objects): S3 키 -> (내용 해시, 마지막 DB 동기화 때의 ETag, 변경 표시)
+#   크롤러(사진 업로드 / Trigger 1)와 update_db_from_s3가 같은 기록을 보므로,
+#   해시를 아는 키는 S3에서 다시 받지 않고 분석 결과를 꺼내 쓰고, 내용이 바뀐 키만 다시 분석함
+#   - changed = 1: 마지막 DB 동기화 이후 내용이 바뀐 키 (크롤러가 새로 업로드 / 다른 해시가 기록됨)
+#   - etag가 빈 기록은 "아직 ETag를 모름"일 뿐 변경이 아님 → 다음 DB 갱신 때 S3 목록의 ETag를 그대로 채택
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_MAX_ENTRIES = 100000
+
+def hash_image_bytes(image_bytes):
+    return hashlib.sha256(image_bytes).hexdigest()
+
+def make_prompt_version(*parts):
+    """
+    프롬프트 문구(및 모델명 등)로부터 짧은 버전 문자열을 만듭니다.
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()[:16]
+
+class AnalysisCache:
+    """
+    이미지 내용 해시 -> 분석 결과(JSON 문자열) LRU 디스크 캐시.
+    """
+
+    def __init__(self, db_path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS analyses (
+                image_hash TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                result_json TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (image_hash, prompt_version)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_last_access ON analyses(last_access)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS s3_objects (
+                s3_key TEXT PRIMARY KEY,
+                image_hash TEXT,
+                etag TEXT,
+                changed INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )
+        """)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(s3_objects)")]
+        if "changed" not in columns: # ◀ changed 열이 없던 기존 캐시 파일
+            conn.execute("ALTER TABLE s3_objects ADD COLUMN changed INTEGER NOT NULL DEFAULT 0")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, image_hash, prompt_version):
+        """
+        저장된 분석 결과(JSON 문자열)를 반환합니다. 없으면 None.
+        """
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT result_json FROM analyses WHERE image_hash = ? AND prompt_version = ?",
+            (image_hash, prompt_version)
+        ).fetchone()
+
+        with self._stats_lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if not row:
+            return None
+
+        try:
+            conn.execute("UPDATE analyses SET last_access = ? WHERE image_hash = ? AND prompt_version = ?",
+                         (time.time(), image_hash, prompt_version))
+            conn.commit()
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ [분석 캐시] 최근 사용 시각 갱신 실패: {e}")
+        return row[0]
+
+    def put(self, image_hash, prompt_version, result_json):
+        now = time.time()
+        conn = self._conn()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO analyses (image_hash, prompt_version, result_json, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (image_hash, prompt_version, result_json, now, now)
+            )
+            conn.commit()
+            self._evict_if_needed(conn)
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ [분석 캐시] 저장 실패 (캐시 없이 계속 진행): {e}")
+
+    def _evict_if_needed(self, conn):
+        count = conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        to_delete = count - int(self.max_entries * 0.9)
+        conn.execute("""
+            DELETE FROM analyses WHERE rowid IN (
+                SELECT rowid FROM analyses ORDER BY last_access ASC LIMIT ?
+            )
+        """, (to_delete,))
+        conn.commit()
+        print(f"🧹 [분석 캐시] 오래된 항목 {to_delete}개 삭제 (상한 {self.max_entries}개)")
+
+    def invalidate(self, keep_prompt_version=None):
+        """
+        캐시를 비웁니다.
+        keep_prompt_version을 주면 해당 버전(현재 프롬프트)의 결과만 남기고 나머지를 삭제합니다.
+        삭제된 항목 수를 반환합니다.
+        """
+        conn = self._conn()
+        if keep_prompt_version is None:
+            cur = conn.execute("DELETE FROM analyses")
+        else:
+            cur = conn.execute("DELETE FROM analyses WHERE prompt_version != ?", (keep_prompt_version,))
+        conn.commit()
+        return cur.rowcount
+
+    def get_object(self, s3_key):
+        """
+        S3 키 기록 {"image_hash", "etag", "changed"}를 반환합니다. 없으면 None.
+        """
+        row = self._conn().execute("SELECT image_hash, etag, changed FROM s3_objects WHERE s3_key = ?",
+                                   (s3_key,)).fetchone()
+        return {"image_hash": row[0], "etag": row[1], "changed": bool(row[2])} if row else None
+
+    def _write_object(self, s3_key, image_hash, etag, changed):
+        conn = self._conn()
+        try:
+            conn.execute("INSERT OR REPLACE INTO s3_objects (s3_key, image_hash, etag, changed, updated_at) VALUES (?, ?, ?, ?, ?)",
+                         (s3_key, image_hash, etag, int(changed), time.time()))
+            conn.commit()
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ [분석 캐시] S3 키 기록 저장 실패: {e}")
+
+    def record_object(self, s3_key, image_hash, changed=None):
+        """
+        S3 키의 내용 해시를 기록합니다.
+        changed: True = 내용이 바뀜(새로 업로드), False = 그대로(304 / 같은 내용 확인),
+                 None = 모름 → 이전에 기록된 해시와 다를 때만 바뀐 것으로 봄
+        바뀌면 ETag를 비우고 변경 표시 (다음 DB 갱신 때 다시 처리), 그대로면 기존 ETag / 변경 표시를 유지합니다.
+        """
+        old = self.get_object(s3_key)
+        if changed is None:
+            changed = old is not None and old["image_hash"] is not None and old["image_hash"] != image_hash
+        if changed:
+            self._write_object(s3_key, image_hash, None, True)
+        elif old is None:
+            self._write_object(s3_key, image_hash, None, False)
+        else:
+            self._write_object(s3_key, image_hash, old["etag"], old["changed"])
+
+    def mark_object_synced(self, s3_key, etag, image_hash=None):
+        """
+        S3 키가 ETag etag인 내용으로 DB에 반영되었음을 기록합니다. (변경 표시 해제, image_hash를 안 주면 기존 해시 유지)
+        """
+        if image_hash is None:
+            old = self.get_object(s3_key)
+            image_hash = old["image_hash"] if old else None
+        self._write_object(s3_key, image_hash, etag, False)
+
+    def object_changed(self, s3_key, etag):
+        """
+        마지막 DB 동기화 이후 s3_key의 내용이 바뀌었으면 True. (etag: 지금 S3 목록의 ETag)
+        - 기록이 없거나 ETag를 아직 모르는 키(변경 표시 없음)는 바뀌지 않은 것으로 보고 지금 ETag를 채택
+        - 변경 표시가 있거나 기록된 ETag와 다르면(S3에서 직접 교체 등) True
+        """
+        old = self.get_object(s3_key)
+        if old is not None and old["changed"]:
+            return True
+        if old is None or old["etag"] is None:
+            self.mark_object_synced(s3_key, etag)
+            return False
+        return old["etag"] != etag
+
+    def stats(self):
+        with self._stats_lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+    def entry_count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
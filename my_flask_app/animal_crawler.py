@@ -2,7 +2,6 @@ import pymysql.cursors
 import requests
 from bs4 import BeautifulSoup as bs
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor
 import csv
 from datetime import datetime
 from datetime import date 
@@ -11,12 +10,16 @@ import sys
 import math
 import boto3
 import os
-from io import BytesIO
 import llm_animal
+import search_snapshot
+import db_pool
 import faiss
 import numpy as np
 import json
-import base64
+import asyncio
+import crawl_engine
+import crawl_state
+import photo_sync
 
 try:
     with open('./API-Key.txt','r') as f:
@@ -41,6 +44,8 @@ DB_CONFIG = {
     "charset": "utf8mb4",
     "cursorclass": pymysql.cursors.DictCursor
 }
+# ◀◀ [신규] MySQL 커넥션 풀 (Trigger 1 알림 INSERT가 여러 스레드에서 동시에 일어나므로 연결을 재사용)
+g_db_pool = db_pool.ConnectionPool(DB_CONFIG, max_size=4, name="crawler")
 
 CRAWL_URL = "https://www.kcanimal.or.kr/board_gallery01/board_list.asp"
 BASE_DOMAIN = "https://www.kcanimal.or.kr" 
@@ -56,6 +61,20 @@ UNIQUE_KEY_COLUMNS = ["BOARD_IDX"]
 UNIQUE_KEY_NAME = "unique_animal_record_v9_idx" # 키 이름 변경
 ITEMS_PER_PAGE = 12 
 
+# ◀◀ [신규] 크롤링 엔진 설정 (목록 / 상세 / 사진 요청 전체에 적용)
+CRAWL_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+CRAWL_CONCURRENCY = 8      # ◀ 전체 동시 요청 수 (기존 중첩 스레드 풀은 최대 25개)
+CRAWL_PER_HOST = 4         # ◀ kcanimal.or.kr 한 곳에 동시에 보내는 요청 수
+CRAWL_HOST_INTERVAL = 0.1  # ◀ (초) 같은 호스트에 요청을 시작하는 최소 간격
+
+# ◀◀ [신규] 증분 크롤링: 아는 공고(BOARD_IDX + 목록 내용 지문)는 상세 / 사진 요청을 생략하고,
+#    최신 페이지부터 순회하다 새로 / 바뀐 공고가 없는 페이지를 만나면 중단
+CRAWL_STATE_FILE = "./cache/crawl_state.json"
+CRAWL_FULL_SWEEP_INTERVAL = 24 * 3600 # ◀ (초) 이 간격마다 전체 페이지를 순회하여 사라진 공고를 삭제
+DETAIL_ERRORS = ("상세 요청 오류", "상세 파싱 오류") # ◀ 일시적 실패 → 상태에 기록하지 않고 다음 실행에 다시 시도
+PHOTO_MANIFEST_FILE = "./cache/photo_manifest.json" # ◀ S3 키별 원본 URL / ETag / 내용 해시 (바뀐 사진만 다시 올림)
+PHOTO_BYTES_CACHE_MB = 64 # ◀ Trigger 1에 넘겨줄 대표 사진(PHOTO1) 바이트를 보관할 메모리 상한
+
 try:
     NCP_CONFIG = {
         "endpoint_url": "https://kr.object.ncloudstorage.com",
@@ -78,20 +97,12 @@ except Exception as e:
     sys.exit()
 
 print("--- [Trigger 1] 알림 서비스를 위해 '실종동물 DB' 로드 시작 ---")
-g_missing_index = None
-g_missing_db_full = None
+g_missing_snapshot = None # ◀◀ [수정] 인덱스 + 저장소를 한 묶음(스냅샷)으로 로드 (둘이 어긋나면 로드 실패 처리)
 try:
-    MISSING_INDEX_FILE = "missing_vectors.index"
-    MISSING_MAP_FILE = "missing_map.json"
-    MISSING_DB_FILE = "missing_pets.json"
-    
-    print(f"'{MISSING_INDEX_FILE}' (실종DB) 로드 중...")
-    g_missing_index = faiss.read_index(MISSING_INDEX_FILE)
+    print(f"'{llm_animal.MISSING_INDEX_FILE}', '{llm_animal.MISSING_DB_FILE}' (실종DB) 로드 중...")
     # (맵 파일은 크롤러에서는 필요 없으므로 로드 안 함)
-    print(f"'{MISSING_DB_FILE}' (실종DB 원본) 로드 중...")
-    with open(MISSING_DB_FILE,"r",encoding="utf-8") as f:
-        g_missing_db_full = json.load(f)
-    print(f"✅ [Trigger 1] 실종DB 로드 완료 (총 {len(g_missing_db_full)}개 항목)")
+    g_missing_snapshot = search_snapshot.load_snapshot("missing", llm_animal.MISSING_INDEX_FILE, llm_animal.MISSING_DB_FILE)
+    print(f"✅ [Trigger 1] 실종DB 로드 완료 (총 {len(g_missing_snapshot.store)}개 항목)")
 except Exception as e:
     print(f"⚠️ [Trigger 1] 실종DB 파일 로드 실패. 알림 서비스(Trigger 1)가 비활성화됩니다: {e}")
     # (실패해도 크롤링은 계속되어야 하므로 sys.exit() 안 함)
@@ -102,22 +113,15 @@ except Exception as e:
 
 def create_notification_signal(user_num, message, noti_type="IMMEDIATE"):
 
-    conn = None
-    curs = None
     try:
-        conn = pymysql.connect(**DB_CONFIG)
-        curs = conn.cursor()
-        sql = "INSERT INTO NOTIFICATIONS (user_num, message, status, type) VALUES (%s, %s, 'pending', %s)"
-        curs.execute(sql, (user_num, message, noti_type))
-        conn.commit()
-        print(f"  [🔔 알림 신호 생성 (Trigger 1)] User {user_num}에게 '{message[:20]}...' 전송 예약")
-        print(f"  [🔔 DB 저장] User {user_num}에게 '{noti_type}' 알림 저장 완료")
+        with g_db_pool.connection() as conn, conn.cursor() as curs: # ◀ 풀에서 빌리고, 끝나면(예외 시 rollback 후) 반납
+            sql = "INSERT INTO NOTIFICATIONS (user_num, message, status, type) VALUES (%s, %s, 'pending', %s)"
+            curs.execute(sql, (user_num, message, noti_type))
+            conn.commit()
+            print(f"  [🔔 알림 신호 생성 (Trigger 1)] User {user_num}에게 '{message[:20]}...' 전송 예약")
+            print(f"  [🔔 DB 저장] User {user_num}에게 '{noti_type}' 알림 저장 완료")
     except Exception as e:
         print(f"  [❌ 알림 신호 실패 (Trigger 1)] User {user_num} DB INSERT 실패: {e}")
-        if conn: conn.rollback()
-    finally:
-        if curs: curs.close()
-        if conn: conn.close()
 
 def parse_date(date_str):
     date_str = date_str.strip().replace('.', '-').replace('/', '-')
@@ -141,7 +145,12 @@ def parse_age(age_str):
     return cleaned_age_str
 
 # ◀◀ [신규 추가] S3 업로드 헬퍼 함수
-def upload_image_to_s3(image_url, board_idx, image_index):
+# ◀◀ [수정] 다운로드는 크롤링 엔진(연결 재사용 / 재시도)으로, S3 업로드(boto3)는 스레드에서 실행
+# ◀◀ [수정] 사진 동기화(photo_sync)를 거쳐, 바뀌지 않은 사진은 다시 받거나(304) 올리지 않음
+g_photo_sync = None # ◀ 크롤링 작업마다 job_crawl_and_save에서 생성
+g_photo_bytes = None # ◀ (Trigger 1 활성화 시) 방금 받은 PHOTO1 바이트 → check_trigger1이 S3 대신 사용
+
+async def upload_image_to_s3(engine, image_url, board_idx, image_index):
     """
     원본 이미지 URL을 다운로드하여 S3에 업로드하고, S3 Key(경로)를 반환합니다.
     """
@@ -149,50 +158,43 @@ def upload_image_to_s3(image_url, board_idx, image_index):
         return None
         
     try:
-        # 1. 원본 이미지 다운로드
-        img_response = requests.get(image_url, timeout=10)
-        img_response.raise_for_status()
-        img_data = BytesIO(img_response.content) # ◀ 메모리에 이미지 저장
-        
-        # 2. S3 키 생성 (예: crawled_data/38576/image_1.jpg)
+        # 1. S3 키 생성 (예: crawled_data/38576/image_1.jpg)
         # (파일 확장자를 원본 URL에서 가져오거나, .jpg로 고정)
         file_ext = os.path.splitext(image_url.split('?')[0])[-1] or '.jpg'
         s3_key = f"{S3_CRAWL_DIR}/{board_idx}/image_{image_index}{file_ext}"
         
-        # 3. S3에 업로드 (ACL='public-read'로 설정해야 <img> 태그에서 보임)
-        s3_client.upload_fileobj(
-            img_data,
-            S3_BUCKET_NAME,
-            s3_key,
-            ExtraArgs={'ACL': 'public-read'} # ◀ (중요) 이미지를 공개로 설정
-        )
+        # 2. 원본 이미지 다운로드 (조건부 GET) → 내용이 바뀐 경우에만 S3에 업로드
+        status, image_bytes = await g_photo_sync.sync(engine, image_url, s3_key)
+        # ◀ S3 키 -> 내용 해시 기록 (Trigger 1 / AI 데이터 갱신이 같은 분석 결과를 재사용, 바뀐 사진만 다시 분석)
+        #   업로드하지 않은 사진(304 / 같은 내용)은 '그대로'로 기록 → 기존 DB 행을 계속 재사용
+        llm_animal.record_s3_object(s3_key, g_photo_sync.manifest[s3_key]["sha256"],
+                                    changed=status == photo_sync.UPLOADED)
+        if image_index == 1 and image_bytes is not None and g_photo_bytes is not None:
+            g_photo_bytes.put(s3_key, image_bytes) # ◀ Trigger 1이 S3에서 다시 받지 않도록 보관
         
-        # 4. (중요) DB에 저장할 최종 URL이 아닌, "S3 Key"만 반환
+        # 3. (중요) DB에 저장할 최종 URL이 아닌, "S3 Key"만 반환
         # (React에서는 S3_BUCKET_BASE_URL + s3_key로 조합해서 사용)
         return s3_key 
         
-    except requests.exceptions.RequestException:
-        print(f"  [Fail] S3 업로드 실패 (이미지 다운로드 오류): {image_url}")
+    except crawl_engine.CrawlError:
+        print(f"  [Fail] S3 업로드 실패 (이미지 다운로드 오류): {image_url}")
         return None
     except Exception as e:
-        print(f"  [Fail] S3 업로드 실패 (Boto3 오류): {e}")
+        print(f"  [Fail] S3 업로드 실패 (Boto3 오류): {e}")
         return None
 
 # ====================================================================
 # 3. 상세 페이지 크롤링 함수 (사진 URL 추출 로직 재강화)
 # ====================================================================
-def fetch_detail_info(board_idx):
+async def fetch_detail_info(engine, board_idx):
     if not board_idx or not str(board_idx).isdigit():
-        return "미상", "미상", "board_idx 오류", None, None, None
+        return "미상", "미상", "board_idx 오류", None, None, None, False
         
     detail_url = f"{BASE_DOMAIN}/board_gallery01/board_content.asp?board_idx={board_idx}&tname=board_gallery01"
     
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        response = requests.get(detail_url, timeout=10, headers=headers)
-        response.encoding = 'euc-kr' 
-        response.raise_for_status()
-        soup = bs(response.text, 'html.parser')
+        html = await engine.fetch_text(detail_url, kind="detail", encoding='euc-kr')
+        soup = bs(html, 'html.parser')
 
         # 축종/품종 추출
         species_th = soup.find("th", string="축종")
@@ -229,10 +231,12 @@ def fetch_detail_info(board_idx):
                 if len(photo_urls) >= 3: break
             if len(photo_urls) >= 3: break
 
-        # 추출된 원본 URL을 S3에 업로드하고, S3 Key로 교체
-        s3_key_1 = upload_image_to_s3(photo_urls[0] if len(photo_urls) > 0 else None, board_idx, 1)
-        s3_key_2 = upload_image_to_s3(photo_urls[1] if len(photo_urls) > 1 else None, board_idx, 2)
-        s3_key_3 = upload_image_to_s3(photo_urls[2] if len(photo_urls) > 2 else None, board_idx, 3)
+        # 추출된 원본 URL을 S3에 업로드하고, S3 Key로 교체 (사진 3장은 동시에)
+        photo_urls += [None] * (3 - len(photo_urls))
+        s3_key_1, s3_key_2, s3_key_3 = await asyncio.gather(
+            *(upload_image_to_s3(engine, url, board_idx, i + 1) for i, url in enumerate(photo_urls)))
+        # ◀ 사진 URL은 있는데 S3 키를 못 얻은 경우 (다운로드 / 업로드 실패) → 증분 상태에 기록하지 않고 다음 실행에서 재시도
+        photos_failed = any(url and not key for url, key in zip(photo_urls, (s3_key_1, s3_key_2, s3_key_3)))
 
         # 특징 및 특이사항 추출 -> Feature로 통합
         features = []
@@ -248,26 +252,23 @@ def fetch_detail_info(board_idx):
                 
         final_feature_detail = ", ".join(features)
         
-        return species, breed, final_feature_detail, s3_key_1, s3_key_2, s3_key_3
+        return species, breed, final_feature_detail, s3_key_1, s3_key_2, s3_key_3, photos_failed
 
-    except requests.exceptions.RequestException:
-        print(f"  [Fail] 상세 요청 실패: {detail_url} (네트워크/서버 오류)")
-        return "미상", "미상", "상세 요청 오류", None, None, None 
+    except crawl_engine.CrawlError:
+        print(f"  [Fail] 상세 요청 실패: {detail_url} (네트워크/서버 오류)")
+        return "미상", "미상", "상세 요청 오류", None, None, None, False
     except Exception as e:
-        print(f"  [Fail] 파싱 실패: {detail_url} ({e})")
-        return "미상", "미상", "상세 파싱 오류", None, None, None
+        print(f"  [Fail] 파싱 실패: {detail_url} ({e})")
+        return "미상", "미상", "상세 파싱 오류", None, None, None, False
 
 # ====================================================================
 # 4. 동적 페이지 수 추출 및 목록 크롤링 함수 
 # ====================================================================
-def get_total_pages(url):
+async def get_total_pages(engine, url):
     """총 게시물 수를 파싱하여 총 페이지를 계산합니다. (파싱 안정성 강화)"""
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        response = requests.get(url, timeout=10, headers=headers)
-        response.encoding = 'euc-kr' 
-        response.raise_for_status()
-        soup = bs(response.text, 'html.parser')
+        html = await engine.fetch_text(url, kind="list", encoding='euc-kr')
+        soup = bs(html, 'html.parser')
         
         # 총 게시물 수 선택자 강화
         total_count_element = soup.select_one("td.list_total strong")
@@ -291,108 +292,268 @@ def get_total_pages(url):
         else:
             total_pages = math.ceil(total_items / ITEMS_PER_PAGE)
         
-        print(f"    [DEBUG] 웹사이트 총 게시물 수: {total_items}개, 페이지당 항목 수: {ITEMS_PER_PAGE}개")
-        print(f"    [DEBUG] 계산된 총 페이지 수: {total_pages}개")
+        print(f"    [DEBUG] 웹사이트 총 게시물 수: {total_items}개, 페이지당 항목 수: {ITEMS_PER_PAGE}개")
+        print(f"    [DEBUG] 계산된 총 페이지 수: {total_pages}개")
         
         return total_pages
 
-    except requests.exceptions.RequestException:
-        print(f"  [Error] 총 페이지 수 요청 오류. 1페이지로 설정합니다.")
+    except crawl_engine.CrawlError:
+        print(f"  [Error] 총 페이지 수 요청 오류. 1페이지로 설정합니다.")
         return 1
     except Exception as e:
-        print(f"  [Error] 페이지 수 파싱 오류: {e}. 1페이지로 설정합니다.")
+        print(f"  [Error] 페이지 수 파싱 오류: {e}. 1페이지로 설정합니다.")
         return 1
 
 
-def fetch_data(url):
+async def process_item(engine, item, state=None):
+    """목록 항목 1개를 파싱하고 상세 페이지 정보를 더해 DB 행(튜플)을 만듭니다.
+    반환값: (DB 행 또는 None(저장 대상 아님), 이번에 상세 페이지를 새로 받았는지)
+    state가 있으면 아는 공고 + 목록 내용이 그대로인 경우 상세 / 사진 요청 없이 마지막으로 저장한 행을 반환합니다."""
+    board_idx = "N/A"
+    try:
+        link = item.select_one('a')
+        if not link or not link.get('href'): return None, False
+        
+        # 상세 URL에서 board_idx 추출
+        detail_href = link['href']
+        match_idx = re.search(r'board_idx=(\d+)', detail_href)
+        if not match_idx: return None, False 
+        board_idx = match_idx.group(1) 
+        
+        # CRAWL_URL에 저장할 상세 URL을 생성
+        detail_url_to_save = f"{BASE_DOMAIN}/board_gallery01/board_content.asp?board_idx={board_idx}&tname=board_gallery01"
+        
+        # 목록에서 기본 정보 추출
+        p_text_el = item.select_one("div p")
+        if not p_text_el: return None, False
+        p_text = p_text_el.text.strip()
+        
+        match_name = re.match(r'(.+?)\s*\(\d{2}-\d+\)', p_text)
+        # 💡 [수정된 부분] 이름이 없으면 "(이름없음)"으로 설정하고 항목을 버리지 않습니다.
+        name = match_name.group(1).strip() if match_name and match_name.group(1).strip() else "(이름없음)"
+        
+        # 💡 이름이 "(이름없음)"인 경우에도 항목을 버리지 않도록 해당 `if` 구문을 제거했습니다.
+
+        feature_status = p_text.split(')')[-1].strip()
+        
+        span_text_el = item.select_one("div span")
+        if not span_text_el: return None, False
+        span_text = span_text_el.text.strip().split('|')
+
+        # ◀◀ [신규] 목록 내용이 지난 실행과 같으면 상세 페이지 / 사진은 다시 받지 않음
+        fingerprint = crawl_state.fingerprint(detail_href, p_text, span_text_el.text)
+        if state is not None and state.is_unchanged(board_idx, fingerprint):
+            return state.known_row(board_idx), False
+
+        rescue_loc = span_text[0].strip() if len(span_text) > 0 else "미상"
+        rescue_date_str = span_text[1].strip() if len(span_text) > 1 else "미상"
+        age_str = span_text[2].strip() if len(span_text) > 2 else "0살"
+        gender = span_text[3].strip() if len(span_text) > 3 else "미상"
+        weight = span_text[4].strip() if len(span_text) > 4 else "0kg"
+        
+        # 상세 페이지에서 데이터 추출
+        species, breed, feature_detail, photo1, photo2, photo3, photos_failed = await fetch_detail_info(engine, board_idx) 
+        if feature_detail in DETAIL_ERRORS:
+            return None, True
+        
+        # 필수 데이터 유효성 재확인 (이름 제외)
+        # 축종, 구조일, 품종 정보는 반드시 있어야 DB에 저장합니다.
+        if species == "미상" or rescue_date_str == "미상" or breed == "미상":
+            if state is not None: state.record(board_idx, fingerprint, None) # ◀ 다음 실행에서 다시 받지 않도록 기록
+            return None, True 
+
+        rescue_date = parse_date(rescue_date_str)
+        age = parse_age(age_str)
+        feature = f"상태:{feature_status}, 무게:{weight}, 상세특징:[{feature_detail}]"
+        
+        # 최종 데이터 리턴 (이름이 없어도 저장됨)
+        row = (board_idx, name, species, breed, gender, feature, photo1, photo2, photo3, 
+               rescue_date, rescue_loc, age, detail_url_to_save)
+        if photos_failed:
+            print(f"    [Retry] 사진 동기화 실패, 다음 실행에서 다시 받음 (idx:{board_idx})")
+        elif state is not None:
+            state.record(board_idx, fingerprint, row)
+        return row, True
+                
+    except Exception as item_e:
+        # print(f"    [Fail] 목록 항목 파싱 실패 (idx:{board_idx}): {item_e}")
+        return None, False
+
+async def fetch_data(engine, url, state=None):
     """지정된 URL에서 동물 데이터를 크롤링하고 상세 페이지 정보를 추가합니다. 
-    반환 값에 board_idx와 상세 페이지 URL을 포함합니다."""
+    반환 값에 board_idx와 상세 페이지 URL을 포함합니다.
+    반환값: {"rows": 저장할 행 전체, "fresh": 그중 상세 페이지를 새로 받은 행, "items": 목록 항목 수, "changed": 새로 / 바뀐 항목 수}"""
+    page_result = {"rows": [], "fresh": [], "items": 0, "changed": 0}
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        response = requests.get(url, timeout=10, headers=headers)
-        response.encoding = 'euc-kr' 
-        response.raise_for_status()
-        soup = bs(response.text, 'html.parser')
+        html = await engine.fetch_text(url, kind="list", encoding='euc-kr')
+        soup = bs(html, 'html.parser')
 
         # 목록 항목 선택자 대폭 강화 
         items = soup.select("ul.list_gallery_ul > li, #goodsBox > ul > li, .board_list_gallery > ul > li") 
             
-        print(f"    [DEBUG] URL: {url} | 발견된 항목 수: {len(items)}개")
-        
-        data = []
-        
-        current_page_url = url # 목록 페이지 URL (사용하지 않음)
-        
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            def process_item(item):
-                board_idx = "N/A"
-                try:
-                    link = item.select_one('a')
-                    if not link or not link.get('href'): return None
-                    
-                    # 상세 URL에서 board_idx 추출
-                    detail_href = link['href']
-                    match_idx = re.search(r'board_idx=(\d+)', detail_href)
-                    if not match_idx: return None 
-                    board_idx = match_idx.group(1) 
-                    
-                    # CRAWL_URL에 저장할 상세 URL을 생성
-                    detail_url_to_save = f"{BASE_DOMAIN}/board_gallery01/board_content.asp?board_idx={board_idx}&tname=board_gallery01"
-                    
-                    # 목록에서 기본 정보 추출
-                    p_text_el = item.select_one("div p")
-                    if not p_text_el: return None
-                    p_text = p_text_el.text.strip()
-                    
-                    match_name = re.match(r'(.+?)\s*\(\d{2}-\d+\)', p_text)
-                    # 💡 [수정된 부분] 이름이 없으면 "(이름없음)"으로 설정하고 항목을 버리지 않습니다.
-                    name = match_name.group(1).strip() if match_name and match_name.group(1).strip() else "(이름없음)"
-                    
-                    # 💡 이름이 "(이름없음)"인 경우에도 항목을 버리지 않도록 해당 `if` 구문을 제거했습니다.
-
-                    feature_status = p_text.split(')')[-1].strip()
-                    
-                    span_text_el = item.select_one("div span")
-                    if not span_text_el: return None
-                    span_text = span_text_el.text.strip().split('|')
-
-                    rescue_loc = span_text[0].strip() if len(span_text) > 0 else "미상"
-                    rescue_date_str = span_text[1].strip() if len(span_text) > 1 else "미상"
-                    age_str = span_text[2].strip() if len(span_text) > 2 else "0살"
-                    gender = span_text[3].strip() if len(span_text) > 3 else "미상"
-                    weight = span_text[4].strip() if len(span_text) > 4 else "0kg"
-                    
-                    # 상세 페이지에서 데이터 추출
-                    species, breed, feature_detail, photo1, photo2, photo3 = fetch_detail_info(board_idx) 
-                    
-                    # 필수 데이터 유효성 재확인 (이름 제외)
-                    # 축종, 구조일, 품종 정보는 반드시 있어야 DB에 저장합니다.
-                    if species == "미상" or rescue_date_str == "미상" or breed == "미상":
-                        return None 
-
-                    rescue_date = parse_date(rescue_date_str)
-                    age = parse_age(age_str)
-                    feature = f"상태:{feature_status}, 무게:{weight}, 상세특징:[{feature_detail}]"
-                    
-                    # 최종 데이터 리턴 (이름이 없어도 저장됨)
-                    return (board_idx, name, species, breed, gender, feature, photo1, photo2, photo3, 
-                            rescue_date, rescue_loc, age, detail_url_to_save)
-                            
-                except Exception as item_e:
-                    # print(f"    [Fail] 목록 항목 파싱 실패 (idx:{board_idx}): {item_e}")
-                    return None
-
-            results = executor.map(process_item, items)
-            data = [result for result in results if result is not None]
-
-        return data
-        
-    except requests.exceptions.RequestException as e:
-        print(f"  [Error] 웹 요청 오류: {e}")
-        return []
+        print(f"    [DEBUG] URL: {url} | 발견된 항목 수: {len(items)}개")
+        
+        # ◀◀ [수정] 항목별 상세 요청은 스레드 풀 대신 코루틴으로 (동시 요청 수는 엔진이 전체에서 제한)
+        results = await asyncio.gather(*(process_item(engine, item, state) for item in items))
+        page_result["items"] = len(items)
+        for row, fresh in results:
+            page_result["changed"] += fresh
+            if row is not None:
+                page_result["rows"].append(row)
+                if fresh: page_result["fresh"].append(row)
+        return page_result
+        
+    except crawl_engine.CrawlError as e:
+        print(f"  [Error] 웹 요청 오류: {e}")
+        page_result["changed"] = 1 # ◀ 실패한 페이지에서 증분 순회를 멈추지 않도록
+        return page_result
     except Exception as e:
-        print(f"  [Error] 알 수 없는 오류: {e}")
-        return []
+        print(f"  [Error] 알 수 없는 오류: {e}")
+        page_result["changed"] = 1
+        return page_result
+
+def check_trigger1(result_list_per_page, alerted_owners_for_board):
+    """
+    (Trigger 1) 갓 크롤링된 페이지의 동물들을 '실종DB'와 비교하여 80% 이상 유사하면 주인에게 알림 신호를 만듭니다.
+    (LLM 호출이 있는 느린 작업이므로 crawl_pages에서 스레드로 실행 → 그동안 다른 페이지 크롤링은 계속됨)
+    """
+    print(f"  [Trigger 1] {len(result_list_per_page)}개 신규 데이터 AI 비교 시작...")
+    
+    # 갓 크롤링된 페이지의 동물들(result_list_per_page)을 하나씩 순회
+    for new_animal_tuple in result_list_per_page:
+        try:
+            # (참고: ANIMAL_COLUMNS 순서와 동일함)
+            # (board_idx, name, species, breed, gender, feature, 
+            #  photo1, photo2, photo3, rescue_date, ...)
+            board_idx = new_animal_tuple[0]
+            photo1_s3_key = new_animal_tuple[6] # ◀ 7번째 값 (PHOTO1 S3 Key)
+            
+            if not photo1_s3_key:
+                continue # ◀ 사진 없으면 비교 불가
+                
+            # 2-1. ◀ 크롤링 때 받은 사진 바이트를 그대로 사용
+            image_bytes = g_photo_bytes.pop(photo1_s3_key) if g_photo_bytes is not None else None
+
+            # 2-2. (느린 작업) ◀ LLM 분석으로 벡터 생성
+            # ◀◀ [수정] S3 키 단위 분석: 이미 분석한 사진(내용 해시 기준)은 LLM도 S3 다운로드도 없이 결과 재사용
+            #    (같은 결과를 이후 AI 데이터 갱신(update_db_from_s3)도 그대로 사용, 임베딩은 임베딩 캐시에서)
+            query_obj = llm_animal.analyze_s3_object(photo1_s3_key, image_bytes, s3=s3_client)
+            if not query_obj: continue
+            query_attr_emb = llm_animal.get_embeddings_for_attributes(query_obj)
+            if not (query_attr_emb and "__merged__" in query_attr_emb):
+                continue
+                
+            # 2-3. (빠른 작업) ◀ "실종 DB" 검색
+            query_merged_vector = query_attr_emb["__merged__"]
+            query_vector_np = np.array([query_merged_vector]).astype('float32')
+            faiss.normalize_L2(query_vector_np)
+            
+            query_species = query_obj.get("dog_or_cat_or_other")
+            candidate_indices = g_missing_snapshot.search(query_vector_np, query_species) # ◀ 같은 종 파티션만 검색
+            
+            # 2-4. 80% 이상 매칭 확인 (종이 같은 후보 전체를 한 번에 재정렬)
+            rows = llm_animal.filter_species_rows(candidate_indices, g_missing_snapshot.store, query_species)
+            scores = llm_animal.rerank_candidates(query_attr_emb, g_missing_snapshot.store, rows)
+
+            for idx, score in zip(rows, scores):
+                missing_item = g_missing_snapshot.store.item(idx)
+                score = float(score)
+
+                if score >= 0.80:
+                    owner_user_num = missing_item.get("attributes", {}).get("user_num")
+                    if not owner_user_num: continue
+                        
+                    # ◀ 중복 알림 방지
+                    if board_idx not in alerted_owners_for_board:
+                        alerted_owners_for_board[board_idx] = set()
+
+                    if owner_user_num not in alerted_owners_for_board[board_idx]:
+                        # 1. 파일명에서 '이름'만 예쁘게 추출하기
+                        full_path = missing_item.get('filename', '') # 예: abandon/missing/15_천사_1764...jpg
+                        pet_name = "반려동물" # 기본값
+                        try:
+                            # 경로 떼고 파일명만 (15_천사_1764...jpg)
+                            file_only = full_path.split('/')[-1]
+                            # 언더바(_)로 쪼개서 두 번째 덩어리(이름) 가져오기
+                            pet_name = file_only.split('_')[1]
+                        except:
+                            pass # 이름 파싱 실패 시 기본값 사용
+
+                        print(f"  [🔔 80% 매칭 (Trigger 1)] 신규(idx:{board_idx}) ↔ 실종({pet_name})")
+                        
+                        # 2. 메시지 포맷을 '제보' 때와 똑같이 맞춤 (오타 수정 포함)
+                        message = f"[이어주개] 회원님의 실종동물'{pet_name}'과(와) {score*100:.0f}% 유사한 동물이 광주광역시 동물보호센터에서 발견되었습니다!\n\n▶공고 확인하기:\nhttps://www.kcanimal.or.kr/board_gallery01/board_content.asp?board_idx={board_idx}&tname=board_gallery01"
+
+                        # 2-5. "신호" INSERT
+                        create_notification_signal(owner_user_num, message, noti_type="SCHEDULED")
+
+                        alerted_owners_for_board[board_idx].add(owner_user_num)
+                           
+        except Exception as e:
+            print(f"  [❌ Trigger 1 오류] 신규 데이터(tuple: {new_animal_tuple[0]}) 비교 중 실패: {e}")
+
+async def crawl_pages(trigger1_enabled, state=None, full_sweep=True):
+    """
+    ◀◀ [신규] 크롤링 스케줄러 (기존: 목록 5스레드 x 상세 5스레드 중첩 풀)
+    - 전체 순회(full_sweep): 엔진 1개로 목록 페이지 전체를 동시에 크롤링
+    - 증분: 최신 페이지부터 1장씩 순회하다 새로 / 바뀐 공고가 없는 페이지를 만나면 중단
+    새로 / 바뀐 공고가 있는 페이지부터 Trigger 1 비교를 스레드에서 실행합니다. (그동안 크롤링은 계속됨)
+    반환값: (저장할 행 리스트, 그중 상세 페이지를 새로 받은 행 리스트) (총 페이지 수를 알 수 없으면 None)
+    """
+    async with crawl_engine.CrawlEngine(max_concurrency=CRAWL_CONCURRENCY, per_host=CRAWL_PER_HOST,
+                                        host_interval=CRAWL_HOST_INTERVAL, headers=CRAWL_HEADERS) as engine:
+        total_pages = await get_total_pages(engine, CRAWL_URL)
+
+        if total_pages == 0:
+            print("[INFO] 총 페이지 수를 파악할 수 없으므로 크롤링을 중단합니다.")
+            return None
+        
+        urls = []
+        # 💡 페이지 제한을 total_pages로 변경하여 전체 크롤링 
+        max_pages_to_crawl = total_pages
+        
+        for page in range(1, max_pages_to_crawl + 1): 
+            if page == 1:
+                urls.append(CRAWL_URL) 
+            else:
+                urls.append(f"{CRAWL_URL}?page={page}")
+                
+        all_data = []
+        fresh_data = []
+        alerted_owners_for_board = {} # ◀ (신규) 중복 알림 방지용 (board_idx: {user_num, user_num})
+        trigger_task = None
+
+        async def handle_page(page_result):
+            nonlocal trigger_task
+            # 1. (원본) ◀ 크롤링 데이터를 all_data 리스트에 추가
+            all_data.extend(page_result["rows"]) 
+            fresh_data.extend(page_result["fresh"])
+            
+            # 2. (신규) ◀ Trigger 1 로직 (실종DB가 로드된 경우에만, 이번에 새로 받은 공고만 비교)
+            if trigger1_enabled and page_result["fresh"]:
+                if trigger_task is not None:
+                    await trigger_task # ◀ 비교는 한 번에 1페이지씩
+                trigger_task = asyncio.create_task(
+                    asyncio.to_thread(check_trigger1, page_result["fresh"], alerted_owners_for_board))
+
+        if full_sweep:
+            print(f"[INFO] 크롤링할 최종 URL 수: {len(urls)}개 (총 {total_pages}페이지 모두 시도)")
+            for page_task in asyncio.as_completed([fetch_data(engine, url, state) for url in urls]):
+                await handle_page(await page_task)
+        else:
+            print(f"[INFO] 증분 크롤링: 최신 페이지부터 순회 (최대 {total_pages}페이지)")
+            for page, url in enumerate(urls, start=1):
+                page_result = await fetch_data(engine, url, state)
+                await handle_page(page_result)
+                if page_result["items"] == 0 or page_result["changed"] == 0:
+                    print(f"[INFO] {page}페이지에 새로 / 바뀐 공고가 없어 순회를 중단합니다.")
+                    break
+
+        if trigger_task is not None:
+            await trigger_task
+
+    engine.print_stats()
+    return all_data, fresh_data
 
 # ====================================================================
 # 5. DB 및 스케줄러 함수 
@@ -401,42 +562,39 @@ def fetch_data(url):
 def initialize_db_schema():
     """DB에 연결하여 UPSERT를 위한 UNIQUE KEY가 존재하는지 확인하고 설정합니다."""
     print("🛠️ DB 초기화 (UNIQUE KEY 설정)를 시작합니다.")
-    conn = None
-    curs = None
     try:
-        conn = pymysql.connect(**DB_CONFIG)
-        curs = conn.cursor()
+        with g_db_pool.connection() as conn, conn.cursor() as curs: # ◀ 풀에서 빌리고, 끝나면(예외 시 rollback 후) 반납
         
-        key_columns_str = ', '.join(f'`{c}`' for c in UNIQUE_KEY_COLUMNS)
-        sql_add_unique_key = f"""
-        ALTER TABLE {DB_TABLE_NAME}
-        ADD UNIQUE KEY {UNIQUE_KEY_NAME} ({key_columns_str});
-        """
+            key_columns_str = ', '.join(f'`{c}`' for c in UNIQUE_KEY_COLUMNS)
+            sql_add_unique_key = f"""
+            ALTER TABLE {DB_TABLE_NAME}
+            ADD UNIQUE KEY {UNIQUE_KEY_NAME} ({key_columns_str});
+            """
         
-        # 기존 UNIQUE KEY 삭제 시도 (안정성 강화)
-        try:
-            print("  [DEBUG] 기존 UNIQUE KEY 삭제 시도...")
-            # 이전 버전의 키 삭제 시도
-            curs.execute(f"ALTER TABLE {DB_TABLE_NAME} DROP KEY unique_animal_num_id;")
-            curs.execute(f"ALTER TABLE {DB_TABLE_NAME} DROP KEY unique_animal_record;")
-            curs.execute(f"ALTER TABLE {DB_TABLE_NAME} DROP KEY unique_animal_record_no_breed;")
-            curs.execute(f"ALTER TABLE {DB_TABLE_NAME} DROP KEY unique_animal_record_v6;")
-            curs.execute(f"ALTER TABLE {DB_TABLE_NAME} DROP KEY unique_animal_record_test;")
-            # 현재 키도 혹시 모를 중복 대비 삭제 시도
-            curs.execute(f"ALTER TABLE {DB_TABLE_NAME} DROP KEY {UNIQUE_KEY_NAME};") 
+            # 기존 UNIQUE KEY 삭제 시도 (안정성 강화)
+            try:
+                print("  [DEBUG] 기존 UNIQUE KEY 삭제 시도...")
+                # 이전 버전의 키 삭제 시도
+                curs.execute(f"ALTER TABLE {DB_TABLE_NAME} DROP KEY unique_animal_num_id;")
+                curs.execute(f"ALTER TABLE {DB_TABLE_NAME} DROP KEY unique_animal_record;")
+                curs.execute(f"ALTER TABLE {DB_TABLE_NAME} DROP KEY unique_animal_record_no_breed;")
+                curs.execute(f"ALTER TABLE {DB_TABLE_NAME} DROP KEY unique_animal_record_v6;")
+                curs.execute(f"ALTER TABLE {DB_TABLE_NAME} DROP KEY unique_animal_record_test;")
+                # 현재 키도 혹시 모를 중복 대비 삭제 시도
+                curs.execute(f"ALTER TABLE {DB_TABLE_NAME} DROP KEY {UNIQUE_KEY_NAME};") 
+                conn.commit()
+                print("  [DEBUG] 이전 UNIQUE KEY 삭제 완료.")
+            except pymysql.err.ProgrammingError as e:
+                 if e.args[0] != 1091: # 1091: KEY가 존재하지 않음 오류는 무시
+                     print(f"  [DEBUG] 이전 KEY 삭제 실패: {e}")
+                 pass 
+            except Exception:
+                 pass 
+
+            # 새로운 UNIQUE KEY 설정
+            curs.execute(sql_add_unique_key)
             conn.commit()
-            print("  [DEBUG] 이전 UNIQUE KEY 삭제 완료.")
-        except pymysql.err.ProgrammingError as e:
-             if e.args[0] != 1091: # 1091: KEY가 존재하지 않음 오류는 무시
-                 print(f"  [DEBUG] 이전 KEY 삭제 실패: {e}")
-             pass 
-        except Exception:
-             pass 
-
-        # 새로운 UNIQUE KEY 설정
-        curs.execute(sql_add_unique_key)
-        conn.commit()
-        print(f"✅ UNIQUE KEY '{UNIQUE_KEY_NAME}' 설정 완료: ({key_columns_str})")
+            print(f"✅ UNIQUE KEY '{UNIQUE_KEY_NAME}' 설정 완료: ({key_columns_str})")
 
     except pymysql.err.ProgrammingError as e:
         if e.args[0] == 1061: 
@@ -451,142 +609,65 @@ def initialize_db_schema():
         print(f"❌ DB 연결/초기화 중 치명적인 오류 발생: {e}")
         
     finally:
-        if curs: curs.close()
-        if conn: conn.close()
-        print("✅ DB 연결 종료.")
+        print("✅ DB 연결 반납.")
 
 
-def job_crawl_and_save():
+def job_crawl_and_save(full_sweep=None):
+    """
+    full_sweep: True면 전체 순회 + 사라진 공고 삭제, False면 증분, None이면 상태 파일을 보고 자동 결정
+    """
     job_timestamp = datetime.now() 
     current_time = job_timestamp.strftime("%Y-%m-%d %H:%M:%S")
     print(f"\n=======================================================")
     print(f"🚀 스케줄링된 동물 데이터 크롤링 작업 시작: {current_time}")
     print(f"=======================================================")
 
-    total_pages = get_total_pages(CRAWL_URL)
+    # ◀◀ [신규] 사진 동기화 (ACL='public-read'로 설정해야 <img> 태그에서 보임)
+    global g_photo_sync, g_photo_bytes
+    g_photo_sync = photo_sync.PhotoSync(PHOTO_MANIFEST_FILE, s3_client, S3_BUCKET_NAME, extra_args={'ACL': 'public-read'})
 
-    if total_pages == 0:
-        print("[INFO] 총 페이지 수를 파악할 수 없으므로 크롤링을 중단합니다.")
-        return
-    
-    urls = []
-    # 💡 페이지 제한을 total_pages로 변경하여 전체 크롤링 
-    max_pages_to_crawl = total_pages
-    
-    for page in range(1, max_pages_to_crawl + 1): 
-        if page == 1:
-            urls.append(CRAWL_URL) 
-        else:
-            urls.append(f"{CRAWL_URL}?page={page}")
-            
-    print(f"[INFO] 크롤링할 최종 URL 수: {len(urls)}개 (총 {total_pages}페이지 모두 시도)")
-    
-    all_data = []
-    
-    global g_missing_index, g_missing_db_full, s3_client
+    # ◀◀ [신규] 증분 크롤링 상태 (마지막 전체 순회 후 CRAWL_FULL_SWEEP_INTERVAL이 지났으면 전체 순회)
+    state = crawl_state.CrawlState(CRAWL_STATE_FILE, date_columns=(ANIMAL_COLUMNS.index("RESCUE_DATE"),))
+    if full_sweep is None:
+        full_sweep = state.needs_full_sweep(CRAWL_FULL_SWEEP_INTERVAL)
+    print(f"[INFO] 크롤링 모드: {'전체 순회 (사라진 공고 삭제 포함)' if full_sweep else '증분 (새로 / 바뀐 공고만)'}")
+
+    global g_missing_snapshot
     
     # (수정) ◀ "실종DB"가 로드되었는지(알림 기능 활성화) 확인
-    trigger1_enabled = g_missing_index is not None and g_missing_db_full is not None
+    trigger1_enabled = g_missing_snapshot is not None
     if trigger1_enabled:
         print(f"✅ [Trigger 1] 활성화됨. 크롤링 데이터를 실시간으로 '실종DB'와 비교합니다.")
     else:
         print(f"⚠️ [Trigger 1] 비활성화됨. '실종DB' 로드에 실패했으므로 알림 비교를 건너뜁니다.")
-        
-    alerted_owners_for_board = {} # ◀ (신규) 중복 알림 방지용 (board_idx: {user_num, user_num})
 
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        results = executor.map(fetch_data, urls)
-        for result_list_per_page in results:
-            
-            # 1. (원본) ◀ 크롤링 데이터를 all_data 리스트에 추가
-            all_data.extend(result_list_per_page) 
-            
-            # 2. (신규) ◀ Trigger 1 로직 (실종DB가 로드된 경우에만 실행)
-            if trigger1_enabled and result_list_per_page:
-                
-                print(f"  [Trigger 1] {len(result_list_per_page)}개 신규 데이터 AI 비교 시작...")
-                
-                # 갓 크롤링된 페이지의 동물들(result_list_per_page)을 하나씩 순회
-                for new_animal_tuple in result_list_per_page:
-                    try:
-                        # (참고: ANIMAL_COLUMNS 순서와 동일함)
-                        # (board_idx, name, species, breed, gender, feature, 
-                        #  photo1, photo2, photo3, rescue_date, ...)
-                        board_idx = new_animal_tuple[0]
-                        photo1_s3_key = new_animal_tuple[6] # ◀ 7번째 값 (PHOTO1 S3 Key)
-                        
-                        if not photo1_s3_key:
-                            continue # ◀ 사진 없으면 비교 불가
-                            
-                        # 2-1. (느린 작업) ◀ S3에서 방금 올린 사진을 다시 다운로드
-                        obj = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=photo1_s3_key)
-                        image_bytes = obj['Body'].read()
-                        image_data_b64 = base64.b64encode(image_bytes).decode("utf-8")
-
-                        # 2-2. (느린 작업) ◀ LLM 분석으로 벡터 생성
-                        query_obj = llm_animal.analyze_image_bytes(image_data_b64, f"crawl_{board_idx}.jpg")
-                        if not query_obj: continue
-                        query_attr_emb = llm_animal.get_embeddings_for_attributes(query_obj)
-                        if not (query_attr_emb and "__merged__" in query_attr_emb):
-                            continue
-                            
-                        # 2-3. (빠른 작업) ◀ "실종 DB" 검색
-                        query_merged_vector = query_attr_emb["__merged__"]
-                        query_vector_np = np.array([query_merged_vector]).astype('float32')
-                        faiss.normalize_L2(query_vector_np)
-                        
-                        D_faiss, I_faiss = g_missing_index.search(query_vector_np, llm_animal.K_CANDIDATES)
-                        candidate_indices = I_faiss[0]
-                        
-                        query_species = query_obj.get("dog_or_cat_or_other")
-                        
-                        # 2-4. 80% 이상 매칭 확인
-                        for idx in candidate_indices:
-                            missing_item = g_missing_db_full[idx]
-                            
-                            if missing_item.get("attributes", {}).get("dog_or_cat_or_other") == query_species:
-                                score = llm_animal.compare_query_to_item(query_attr_emb, missing_item)
-                                
-                                if score >= 0.80:
-                                    owner_user_num = missing_item.get("attributes", {}).get("user_num")
-                                    if not owner_user_num: continue
-                                        
-                                    # ◀ 중복 알림 방지
-                                    if board_idx not in alerted_owners_for_board:
-                                        alerted_owners_for_board[board_idx] = set()
-
-                                    if owner_user_num not in alerted_owners_for_board[board_idx]:
-                                        # 1. 파일명에서 '이름'만 예쁘게 추출하기
-                                        full_path = missing_item.get('filename', '') # 예: abandon/missing/15_천사_1764...jpg
-                                        pet_name = "반려동물" # 기본값
-                                        try:
-                                            # 경로 떼고 파일명만 (15_천사_1764...jpg)
-                                            file_only = full_path.split('/')[-1]
-                                            # 언더바(_)로 쪼개서 두 번째 덩어리(이름) 가져오기
-                                            pet_name = file_only.split('_')[1]
-                                        except:
-                                            pass # 이름 파싱 실패 시 기본값 사용
-
-                                        print(f"  [🔔 80% 매칭 (Trigger 1)] 신규(idx:{board_idx}) ↔ 실종({pet_name})")
-                                        
-                                        # 2. 메시지 포맷을 '제보' 때와 똑같이 맞춤 (오타 수정 포함)
-                                        message = f"[이어주개] 회원님의 실종동물'{pet_name}'과(와) {score*100:.0f}% 유사한 동물이 광주광역시 동물보호센터에서 발견되었습니다!\n\n▶공고 확인하기:\nhttps://www.kcanimal.or.kr/board_gallery01/board_content.asp?board_idx={board_idx}&tname=board_gallery01"
-
-                                        # 2-5. "신호" INSERT
-                                        create_notification_signal(owner_user_num, message, noti_type="SCHEDULED")
-
-                                        alerted_owners_for_board[board_idx].add(owner_user_num)
-                                           
-                    except Exception as e:
-                        print(f"  [❌ Trigger 1 오류] 신규 데이터(tuple: {new_animal_tuple[0]}) 비교 중 실패: {e}")
+    g_photo_bytes = photo_sync.PhotoBytesCache(PHOTO_BYTES_CACHE_MB * 1024 * 1024) if trigger1_enabled else None
+
+    # ◀◀ [수정] 목록 / 상세 / 사진 요청은 모두 비동기 크롤링 엔진 1개로 (연결 재사용 + 동시 요청 수 제한)
+    try:
+        crawl_result = asyncio.run(crawl_pages(trigger1_enabled, state, full_sweep))
+    finally:
+        g_photo_sync.print_stats()
+        g_photo_sync.save() # ◀ S3에 이미 올린 사진은 DB 저장 결과와 관계없이 기록
+        if g_photo_bytes is not None:
+            g_photo_bytes.print_stats()
+            g_photo_bytes = None
+    if crawl_result is None:
+        return
+    all_data, fresh_data = crawl_result
             
     # 데이터 리스트를 튜플로 변환하여 중복 제거
-    data_list = list(set(tuple(row) for row in all_data))
+    # ◀ 증분 모드는 새로 / 바뀐 공고만 저장 (나머지는 DB에 이미 같은 내용이 있음)
+    data_list = list(set(tuple(row) for row in (all_data if full_sweep else fresh_data)))
     
-    print(f"[INFO] 크롤링된 유효 데이터 항목 수 (중복 제거 후): {len(data_list)}개")
+    print(f"[INFO] 크롤링된 유효 데이터 항목 수 (중복 제거 후): {len(data_list)}개 (새로 / 바뀐 공고 {len(fresh_data)}개)")
     
     if not data_list:
-        print("⚠️ 크롤링된 유효 데이터가 없어 DB 작업을 건너뛰었습니다.")
+        if full_sweep:
+            print("⚠️ 크롤링된 유효 데이터가 없어 DB 작업을 건너뛰었습니다.")
+        else:
+            print("✅ 새로 / 바뀐 공고가 없어 DB 작업과 AI 데이터 갱신을 건너뛰었습니다.")
+            state.save() # ◀ 저장 대상이 아닌 공고의 지문은 기록
         return
 
     # 3. 데이터프레임 생성 및 CSV 저장
@@ -602,60 +683,58 @@ def job_crawl_and_save():
         print(f"❌ CSV 저장 중 오류 발생: {e}")
 
     # 4. MySQL 연결 및 저장 (UPSERT & DELETE)
-    conn = None
-    curs = None
     try:
-        conn = pymysql.connect(**DB_CONFIG)
-        curs = conn.cursor()
-        
-        # 4.1. DB UPSERT 쿼리 생성
-        column_names = ANIMAL_COLUMNS
-        value_placeholders = ', '.join(['%s'] * len(column_names))
-        
-        # LAST_CRAWLED_AT과 CRAWL_URL, NAME, SPECIES 등 비-고유 키 컬럼을 업데이트
-        update_cols = [
-            f'`{c}` = VALUES(`{c}`)' 
-            for c in column_names 
-            if c not in UNIQUE_KEY_COLUMNS # BOARD_IDX를 제외한 모든 컬럼 업데이트
-        ]
-        update_set_clause = ', '.join(update_cols)
+        with g_db_pool.connection() as conn, conn.cursor() as curs: # ◀ 풀에서 빌리고, 끝나면(예외 시 rollback 후) 반납
         
-        sql_upsert = f"""
-        INSERT INTO {DB_TABLE_NAME} ({', '.join(f'`{c}`' for c in column_names)}) 
-        VALUES({value_placeholders})
-        ON DUPLICATE KEY UPDATE
-            {update_set_clause};
-        """ 
+            # 4.1. DB UPSERT 쿼리 생성
+            column_names = ANIMAL_COLUMNS
+            value_placeholders = ', '.join(['%s'] * len(column_names))
         
-        data_to_insert = [tuple(row) for row in df.values]
+            # LAST_CRAWLED_AT과 CRAWL_URL, NAME, SPECIES 등 비-고유 키 컬럼을 업데이트
+            update_cols = [
+                f'`{c}` = VALUES(`{c}`)' 
+                for c in column_names 
+                if c not in UNIQUE_KEY_COLUMNS # BOARD_IDX를 제외한 모든 컬럼 업데이트
+            ]
+            update_set_clause = ', '.join(update_cols)
         
-        rows_processed = curs.executemany(sql_upsert, data_to_insert)
+            sql_upsert = f"""
+            INSERT INTO {DB_TABLE_NAME} ({', '.join(f'`{c}`' for c in column_names)}) 
+            VALUES({value_placeholders})
+            ON DUPLICATE KEY UPDATE
+                {update_set_clause};
+            """ 
         
-        conn.commit()
+            data_to_insert = [tuple(row) for row in df.values]
         
-        print(f"✅ DB UPSERT 완료. 총 {rows_processed}개 레코드를 처리했습니다 (삽입/업데이트 포함).")
+            rows_processed = curs.executemany(sql_upsert, data_to_insert)
         
-        # 4.2. 사라진 데이터 삭제 (DELETE)
-        sql_delete_old = f"""
-        DELETE FROM {DB_TABLE_NAME} 
-        WHERE LAST_CRAWLED_AT < %s;
-        """
-        rows_deleted = curs.execute(sql_delete_old, (job_timestamp,))
+            conn.commit()
         
-        conn.commit()
+            print(f"✅ DB UPSERT 완료. 총 {rows_processed}개 레코드를 처리했습니다 (삽입/업데이트 포함).")
         
-        print(f"✅ 사라진 데이터 삭제 완료. 총 {rows_deleted}개 레코드를 삭제했습니다.")
+            # 4.2. 사라진 데이터 삭제 (DELETE)
+            # ◀ 증분 모드는 목록 일부만 보므로 삭제하지 않음 (전체 순회 때만)
+            if full_sweep:
+                sql_delete_old = f"""
+                DELETE FROM {DB_TABLE_NAME} 
+                WHERE LAST_CRAWLED_AT < %s;
+                """
+                rows_deleted = curs.execute(sql_delete_old, (job_timestamp,))
+            
+                conn.commit()
+            
+                print(f"✅ 사라진 데이터 삭제 완료. 총 {rows_deleted}개 레코드를 삭제했습니다.")
+                print(f"  [증분 크롤링] 목록에서 사라진 공고 {state.prune_unseen()}개를 상태에서 제거")
+
+            # ◀◀ [신규] DB 저장이 끝난 뒤에만 상태 파일 저장 (실패하면 다음 실행에서 다시 받음)
+            state.save(full_sweep=full_sweep)
 
     except Exception as e:
-        print(f"❌ DB 작업 중 치명적인 오류 발생: {e}")
-        if conn:
-            conn.rollback()
-            print("❌ DB 롤백 완료.")
+        print(f"❌ DB 작업 중 치명적인 오류 발생: {e} (커밋하지 않은 작업은 연결 반납 시 롤백됨)")
             
     finally:
-        if curs: curs.close()
-        if conn: conn.close()
-        print("✅ DB 연결 종료.")
+        print("✅ DB 연결 반납.")
     
     print("\n-------------------------------------------------------")
     print("🚀 [Step 2] AI 데이터(JSON/Index) 자동 갱신을 시작합니다.")
@@ -676,7 +755,8 @@ def job_crawl_and_save():
             print("📡 [Step 3] Flask 서버 메모리 새로고침 요청 중...")
             try:
                 # 타임아웃을 넉넉하게 10분(600초)으로 설정
-                response = requests.post("http://localhost:5000/api/refresh_index", timeout=600)
+                # ◀ 입양DB 파일은 방금 갱신했으므로 입양DB 스냅샷만 교체 (실종DB 재구축은 하지 않음)
+                response = requests.post("http://localhost:5000/api/refresh_index", params={"db": "adopt"}, timeout=600)
 
                 if response.status_code == 200:
                     print(f"✅ 서버 메모리 갱신 성공: {response.json().get('message')}")
@@ -703,8 +783,9 @@ if __name__ == '__main__':
     print(f"[MAIN] 동물 데이터 크롤링 작업을 1회 실행합니다.")
     print("=======================================================") 
 
-    # 최초 1회 실행
-    job_crawl_and_save()
+    # 최초 1회 실행 (--full: 전체 순회 강제, --incremental: 증분 강제, 없으면 상태 파일을 보고 자동 결정)
+    full_sweep = True if '--full' in sys.argv else False if '--incremental' in sys.argv else None
+    job_crawl_and_save(full_sweep)
 
     print("=======================================================")
     print(f"[MAIN] 모든 크롤링 작업이 완료되었습니다. 스크립트를 종료합니다.")
@@ -1,13 +1,23 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, g
 from flask_cors import CORS
 import base64
 import time
 import threading # ◀◀ [추가] 백그라운드 작업을 위한 스레딩 모듈
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 # -----------------------------------------------
 # (중요) llm_animal.py의 핵심 로직을 import
 # (llm_animal.py가 같은 폴더에 있다고 가정)
 import llm_animal
+import search_snapshot
+import search_service
+import query_cache
+import db_pool
+import image_preprocess
+import metrics
+import refresh_jobs
+import index_manager
 # -----------------------------------------------
 
 import faiss
@@ -19,6 +29,27 @@ import pymysql
 app = Flask(__name__)
 CORS(app) # ◀◀ 모든 도메인에서의 요청을 허용 (React 테스트용)
 
+# ◀◀ [신규] 요청마다 엔드포인트 라벨을 정해두고 (단계별 지표가 이 라벨로 기록됨), 끝나면 요청 수 / 전체 시간 기록
+@app.before_request
+def start_request_metrics():
+    g.metrics_endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    g.metrics_token = metrics.set_endpoint(g.metrics_endpoint)
+    g.metrics_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = g.get("metrics_endpoint", "unmatched")
+    if endpoint != "/metrics":
+        metrics.REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - g.get("metrics_start", time.perf_counter()), endpoint=endpoint)
+    return response
+
+@app.teardown_request
+def reset_request_metrics(exc):
+    token = g.pop("metrics_token", None)
+    if token is not None:
+        metrics.reset_endpoint(token)
+
 # MySQL DB 설정 (animal_crawler.py와 동일하게)
 DB_CONFIG = {
     "host": "project-db-campus.smhrd.com",
@@ -29,53 +60,140 @@ DB_CONFIG = {
     "charset": "utf8mb4",
     "cursorclass": pymysql.cursors.DictCursor
 }
-# 2. (필수) 하이브리드 검색에 필요한 DB/인덱스 전역 로드
-g_adopt_index = None
-g_adopt_db_full = None
-g_missing_index = None
-g_missing_db_full = None
+DB_POOL_SIZE = 8 # ◀ 동시 요청 수에 맞춰 조정 (요청마다 연결/인증하지 않고 재사용)
 
-def load_ai_models(): # ◀◀ 함수로 묶기
-    global g_adopt_index, g_adopt_db_full, g_missing_index, g_missing_db_full
-    print("--- AI 모델 로드 시작 ---")
-    try:
-        # --- DB 1: 입양동물 (Adoption) DB 로드 ---
-        print(f"'{llm_animal.INDEX_FILE}' (입양DB) 로드 중...")
-        g_adopt_index = faiss.read_index(llm_animal.INDEX_FILE)
+# ◀◀ [신규] MySQL 커넥션 풀 (모든 DB 접근은 이 풀을 통해서만)
+g_db_pool = db_pool.ConnectionPool(DB_CONFIG, max_size=DB_POOL_SIZE, name="app")
 
-        print(f"'{llm_animal.ID_MAP_FILE}' (입양DB 맵) 로드 중...")
-        with open(llm_animal.ID_MAP_FILE, "r", encoding="utf-8") as f:
-            # (변수명 주의: g_adopt_id_map은 전역변수 선언 안 해도 됨, 내부 사용)
-            json.load(f)
-
-        print(f"'{llm_animal.DB_FILE}' (입양DB 원본) 로드 중...")
-        with open(llm_animal.DB_FILE,"r",encoding="utf-8") as f:
-            g_adopt_db_full = json.load(f)
-        print(f"✅ 입양DB 로드 완료 (총 {len(g_adopt_db_full)}개 항목)")
-
-        # --- DB 2: 실종동물 (Missing) DB 로드 ---
-        MISSING_INDEX_FILE = "missing_vectors.index"
-        MISSING_MAP_FILE = "missing_map.json"
-        MISSING_DB_FILE = "missing_pets.json"
+# 2. (필수) 하이브리드 검색에 필요한 DB/인덱스 전역 로드
+# ◀◀ [수정] 전역변수 4개를 하나씩 바꾸던 방식 대신, "스냅샷"(인덱스 + DB + 버전)을 통째로 교체
+#    (요청은 시작 시 잡은 스냅샷 하나만 사용하므로 새로고침 중에도 인덱스/DB가 어긋나지 않음)
+g_snapshots = search_snapshot.SnapshotRegistry()
 
-        print(f"'{MISSING_INDEX_FILE}' (실종DB) 로드 중...")
-        g_missing_index = faiss.read_index(MISSING_INDEX_FILE)
+def load_missing_metadata(store):
+    """
+    ◀◀ [신규] MISSING 테이블 전체를 1번만 조회하여 'S3 키 -> {이름, 실종 위치}' 맵을 만듭니다.
+    (기존: 후보마다 PET_IMAGE_URL LIKE '%키' 쿼리 = 앞쪽 와일드카드라 매번 전체 테이블 스캔)
+    실패하면 빈 맵을 반환하고, 검색 결과는 기본값(이름 미상 / 위치 정보 없음)으로 채워집니다.
+    """
+    try:
+        with metrics.stage("db"), g_db_pool.connection() as conn:
+            with conn.cursor() as curs:
+                curs.execute("SELECT PET_NAME, LOST_LOCATION, PET_IMAGE_URL FROM MISSING")
+                db_rows = curs.fetchall()
+    except Exception as e:
+        print(f"⚠️ [실종DB] MISSING 메타데이터 로드 실패 (이름/위치는 기본값으로 표시): {e}")
+        return {}
+
+    # ◀ URL 끝 파일명으로 먼저 묶고, 기존 LIKE '%키'와 같이 URL이 S3 키로 끝나는지 확인
+    rows_by_basename = {}
+    for row in db_rows:
+        url = row.get("PET_IMAGE_URL") or ""
+        rows_by_basename.setdefault(url.rsplit("/", 1)[-1], []).append(row)
+
+    metadata = {}
+    for s3_key in store.filenames:
+        for row in rows_by_basename.get(s3_key.rsplit("/", 1)[-1], []):
+            if row["PET_IMAGE_URL"].endswith(s3_key):
+                metadata[s3_key] = {"petName": row["PET_NAME"], "location": row["LOST_LOCATION"]}
+                break
+    print(f"  [실종DB] MISSING 메타데이터 {len(metadata)}/{len(store)}개 매칭 (DB {len(db_rows)}행)")
+    return metadata
+
+SNAPSHOT_SOURCES = {
+    # 이름: (인덱스 파일, DB 파일, 로그용 이름, 메타데이터 로더)
+    "adopt": (llm_animal.INDEX_FILE, llm_animal.DB_FILE, "입양DB", None),
+    "missing": (llm_animal.MISSING_INDEX_FILE, llm_animal.MISSING_DB_FILE, "실종DB", load_missing_metadata),
+}
 
-        print(f"'{MISSING_MAP_FILE}' (실종DB 맵) 로드 중...")
-        with open(MISSING_MAP_FILE, "r", encoding="utf-8") as f:
-            json.load(f)
+# ◀◀ [신규] DB별 마지막 로드 시도 상태 (pending -> loading -> ready | failed), 준비 상태 API / 503 응답에 표시
+g_load_state = {name: {"state": "pending", "attempts": 0, "error": None, "updated_at": None} for name in SNAPSHOT_SOURCES}
+g_load_lock = threading.Lock() # ◀ 워밍업 / 새로고침 / 스냅샷 감시가 같은 파일을 동시에 로드하지 않도록
 
-        print(f"'{MISSING_DB_FILE}' (실종DB 원본) 로드 중...")
-        with open(MISSING_DB_FILE,"r",encoding="utf-8") as f:
-            g_missing_db_full = json.load(f)
-        print(f"✅ 실종DB 로드 완료 (총 {len(g_missing_db_full)}개 항목)")
+def _set_load_state(name, state, error=None):
+    entry = g_load_state[name]
+    entry["state"] = state
+    entry["error"] = error
+    entry["updated_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    if state == "loading":
+        entry["attempts"] += 1
 
-    except Exception as e:
-        print(f"❌ [치명적 오류] DB 파일 로드 실패: {e}")
+def load_ai_models(names=("adopt", "missing")): # ◀◀ 함수로 묶기
+    """
+    names의 스냅샷을 새로 만들어 공개합니다. 로드에 실패한 이름 리스트를 반환합니다.
+    """
+    print("--- AI 모델 로드 시작 ---")
+    failed = []
+    with g_load_lock:
+        for name in names:
+            index_file, db_file, label, metadata_loader = SNAPSHOT_SOURCES[name]
+            start_time = time.perf_counter()
+            _set_load_state(name, "loading")
+            try:
+                print(f"'{index_file}', '{db_file}' ({label}) 로드 중...")
+                # ◀ 새 스냅샷은 옆에서 완전히 만든 뒤 한 번에 공개 (실패하면 기존 스냅샷 유지)
+                snap = search_snapshot.load_snapshot(name, index_file, db_file, metadata_loader)
+                g_snapshots.publish(snap)
+                _set_load_state(name, "ready")
+                print(f"✅ {label} 로드 완료 (총 {len(snap.store)}개 항목, 버전 {snap.version}, {snap.load_seconds:.2f}초)")
+                metrics.MODEL_LOAD_SECONDS.observe(time.perf_counter() - start_time, db=name, result="ok")
+            except Exception as e:
+                print(f"❌ [치명적 오류] {label} 파일 로드 실패 (기존 스냅샷 유지): {e}")
+                _set_load_state(name, "failed", str(e))
+                metrics.MODEL_LOAD_SECONDS.observe(time.perf_counter() - start_time, db=name, result="error")
+                failed.append(name)
+    return failed
+
+SNAPSHOT_RETRY_AFTER = 5 # ◀ (초) 503 응답의 Retry-After
+
+def snapshot_unavailable(name):
+    """
+    ◀◀ [수정] 해당 DB가 아직 준비되지 않았을 때의 빠른 503 (로드 중 / 실패 상태와 재시도 간격 포함)
+    """
+    body = {"error": f"검색 DB({name})가 아직 준비되지 않았습니다.", "db": name, "state": g_load_state[name]["state"]}
+    return jsonify(body), 503, {"Retry-After": str(SNAPSHOT_RETRY_AFTER)}
 
-# ◀◀ 서버 시작 시 최초 1회 실행
-load_ai_models()
-print("\n✅ 모든 DB 로드 완료. API 서버 대기 중...")
+def readiness():
+    """
+    DB별 준비 상태와 전체 준비 여부를 반환합니다. (스냅샷이 공개되어 있으면 마지막 새로고침이 실패했어도 준비 상태)
+    """
+    dbs = {}
+    for name, entry in g_load_state.items():
+        snap = g_snapshots.get(name)
+        dbs[name] = dict(entry, ready=snap is not None, version=snap.version if snap is not None else None)
+    return all(db["ready"] for db in dbs.values()), dbs
+
+# ◀◀ [수정] 서버 시작 시 DB 로드를 기다리지 않고 백그라운드에서 워밍업 (프로세스는 바로 요청을 받음)
+#    - 준비되지 않은 DB를 쓰는 엔드포인트는 snapshot_unavailable()로 바로 503
+#    - 로드에 실패한 DB는 WARMUP_RETRY_INTERVAL초마다 다시 시도
+#    - CONNECTDOG_WARMUP=manual 이면 import 시 시작하지 않음 (gunicorn은 fork 후 워커마다 start_warmup() 호출)
+WARMUP_MODE = os.environ.get("CONNECTDOG_WARMUP", "background")
+WARMUP_RETRY_INTERVAL = 30 # (초)
+g_warmup_thread = None
+g_started_at = time.time()
+
+def warm_up(retry_interval=WARMUP_RETRY_INTERVAL):
+    while True:
+        pending = [name for name in SNAPSHOT_SOURCES if g_snapshots.get(name) is None]
+        if not pending:
+            print(f"\n✅ 모든 DB 로드 완료 (시작 후 {time.time() - g_started_at:.2f}초). API 서버 대기 중...")
+            return
+        if load_ai_models(pending):
+            print(f"⏳ [워밍업] {retry_interval}초 뒤 다시 로드합니다.")
+            time.sleep(retry_interval)
+
+def start_warmup():
+    """
+    백그라운드 워밍업 스레드를 시작합니다. (이미 실행 중이면 그대로 반환)
+    """
+    global g_warmup_thread
+    if g_warmup_thread is None or not g_warmup_thread.is_alive():
+        g_warmup_thread = threading.Thread(target=warm_up, name="snapshot-warmup", daemon=True)
+        g_warmup_thread.start()
+    return g_warmup_thread
+
+if WARMUP_MODE == "background":
+    start_warmup()
 # -----------------------------------------------------------------
 
 # "신호 주기" 헬퍼 함수
@@ -83,41 +201,31 @@ def create_notification_signal(user_num, message):
     """
     NOTIFICATIONS 테이블에 'pending' 상태로 새 알림을 INSERT합니다.
     """
-    conn = None
-    curs = None
-
     try:
-        conn = pymysql.connect(**DB_CONFIG)
-        curs = conn.cursor()
-
-        sql = """
-        INSERT INTO NOTIFICATIONS (user_num, message, status)
-        VALUES (%s, %s, 'pending')
-        """
-        curs.execute(sql, (user_num, message))
-        conn.commit()
+        # ◀◀ [수정] 풀에서 연결을 빌려 사용 (예외 시 rollback은 풀이 처리)
+        with metrics.stage("db"), g_db_pool.connection() as conn:
+            with conn.cursor() as curs:
+                sql = """
+                INSERT INTO NOTIFICATIONS (user_num, message, status)
+                VALUES (%s, %s, 'pending')
+                """
+                curs.execute(sql, (user_num, message))
+            conn.commit()
         print(f"  [🔔 알림 신호 생성] User {user_num}에게 '{message[:20]}...' 전송 예약")
 
     except Exception as e:
         print(f"  [❌ 알림 신호 실패] User {user_num} DB INSERT 실패: {e}")
-        if conn: conn.rollback()
-    finally:
-        if curs: curs.close()
-        if conn: conn.close()
 
 def get_user_details_from_db(user_num):
     """
     USERS 테이블에서 user_id로 연락처 정보를 가져옵니다.
     """
-    conn = None
-    curs = None
     try:
-        conn = pymysql.connect(**DB_CONFIG)
-        curs = conn.cursor()
-
-        # (주의: USERS 테이블과 user_id 컬럼명이 실제와 일치해야 함)
-        curs.execute("SELECT phone, telegram_chat_id FROM USERS WHERE USER_NUM = %s", (user_num,))
-        user_details = curs.fetchone()
+        with metrics.stage("db"), g_db_pool.connection() as conn:
+            with conn.cursor() as curs:
+                # (주의: USERS 테이블과 user_id 컬럼명이 실제와 일치해야 함)
+                curs.execute("SELECT phone, telegram_chat_id FROM USERS WHERE USER_NUM = %s", (user_num,))
+                user_details = curs.fetchone()
 
         if user_details:
             return user_details
@@ -127,9 +235,6 @@ def get_user_details_from_db(user_num):
     except Exception as e:
         print(f"  [❌ DB 조회 실패] USERS 테이블 조회 실패: {e}")
         return None
-    finally:
-        if curs: curs.close()
-        if conn: conn.close()
 
 # 헬스 체크(Health Check) 엔드포인트
 @app.route('/', methods=['GET'])
@@ -138,6 +243,22 @@ def health_check():
     # 이 주소로 접속하면 "ok" 메시지를 반환합니다.
     return jsonify({"status": "ok", "message": "API 서버가 정상 작동 중입니다."})
 
+# ◀◀ [신규] 활성(liveness) 검사: 프로세스가 요청에 응답하는지만 확인 (DB 로드와 무관, 실패 시 재시작 대상)
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({"status": "ok", "uptime_seconds": round(time.time() - g_started_at, 1)})
+
+# ◀◀ [신규] 준비(readiness) 검사: 모든 검색 DB가 로드되어야 200 (?db=adopt 처럼 특정 DB만 확인 가능)
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    ready, dbs = readiness()
+    name = request.args.get('db')
+    if name:
+        if name not in dbs:
+            return jsonify({"error": f"알 수 없는 db: {name}"}), 400
+        ready, dbs = dbs[name]["ready"], {name: dbs[name]}
+    return jsonify({"ready": ready, "dbs": dbs}), 200 if ready else 503
+
 # 3. (핵심) 이미지 검색 API 엔드포인트 생성
 @app.route('/api/search', methods=['POST'])
 def handle_search():
@@ -151,10 +272,19 @@ def handle_search():
     image_data_b64 = data['image_base64']
     (start_time_total) = time.time()
 
+    if g_snapshots.get("adopt") is None: # ◀◀ [신규] DB가 없으면 LLM 호출 전에 바로 503
+        return snapshot_unavailable("adopt")
+
+    return search_adopt_by_image(image_data_b64, start_time_total)
+
+def search_adopt_by_image(image_data_b64, start_time_total, preprocessed=False):
+    """
+    ◀◀ [신규] /api/search, /api/search/upload 공통: 이미지(Base64) 1장으로 입양DB를 검색하여 응답을 만듭니다.
+    """
     try:
         # 2. 쿼리 이미지 분석 (llm_animal.py의 함수 재사용)
         # (analyze_image_bytes 함수는 Base64를 인자로 받으므로 완벽함)
-        query_obj = llm_animal.analyze_image_bytes(image_data_b64, "api_query.jpg")
+        query_obj = llm_animal.analyze_image_bytes(image_data_b64, "api_query.jpg", preprocessed)
         if not query_obj:
             return jsonify({"error": "LLM 분석 실패"}), 500
 
@@ -164,40 +294,88 @@ def handle_search():
 
         print(f"✅ 쿼리 벡터 생성 완료")
 
-        # 3. FAISS + 하이브리드 검색 실행 (llm_animal.py의 로직 재사용)
-        query_merged_vector = query_attr_emb["__merged__"]
-        query_vector_np = np.array([query_merged_vector]).astype('float32')
-        faiss.normalize_L2(query_vector_np)
-
-        D_faiss, I_faiss = g_adopt_index.search(query_vector_np, llm_animal.K_CANDIDATES)
-        candidate_indices = I_faiss[0]
-
-        query_species = query_obj.get("dog_or_cat_or_other")
-        final_results_data = [] # ◀ JSON으로 반환할 리스트
-
-        for idx in candidate_indices:
-            item = g_adopt_db_full[idx]
-            if item.get("attributes", {}).get("dog_or_cat_or_other") == query_species:
-                score = llm_animal.compare_query_to_item(query_attr_emb, item)
-                final_results_data.append({
-                    "filename": item["filename"],
-                    "score": score
-                })
-
-        final_results_data.sort(key=lambda x: x["score"], reverse=True)
+        # 3. FAISS + 하이브리드 검색 실행 (search_service.py의 공통 로직 재사용)
+        # ◀◀ [신규] 이 요청은 여기서 잡은 스냅샷 하나만 사용 (중간에 새로고침되어도 안전)
+        snap = g_snapshots.get("adopt")
+        final_results_data = search_service.rank_adopt(snap, query_obj, query_attr_emb) # ◀ 상위 K_FINAL개
 
         print(f"✅ 하이브리드 검색 완료 (총 {time.time() - start_time_total:.2f}초)")
 
         # 4. React에게 Top 10 결과를 JSON으로 응답
         return jsonify({
             "message": "검색 성공",
-            "results": final_results_data[:llm_animal.K_FINAL] #
+            "results": final_results_data
         })
 
     except Exception as e:
         print(f"❌ /api/search 처리 중 심각한 오류: {e}")
         return jsonify({"error": str(e)}), 500
 
+# ◀◀ [신규] 이미지 업로드 (멀티파트 'image' 필드 또는 본문 = 이미지 바이트) 공통 처리
+def read_uploaded_image():
+    """
+    요청에서 업로드 이미지를 읽어 축소 / JPEG 재인코딩한 뒤 Base64 문자열로 반환합니다.
+    - multipart/form-data: 'image' 파일 필드 (werkzeug가 큰 파일은 임시 파일로 받아둠)
+    - 그 외(image/jpeg, application/octet-stream 등): 요청 본문 전체를 이미지로 간주하고 스트림으로 읽음
+    크기 제한은 업로드 엔드포인트에만 적용합니다. (앱 전체 MAX_CONTENT_LENGTH는 Base64 JSON 엔드포인트까지 막으므로 쓰지 않음)
+    문제가 있으면 image_preprocess.ImageUploadError를 냅니다.
+    """
+    image_preprocess.check_content_length(request.content_length, multipart=request.mimetype == 'multipart/form-data')
+    upload = request.files.get('image') if request.mimetype == 'multipart/form-data' else None
+    if upload is not None:
+        raw_bytes = image_preprocess.read_limited(upload.stream)
+    elif request.mimetype == 'multipart/form-data':
+        raise image_preprocess.ImageUploadError("'image' 파일 필드가 없습니다.")
+    else:
+        raw_bytes = image_preprocess.read_limited(request.stream)
+
+    prepared, info = image_preprocess.prepare_upload(raw_bytes)
+    print(f"  [업로드 전처리] {info['original_size']} {info['original_bytes'] / 1024:.0f}KB"
+          f" -> {info['prepared_size']} {info['prepared_bytes'] / 1024:.0f}KB")
+    return base64.b64encode(prepared).decode('ascii')
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({"error": f"요청이 너무 큽니다. (이미지 최대 {image_preprocess.MAX_UPLOAD_BYTES // (1024 * 1024)}MB)"}), 413
+
+@app.route('/api/search/upload', methods=['POST'])
+def handle_search_upload():
+    print("\n[요청 수신] /api/search/upload")
+    (start_time_total) = time.time()
+
+    if g_snapshots.get("adopt") is None: # ◀ DB가 없으면 업로드를 읽기 전에 바로 503
+        return snapshot_unavailable("adopt")
+
+    try:
+        image_data_b64 = read_uploaded_image()
+    except image_preprocess.ImageUploadError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    return search_adopt_by_image(image_data_b64, start_time_total, preprocessed=True) # ◀ 업로드 시 이미 전처리됨
+
+# ◀◀ [신규] /api/adapt 결과 캐시 (정규화된 쿼리 + 입양DB 스냅샷 버전) + 동일 쿼리 동시 요청 합치기
+g_adapt_cache = query_cache.QueryResultCache()
+g_adapt_flight = query_cache.SingleFlight()
+
+def compute_adapt_results(query_text, snap):
+    """
+    자연어 쿼리 1건의 입양 추천 결과를 계산합니다. 반환값: (결과 리스트, 오류 메시지)
+    """
+    # 2. 텍스트 쿼리를 -> JSON으로 번역
+    query_obj = llm_animal.analyze_text_with_llm(query_text)
+    if not query_obj:
+        return None, "LLM 텍스트 분석 실패"
+
+    # 3. 번역된 JSON을 -> 벡터로 변환
+    query_attr_emb = llm_animal.get_embeddings_for_attributes(query_obj)
+    if not (query_attr_emb and "__merged__" in query_attr_emb):
+        return None, "임베딩 생성 실패"
+
+    print(f"✅ 쿼리 벡터 생성 완료")
+
+    # 4. FAISS + 하이브리드 검색 실행 ('종' 필터링 및 가중치 재정렬 포함)
+    return search_service.rank_adopt(snap, query_obj, query_attr_emb), None
+
 # 4. 자연어 기반 입양 추천 API 엔드포인트
 @app.route('/api/adapt', methods=['POST'])
 def handle_adapt_recommendation():
@@ -211,56 +389,100 @@ def handle_adapt_recommendation():
     query_text = data['query_text'] # ◀ 'image_base64' 대신 'query_text'
     (start_time_total) = time.time()
 
-    try:
-        # 2. 텍스트 쿼리를 -> JSON으로 번역
-        query_obj = llm_animal.analyze_text_with_llm(query_text)
-        if not query_obj:
-            return jsonify({"error": "LLM 텍스트 분석 실패"}), 500
+    # ◀◀ [신규] 이 요청은 여기서 잡은 스냅샷 하나만 사용 (중간에 새로고침되어도 안전)
+    snap = g_snapshots.get("adopt")
+    if snap is None: # ◀◀ [신규] DB가 없으면 LLM 호출 전에 바로 503
+        return snapshot_unavailable("adopt")
 
-        # 3. 번역된 JSON을 -> 벡터로 변환
-        query_attr_emb = llm_animal.get_embeddings_for_attributes(query_obj)
-        if not (query_attr_emb and "__merged__" in query_attr_emb):
-            return jsonify({"error": "임베딩 생성 실패"}), 500
-
-        print(f"✅ 쿼리 벡터 생성 완료")
-
-        # 4. FAISS + 하이브리드 검색 실행
-        query_merged_vector = query_attr_emb["__merged__"]
-        query_vector_np = np.array([query_merged_vector]).astype('float32')
-        faiss.normalize_L2(query_vector_np)
+    try:
+        # ◀◀ [신규] 같은 쿼리 + 같은 스냅샷 버전의 결과가 있으면 LLM / 임베딩 / 검색 모두 생략
+        cache_key = query_cache.make_key(query_text, snap.version)
+        final_results_data = g_adapt_cache.get(cache_key)
+        if final_results_data is not None:
+            metrics.QUERY_CACHE.inc(cache="adapt", result="hit")
+            print(f"✅ [쿼리 캐시 적중] '{cache_key[0]}' (총 {time.time() - start_time_total:.2f}초)")
+        else:
+            metrics.QUERY_CACHE.inc(cache="adapt", result="miss")
+            # ◀ 같은 쿼리가 이미 계산 중이면 그 결과를 함께 받음 (LLM 호출 1번)
+            final_results_data, error = g_adapt_flight.do(cache_key, lambda: compute_adapt_results(query_text, snap))
+            if error:
+                return jsonify({"error": error}), 500
+            g_adapt_cache.put(cache_key, final_results_data)
+            print(f"✅ 하이브리드 검색 완료 (총 {time.time() - start_time_total:.2f}초)")
+
+        # 5. (100% 동일) ◀◀ React에게 Top 10 결과를 JSON으로 응답
+        return jsonify({
+            "message": "검색 성공",
+            "results": final_results_data
+        })
 
-        D_faiss, I_faiss = g_adopt_index.search(query_vector_np, llm_animal.K_CANDIDATES)
-        candidate_indices = I_faiss[0]
+    except Exception as e:
+        print(f"❌ /api/adapt 처리 중 심각한 오류: {e}")
+        return jsonify({"error": str(e)}), 500
 
-        # 5. '종' 필터링 및 가중치 재정렬
-        query_species = query_obj.get("dog_or_cat_or_other")
-        final_results_data = []
+# ◀◀ [신규] 여러 쿼리(사진 / 텍스트) 한 번에 검색하는 배치 API
+# -----------------------------------------------------------------
+MAX_BATCH_QUERIES = 16     # ◀ 요청 1건에 담을 수 있는 최대 쿼리 수
+BATCH_ANALYZE_WORKERS = 8  # ◀ 쿼리 분석(gpt-4o)을 동시에 진행할 스레드 수
+g_batch_executor = ThreadPoolExecutor(max_workers=BATCH_ANALYZE_WORKERS, thread_name_prefix="batch")
 
-        for idx in candidate_indices:
-            item = g_adopt_db_full[idx]
+def parse_batch_queries(data):
+    """
+    {"queries": [{"image_base64": ...} 또는 {"query_text": ...}, ...]}를 [("image" | "text", 값)] 리스트로 바꿉니다.
+    형식이 맞지 않으면 ValueError를 냅니다.
+    """
+    queries = (data or {}).get('queries')
+    if not isinstance(queries, list) or not queries:
+        raise ValueError("'queries' 리스트가 없습니다.")
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise ValueError(f"한 번에 최대 {MAX_BATCH_QUERIES}개까지 검색할 수 있습니다. (요청 {len(queries)}개)")
+
+    parsed = []
+    for i, query in enumerate(queries):
+        if isinstance(query, dict) and query.get('image_base64'):
+            parsed.append(("image", query['image_base64']))
+        elif isinstance(query, dict) and query.get('query_text'):
+            parsed.append(("text", query['query_text']))
+        else:
+            raise ValueError(f"{i}번째 쿼리에 'image_base64' 또는 'query_text'가 없습니다.")
+    return parsed
+
+def analyze_batch_query(i, query):
+    kind, value = query
+    if kind == "image":
+        return llm_animal.analyze_image_bytes(value, f"api_batch_{i}.jpg")
+    return llm_animal.analyze_text_with_llm(value)
+
+@app.route('/api/search/batch', methods=['POST'])
+def handle_search_batch():
+    print("\n[요청 수신] /api/search/batch")
+    try:
+        queries = parse_batch_queries(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    (start_time_total) = time.time()
 
-            # (중요) LLM이 '개'라고 번역했으면, 고양이는 여기서 자동 필터링됨
-            if item.get("attributes", {}).get("dog_or_cat_or_other") == query_species:
+    snap = g_snapshots.get("adopt") # ◀ 배치 전체가 같은 스냅샷을 사용
+    if snap is None:
+        return snapshot_unavailable("adopt")
 
-                # (중요) `weights`가 여기서 100% 동일하게 적용됨
-                score = llm_animal.compare_query_to_item(query_attr_emb, item)
-                final_results_data.append({
-                    "filename": item["filename"],
-                    "score": score
-                })
+    try:
+        # 1. 쿼리 N개를 동시에 분석 (gpt-4o 응답 대기가 대부분이므로 스레드로 겹쳐서 기다림)
+        query_objs = list(g_batch_executor.map(metrics.bind(analyze_batch_query), range(len(queries)), queries))
 
-        final_results_data.sort(key=lambda x: x["score"], reverse=True)
+        # 2. 분석에 성공한 쿼리의 속성 전체를 임베딩 배치 요청 1번으로
+        analyzed = [q for q in query_objs if q]
+        embeds = iter(llm_animal.get_embeddings_for_attributes_batch(analyzed) if analyzed else [])
+        query_attr_embs = [next(embeds) if q else None for q in query_objs]
 
-        print(f"✅ 하이브리드 검색 완료 (총 {time.time() - start_time_total:.2f}초)")
+        # 3. 종별 행렬 FAISS 검색 + 후보 전체 재정렬 1번
+        entries = search_service.adopt_batch_entries(snap, query_objs, query_attr_embs)
 
-        # 6. (100% 동일) ◀◀ React에게 Top 10 결과를 JSON으로 응답
-        return jsonify({
-            "message": "검색 성공",
-            "results": final_results_data[:llm_animal.K_FINAL]
-        })
+        print(f"✅ 배치 검색 완료 ({len(queries)}개 쿼리, 총 {time.time() - start_time_total:.2f}초)")
+        return jsonify({"message": "검색 성공", "results": entries})
 
     except Exception as e:
-        print(f"❌ /api/adapt 처리 중 심각한 오류: {e}")
+        print(f"❌ /api/search/batch 처리 중 심각한 오류: {e}")
         return jsonify({"error": str(e)}), 500
 
 # 실종동물 제보 API (사진/텍스트 겸용)
@@ -275,13 +497,22 @@ def handle_sighting_report():
     query_text = data.get('query_text')       # (Optional)
     (start_time_total) = time.time()
 
+    if g_snapshots.get("missing") is None: # ◀◀ [신규] DB가 없으면 LLM 호출 전에 바로 503
+        return snapshot_unavailable("missing")
+
+    return report_sighting(image_data_b64, query_text, start_time_total)
+
+def report_sighting(image_data_b64, query_text, start_time_total, preprocessed=False):
+    """
+    ◀◀ [신규] /api/report_sighting, /api/report_sighting/upload 공통: 사진(Base64) 또는 텍스트로 실종DB를 검색합니다.
+    """
     try:
         query_obj = None
 
         # 1. 쿼리 분석 (사진/텍스트 분기 처리)
         if image_data_b64:
             print("[제보 유형] 사진")
-            query_obj = llm_animal.analyze_image_bytes(image_data_b64, "api_query_sighting.jpg")
+            query_obj = llm_animal.analyze_image_bytes(image_data_b64, "api_query_sighting.jpg", preprocessed)
         elif query_text:
             print("[제보 유형] 텍스트")
             query_obj = llm_animal.analyze_text_with_llm(query_text)
@@ -297,125 +528,186 @@ def handle_sighting_report():
 
         print(f"✅ 제보 쿼리 벡터 생성 완료")
 
-        # 3. ◀◀ [핵심] 하이브리드 검색 (g_missing_... 변수 사용)
-        query_merged_vector = query_attr_emb["__merged__"]
-        query_vector_np = np.array([query_merged_vector]).astype('float32')
-        faiss.normalize_L2(query_vector_np)
-
-        # (중요) ◀ '실종동물' 인덱스를 검색
-        D_faiss, I_faiss = g_missing_index.search(query_vector_np, llm_animal.K_CANDIDATES)
-        candidate_indices = I_faiss[0]
-
-        query_species = query_obj.get("dog_or_cat_or_other")
-        final_results_data = []
-
-        alerted_user_ids = set() # ◀ 중복 알림 방지용 Set
-
-        # DB 연결
-        conn = pymysql.connect(**DB_CONFIG)
-        curs = conn.cursor()
-
-        for idx in candidate_indices:
-            # (중요) ◀ '실종동물' DB에서 아이템 조회
-            item = g_missing_db_full[idx]
-            if item.get("attributes", {}).get("dog_or_cat_or_other") == query_species:
-                score = llm_animal.compare_query_to_item(query_attr_emb, item)
-
-                # --- [신규 4] ◀ "신호 주기" 로직 ---
-                if score >= 0.80: # ◀ 80% 이상 매칭!
-
-                    # (가정) ◀ 실종동물 DB의 attributes에 user_num (PK)이 저장되어 있어야 함
-                    owner_user_num = item.get("attributes", {}).get("user_num")
-
-                    if owner_user_num and owner_user_num not in alerted_user_ids:
-                        print(f"  [🔔 80% 매칭 발견!] 실종동물: {item.get('filename')}, 주인 ID: {owner_user_num}")
-
-                        # ◀◀ [수정] 파일명에서 이름 추출 로직
-                        full_path = item.get('filename', '') # 예: abandon/missing/5_뽀삐_1234.jpg
-                        pet_name = "반려동물" # 기본값
-                        try:
-                            # 1. 경로 떼고 파일명만 (5_뽀삐_1234.jpg)
-                            file_only = full_path.split('/')[-1]
-                            # 2. 언더바(_)로 쪼개서 두 번째 덩어리(이름) 가져오기
-                            pet_name = file_only.split('_')[1]
-                        except:
-                            pass # 이름 파싱 실패 시 기본값 사용
-
-                        # 1. 알림 메시지 생성
-                        message = f"[이어주개] 회원님의 실종동물 '{pet_name}'과(와) {score*100:.0f}% 유사한 동물이 제보되었습니다! \n\n▶홈페이지 확인하기\nhttp://connectdog.kro.kr/"
-
-                        # 2. (수정) ◀ 초간단 "신호" INSERT (연락처 조회 안 함)
-                        create_notification_signal(owner_user_num, message)
-
-                        alerted_user_ids.add(owner_user_num)
-
-                # DB에서 '이름'과 '장소' 조회
-                # (S3 키는 "abandon/missing/..." 형식이므로 LIKE 검색)
-                s3_key = item["filename"]
-                pet_name_db = "이름 미상"
-                lost_loc_db = "위치 정보 없음"
-
-                try:
-                    # PET_IMAGE_URL에 s3_key가 포함된 레코드를 찾음
-                    sql = "SELECT PET_NAME, LOST_LOCATION FROM MISSING WHERE PET_IMAGE_URL LIKE %s"
-                    curs.execute(sql, (f"%{s3_key}",))
-                    row = curs.fetchone()
-                    if row:
-                        pet_name_db = row['PET_NAME']
-                        lost_loc_db = row['LOST_LOCATION']
-                except Exception as e:
-                    print(f"  [DB 조회 에러] {s3_key}: {e}")
-
-                final_results_data.append({
-                    "filename": item["filename"],
-                    "score": score,
-                    "petName": pet_name_db,   # ◀ DB에서 가져온 이름
-                    "location": lost_loc_db   # ◀ DB에서 가져온 위치
-                })
-
-        final_results_data.sort(key=lambda x: x["score"], reverse=True)
+        # 3. ◀◀ [핵심] 하이브리드 검색 ('missing' 스냅샷 사용)
+        # ◀◀ [신규] 이 요청은 여기서 잡은 스냅샷 하나만 사용 (중간에 새로고침되어도 안전)
+        snap = g_snapshots.get("missing")
+        # ◀ 80% 이상 매칭된 실종동물의 주인에게 알림 신호 + 상위 K_FINAL개에 이름/장소 채움
+        final_results_data = search_service.rank_sighting(snap, query_obj, query_attr_emb, create_notification_signal)
 
         print(f"✅ /api/report_sighting 검색 완료 (총 {time.time() - start_time_total:.2f}초)")
-        return jsonify({"message": "검색 성공", "results": final_results_data[:llm_animal.K_FINAL]})
+        return jsonify({"message": "검색 성공", "results": final_results_data})
 
     except Exception as e:
         print(f"❌ /api/report_sighting 처리 중 심각한 오류: {e}")
         return jsonify({"error": str(e)}), 500
 
-    finally:
-        # ◀◀ [핵심] 에러가 나든 성공하든 DB 연결을 반드시 닫음
-        if curs: curs.close()
-        if conn: conn.close()
+@app.route('/api/report_sighting/upload', methods=['POST'])
+def handle_sighting_report_upload():
+    print("\n[요청 수신] /api/report_sighting/upload (실종DB 검색)")
+    (start_time_total) = time.time()
+
+    if g_snapshots.get("missing") is None:
+        return snapshot_unavailable("missing")
+
+    try:
+        image_data_b64 = read_uploaded_image()
+    except image_preprocess.ImageUploadError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    return report_sighting(image_data_b64, None, start_time_total, preprocessed=True)
+
+# ◀◀ [신규] 현재 공개된 스냅샷 버전/로드 시간 확인 API
+@app.route('/api/index_status', methods=['GET'])
+def index_status():
+    status = g_snapshots.status()
+    status["ready"], status["load_state"] = readiness()
+    status["adapt_query_cache"] = dict(g_adapt_cache.stats(), shared_inflight=g_adapt_flight.shared)
+    status["image_preprocess"] = image_preprocess.stats() # ◀ 전처리 전/후 바이트 수
+    return jsonify(status)
+
+# ◀◀ [수정] 새로고침은 작업 관리자를 통해서만 실행 (실행 중 1개 + 대기 1개, 겹쳐 실행되지 않음)
+REFRESH_LOCK_FILE = refresh_jobs.REFRESH_LOCK_FILE # ◀ 워커 / 크롤러(프로세스) 간 파일 재구축 잠금
+COMPACT_AFTER_REFRESH = True # ◀ 재구축 후 변경분을 기준 인덱스에 합침 (변경분이 없어야 읽기 전용 메모리 맵으로 로드됨)
+
+REFRESH_TARGETS = {
+    "missing": ("missing",),
+    "adopt": ("adopt",),
+    "all": ("missing", "adopt"),
+}
+
+def run_refresh_job(job):
+    """
+    새로고침 작업 1개를 단계별로 실행합니다. (refresh_jobs.RefreshManager가 백그라운드 스레드에서 호출)
+    - missing: MISSING 테이블 -> S3 스캔 -> JSON/Index 재생성 후 스냅샷 교체
+    - adopt: 크롤러가 이미 파일을 갱신했으므로 남은 변경분만 합친 뒤 스냅샷 교체
+    """
+    if "missing" in job.dbs:
+        # ◀ 다른 워커가 같은 파일을 재구축 중이면 끝날 때까지 기다림
+        with refresh_jobs.file_lock(REFRESH_LOCK_FILE):
+            # (오래 걸리는 작업) S3 스캔 -> JSON/Index 재생성
+            with job.phase("rebuild_missing"):
+                if not llm_animal.refresh_missing_data_from_db():
+                    raise RuntimeError("실종DB 파일 갱신 실패")
+            if COMPACT_AFTER_REFRESH:
+                with job.phase("compact_missing"):
+                    index_manager.compact_index(llm_animal.MISSING_INDEX_FILE)
+
+    if "adopt" in job.dbs and COMPACT_AFTER_REFRESH:
+        # ◀ 크롤러 / CLI update가 변경분만 남긴 경우에도 입양 인덱스를 메모리 맵으로 열 수 있도록 합침
+        with refresh_jobs.file_lock(REFRESH_LOCK_FILE):
+            with job.phase("compact_adopt"):
+                index_manager.compact_index(llm_animal.INDEX_FILE)
+
+    # (메모리 로드) 새 스냅샷을 만든 뒤 원자적으로 교체
+    names = [name for name in SNAPSHOT_SOURCES if name in job.dbs]
+    with job.phase("reload_" + "_".join(names)):
+        failed = load_ai_models(names)
+        if failed:
+            raise RuntimeError(f"스냅샷 로드 실패: {', '.join(failed)} (기존 스냅샷 유지)")
+
+g_refresh_jobs = refresh_jobs.RefreshManager(run_refresh_job)
+
+# ◀◀ [신규] (멀티 워커) 다른 워커가 새로고침한 파일을 감지하여 이 워커의 스냅샷도 교체
+SNAPSHOT_WATCH_INTERVAL = 30 # (초)
+g_snapshot_watcher = None
+
+def watch_snapshot_sources(interval=SNAPSHOT_WATCH_INTERVAL):
+    """
+    interval초마다 파일 서명을 확인하고, 서명이 바뀐 뒤 한 번 더 같은 값이면(쓰기가 끝났으면) 다시 로드합니다.
+    """
+    pending = {}
+    while True:
+        time.sleep(interval)
+        for name, (index_file, db_file, label, _) in SNAPSHOT_SOURCES.items():
+            try:
+                snap = g_snapshots.get(name)
+                signature = search_snapshot.source_signature(index_file, db_file)
+                if snap is not None and signature == snap.source_signature:
+                    pending.pop(name, None)
+                    continue
+                if pending.get(name) != signature:
+                    pending[name] = signature # ◀ 아직 쓰는 중일 수 있으므로 다음 확인까지 대기
+                    continue
+                print(f"🔄 [스냅샷 감시] {label} 파일이 갱신되어 다시 로드합니다. (pid {os.getpid()})")
+                pending.pop(name, None)
+                load_ai_models([name])
+            except Exception as e:
+                print(f"⚠️ [스냅샷 감시] {label} 확인 실패: {e}")
+
+def start_snapshot_watcher(interval=SNAPSHOT_WATCH_INTERVAL):
+    """
+    스냅샷 감시 스레드를 시작합니다. (gunicorn.conf.py의 post_fork에서 워커마다 1번 호출)
+    """
+    global g_snapshot_watcher
+    if g_snapshot_watcher is None or not g_snapshot_watcher.is_alive():
+        g_snapshot_watcher = threading.Thread(target=watch_snapshot_sources, args=(interval,),
+                                              name="snapshot-watcher", daemon=True)
+        g_snapshot_watcher.start()
+    return g_snapshot_watcher
+
+def request_refresh(target="all"):
+    """
+    새로고침을 요청하고 바로 반환합니다. (Flask / 비동기 서버 공용)
+    반환값: (작업, 대기 작업에 합쳐졌는지 여부). target이 잘못되면 ValueError.
+    """
+    if target not in REFRESH_TARGETS:
+        raise ValueError(f"알 수 없는 db 값입니다: '{target}' (사용 가능: {', '.join(REFRESH_TARGETS)})")
+    return g_refresh_jobs.submit(REFRESH_TARGETS[target])
+
+def refresh_response(target):
+    try:
+        job, merged = request_refresh(target)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    if merged:
+        message = "이미 대기 중인 새로고침 작업에 합쳐졌습니다. (현재 작업이 끝나면 실행됨)"
+    elif job.state == "queued":
+        message = "진행 중인 작업이 끝나면 새로고침이 시작됩니다."
+    else:
+        message = "백그라운드에서 인덱스 갱신이 시작되었습니다. (잠시 후 반영됨)"
+    return {"message": message, "merged": merged, "job": job.info()}, 200
+
+# ◀◀ [신규] 이미 통계를 가진 객체(캐시 / 커넥션 풀 / 스냅샷)는 스크랩할 때 값을 읽어 게이지로 출력
+def _cache_counts(cache):
+    if cache is None:
+        return {}
+    st = cache.stats()
+    return {("hit",): st["hits"], ("miss",): st["misses"]}
+
+metrics.GaugeCallback("connectdog_embedding_cache_lookups", "임베딩 캐시 조회 수 (result)",
+                      lambda: _cache_counts(llm_animal.embedding_cache), ("result",))
+metrics.GaugeCallback("connectdog_analysis_cache_lookups", "gpt-4o 분석 캐시 조회 수 (result)",
+                      lambda: _cache_counts(llm_animal.analysis_cache), ("result",))
+metrics.GaugeCallback("connectdog_adapt_query_cache_entries", "/api/adapt 결과 캐시 항목 수",
+                      lambda: g_adapt_cache.stats()["entries"])
+metrics.GaugeCallback("connectdog_adapt_query_shared", "/api/adapt 진행 중인 동일 쿼리 결과를 나눠 받은 횟수",
+                      lambda: g_adapt_flight.shared)
+metrics.GaugeCallback("connectdog_db_pool_connections", "MySQL 커넥션 풀 연결 수 (state=in_use|idle)",
+                      lambda: {("in_use",): g_db_pool.stats()["in_use"], ("idle",): g_db_pool.stats()["idle"]}, ("state",))
+metrics.GaugeCallback("connectdog_snapshot_items", "공개된 스냅샷의 항목 수 (db)",
+                      lambda: {(name,): len(g_snapshots.get(name).store) for name in SNAPSHOT_SOURCES if g_snapshots.get(name)},
+                      ("db",))
+
+# ◀◀ [신규] Prometheus 스크랩 엔드포인트
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 # ◀◀ [핵심 수정] 새로고침 API (비동기 처리)
+# (db 파라미터: missing / adopt / all, 기본값 all = 기존 동작)
 @app.route('/api/refresh_index', methods=['POST', 'GET'])
 def refresh_index():
-    print("\n[요청 수신] /api/refresh_index (Hot Reload - Background)")
+    target = request.args.get('db') or (request.get_json(silent=True) or {}).get('db') or "all"
+    print(f"\n[요청 수신] /api/refresh_index (Hot Reload - Background, db={target})")
 
-    # 1. 백그라운드에서 실행할 내부 함수 정의
-    def background_task():
-        try:
-            print("⏳ [Background] 인덱스 갱신 및 AI 모델 리로드 시작...")
-            
-            # (오래 걸리는 작업) S3 스캔 -> JSON/Index 재생성
-            success = llm_animal.refresh_missing_data_from_db()
-            
-            if success:
-                # (메모리 로드) 전역변수 교체
-                load_ai_models()
-                print("✅ [Background] 인덱스 최신화 완료! 이제 검색에 반영됩니다.")
-            else:
-                print("❌ [Background] 인덱스 갱신 실패")
-        except Exception as e:
-            print(f"❌ [Background] 백그라운드 작업 중 에러: {e}")
-
-    # 2. 스레드 생성 및 시작 (즉시 리턴됨)
-    thread = threading.Thread(target=background_task)
-    thread.daemon = True # 메인 프로세스가 죽으면 같이 죽도록 설정
-    thread.start()
-
-    # 3. 기다리지 않고 바로 성공 응답 반환 (0.1초 소요)
-    return jsonify({"message": "백그라운드에서 인덱스 갱신이 시작되었습니다. (잠시 후 반영됨)"})
+    # 기다리지 않고 바로 응답 반환 (작업은 백그라운드 스레드 1개에서 차례로 실행)
+    body, status = refresh_response(target)
+    return jsonify(body), status
+
+# ◀◀ [신규] 새로고침 작업 상태 (실행 중 / 대기 / 최근 완료 작업의 단계별 소요 시간)
+@app.route('/api/refresh_status', methods=['GET'])
+def refresh_status():
+    return jsonify(g_refresh_jobs.status())
 
 # 7. API 서버 실행
 if __name__ == '__main__':
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+# 비동기(asyncio) API 서버 - LLM 호출이 많은 검색 엔드포인트 전용 실행 모드
+# - app.py(Flask)는 요청 1건이 gpt-4o + 임베딩 응답을 기다리는 내내 워커 스레드 1개를 점유하므로
+#   동시 사용자가 조금만 늘어도 처리량이 급감함
+# - 여기서는 OpenAI 호출을 await로 기다리는 동안 다른 요청을 처리하고,
+#   FAISS / 재정렬만 크기가 정해진 스레드 풀에서 실행 → 프로세스 1개로 수백 건 동시 처리
+# - 스냅샷(인덱스 + DB), 커넥션 풀, 알림 INSERT, 새로고침 로직은 app.py의 것을 그대로 사용
+#
+# 실행 예시) (app.py 대신 5000번 포트로 실행)
+#   hypercorn async_app:app --bind 0.0.0.0:5000
+import asyncio
+import base64
+import time
+
+from quart import Quart, request, jsonify, Response, g
+from quart_cors import cors
+
+import app as sync_app # ◀ import 시 스냅샷 백그라운드 워밍업 시작 (app.py와 동일)
+import image_preprocess
+import llm_async
+import metrics
+import query_cache
+import search_service
+
+app = cors(Quart(__name__), allow_origin="*") # ◀◀ 모든 도메인에서의 요청을 허용 (React 테스트용)
+
+# ◀ 지표 수집은 app.py와 같은 방식 (요청 = 코루틴 1개이므로 contextvars 라벨이 그대로 유지됨)
+@app.before_request
+async def start_request_metrics():
+    g.metrics_endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.set_endpoint(g.metrics_endpoint)
+    g.metrics_start = time.perf_counter()
+
+@app.after_request
+async def record_request_metrics(response):
+    endpoint = g.get("metrics_endpoint", "unmatched")
+    if endpoint != "/metrics":
+        metrics.REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - g.get("metrics_start", time.perf_counter()), endpoint=endpoint)
+    return response
+
+def snapshot_unavailable(name):
+    body = {"error": f"검색 DB({name})가 아직 준비되지 않았습니다.", "db": name, "state": sync_app.g_load_state[name]["state"]}
+    return jsonify(body), 503, {"Retry-After": str(sync_app.SNAPSHOT_RETRY_AFTER)}
+
+@app.route('/', methods=['GET'])
+async def health_check():
+    return jsonify({"status": "ok", "message": "API 서버(비동기)가 정상 작동 중입니다."})
+
+@app.route('/healthz', methods=['GET'])
+async def healthz():
+    return jsonify({"status": "ok", "uptime_seconds": round(time.time() - sync_app.g_started_at, 1)})
+
+@app.route('/readyz', methods=['GET'])
+async def readyz():
+    ready, dbs = sync_app.readiness()
+    name = request.args.get('db')
+    if name:
+        if name not in dbs:
+            return jsonify({"error": f"알 수 없는 db: {name}"}), 400
+        ready, dbs = dbs[name]["ready"], {name: dbs[name]}
+    return jsonify({"ready": ready, "dbs": dbs}), 200 if ready else 503
+
+async def read_uploaded_image():
+    """
+    app.read_uploaded_image의 비동기 버전. 본문은 청크 단위로 받고, 축소 / 재인코딩은 스레드에서 실행합니다.
+    """
+    image_preprocess.check_content_length(request.content_length, multipart=request.mimetype == 'multipart/form-data')
+    if request.mimetype == 'multipart/form-data':
+        upload = (await request.files).get('image')
+        if upload is None:
+            raise image_preprocess.ImageUploadError("'image' 파일 필드가 없습니다.")
+        raw_bytes = await asyncio.to_thread(image_preprocess.read_limited, upload.stream)
+    else:
+        chunks, total = [], 0
+        async for chunk in request.body:
+            total += len(chunk)
+            if total > image_preprocess.MAX_UPLOAD_BYTES:
+                raise image_preprocess.ImageUploadError(
+                    f"이미지가 너무 큽니다. (최대 {image_preprocess.MAX_UPLOAD_BYTES // (1024 * 1024)}MB)", status=413)
+            chunks.append(chunk)
+        raw_bytes = b"".join(chunks)
+
+    prepared, info = await asyncio.to_thread(image_preprocess.prepare_upload, raw_bytes)
+    print(f"  [업로드 전처리] {info['original_size']} {info['original_bytes'] / 1024:.0f}KB"
+          f" -> {info['prepared_size']} {info['prepared_bytes'] / 1024:.0f}KB")
+    return base64.b64encode(prepared).decode('ascii')
+
+@app.errorhandler(413)
+async def request_too_large(e):
+    return jsonify({"error": f"요청이 너무 큽니다. (이미지 최대 {image_preprocess.MAX_UPLOAD_BYTES // (1024 * 1024)}MB)"}), 413
+
+@app.route('/api/search', methods=['POST'])
+async def handle_search():
+    print("\n[요청 수신] /api/search (async)")
+    data = await request.get_json()
+    if not data or 'image_base64' not in data:
+        return jsonify({"error": "이미지 데이터가 없습니다."}), 400
+
+    start_time_total = time.time()
+    if sync_app.g_snapshots.get("adopt") is None:
+        return snapshot_unavailable("adopt")
+
+    return await search_adopt_by_image(data['image_base64'], start_time_total)
+
+@app.route('/api/search/upload', methods=['POST'])
+async def handle_search_upload():
+    print("\n[요청 수신] /api/search/upload (async)")
+    start_time_total = time.time()
+    if sync_app.g_snapshots.get("adopt") is None:
+        return snapshot_unavailable("adopt")
+
+    try:
+        image_data_b64 = await read_uploaded_image()
+    except image_preprocess.ImageUploadError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    return await search_adopt_by_image(image_data_b64, start_time_total, preprocessed=True)
+
+async def search_adopt_by_image(image_data_b64, start_time_total, preprocessed=False):
+    try:
+        query_obj = await llm_async.analyze_image_bytes_async(image_data_b64, "api_query.jpg", preprocessed)
+        if not query_obj:
+            return jsonify({"error": "LLM 분석 실패"}), 500
+
+        query_attr_emb = await llm_async.get_embeddings_for_attributes_async(query_obj)
+        if not (query_attr_emb and "__merged__" in query_attr_emb):
+            return jsonify({"error": "임베딩 생성 실패"}), 500
+
+        # ◀ 이 요청은 여기서 잡은 스냅샷 하나만 사용 (중간에 새로고침되어도 안전)
+        snap = sync_app.g_snapshots.get("adopt")
+        final_results_data = await llm_async.run_search(search_service.rank_adopt, snap, query_obj, query_attr_emb)
+
+        print(f"✅ 하이브리드 검색 완료 (총 {time.time() - start_time_total:.2f}초)")
+        return jsonify({"message": "검색 성공", "results": final_results_data})
+
+    except Exception as e:
+        print(f"❌ /api/search 처리 중 심각한 오류: {e}")
+        return jsonify({"error": str(e)}), 500
+
+# ◀ 결과 캐시는 app.py와 같은 것을 사용하고, 동시 요청 합치기만 asyncio 버전으로
+g_adapt_flight = query_cache.AsyncSingleFlight()
+
+async def compute_adapt_results(query_text, snap):
+    """
+    app.compute_adapt_results의 비동기 버전. 반환값: (결과 리스트, 오류 메시지)
+    """
+    query_obj = await llm_async.analyze_text_async(query_text)
+    if not query_obj:
+        return None, "LLM 텍스트 분석 실패"
+
+    query_attr_emb = await llm_async.get_embeddings_for_attributes_async(query_obj)
+    if not (query_attr_emb and "__merged__" in query_attr_emb):
+        return None, "임베딩 생성 실패"
+
+    return await llm_async.run_search(search_service.rank_adopt, snap, query_obj, query_attr_emb), None
+
+@app.route('/api/adapt', methods=['POST'])
+async def handle_adapt_recommendation():
+    print("\n[요청 수신] /api/adapt (async)")
+    data = await request.get_json()
+    if not data or 'query_text' not in data:
+        return jsonify({"error": "텍스트 쿼리가 없습니다."}), 400
+
+    query_text = data['query_text']
+    start_time_total = time.time()
+    snap = sync_app.g_snapshots.get("adopt")
+    if snap is None:
+        return snapshot_unavailable("adopt")
+
+    try:
+        cache_key = query_cache.make_key(query_text, snap.version)
+        final_results_data = sync_app.g_adapt_cache.get(cache_key)
+        if final_results_data is not None:
+            metrics.QUERY_CACHE.inc(cache="adapt", result="hit")
+            print(f"✅ [쿼리 캐시 적중] '{cache_key[0]}' (총 {time.time() - start_time_total:.2f}초)")
+        else:
+            metrics.QUERY_CACHE.inc(cache="adapt", result="miss")
+            final_results_data, error = await g_adapt_flight.do(cache_key, lambda: compute_adapt_results(query_text, snap))
+            if error:
+                return jsonify({"error": error}), 500
+            sync_app.g_adapt_cache.put(cache_key, final_results_data)
+            print(f"✅ 하이브리드 검색 완료 (총 {time.time() - start_time_total:.2f}초)")
+
+        return jsonify({"message": "검색 성공", "results": final_results_data})
+
+    except Exception as e:
+        print(f"❌ /api/adapt 처리 중 심각한 오류: {e}")
+        return jsonify({"error": str(e)}), 500
+
+async def analyze_batch_query(i, query):
+    kind, value = query
+    if kind == "image":
+        return await llm_async.analyze_image_bytes_async(value, f"api_batch_{i}.jpg")
+    return await llm_async.analyze_text_async(value)
+
+@app.route('/api/search/batch', methods=['POST'])
+async def handle_search_batch():
+    print("\n[요청 수신] /api/search/batch (async)")
+    try:
+        queries = sync_app.parse_batch_queries(await request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    start_time_total = time.time()
+    snap = sync_app.g_snapshots.get("adopt")
+    if snap is None:
+        return snapshot_unavailable("adopt")
+
+    try:
+        query_objs = await asyncio.gather(*(analyze_batch_query(i, q) for i, q in enumerate(queries)))
+
+        analyzed = [q for q in query_objs if q]
+        embeds = iter(await llm_async.get_embeddings_for_attributes_batch_async(analyzed) if analyzed else [])
+        query_attr_embs = [next(embeds) if q else None for q in query_objs]
+
+        entries = await llm_async.run_search(search_service.adopt_batch_entries, snap, query_objs, query_attr_embs)
+
+        print(f"✅ 배치 검색 완료 ({len(queries)}개 쿼리, 총 {time.time() - start_time_total:.2f}초)")
+        return jsonify({"message": "검색 성공", "results": entries})
+
+    except Exception as e:
+        print(f"❌ /api/search/batch 처리 중 심각한 오류: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/report_sighting', methods=['POST'])
+async def handle_sighting_report():
+    print("\n[요청 수신] /api/report_sighting (async, 실종DB 검색)")
+    data = await request.get_json() or {}
+    image_data_b64 = data.get('image_base64') # (Optional)
+    query_text = data.get('query_text')       # (Optional)
+
+    start_time_total = time.time()
+    if sync_app.g_snapshots.get("missing") is None:
+        return snapshot_unavailable("missing")
+
+    return await report_sighting(image_data_b64, query_text, start_time_total)
+
+@app.route('/api/report_sighting/upload', methods=['POST'])
+async def handle_sighting_report_upload():
+    print("\n[요청 수신] /api/report_sighting/upload (async, 실종DB 검색)")
+    start_time_total = time.time()
+    if sync_app.g_snapshots.get("missing") is None:
+        return snapshot_unavailable("missing")
+
+    try:
+        image_data_b64 = await read_uploaded_image()
+    except image_preprocess.ImageUploadError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    return await report_sighting(image_data_b64, None, start_time_total, preprocessed=True)
+
+async def report_sighting(image_data_b64, query_text, start_time_total, preprocessed=False):
+    try:
+        if image_data_b64:
+            print("[제보 유형] 사진")
+            query_obj = await llm_async.analyze_image_bytes_async(image_data_b64, "api_query_sighting.jpg", preprocessed)
+        elif query_text:
+            print("[제보 유형] 텍스트")
+            query_obj = await llm_async.analyze_text_async(query_text)
+        else:
+            return jsonify({"error": "이미지 또는 텍스트 쿼리가 필요합니다."}), 400
+
+        if not query_obj: return jsonify({"error": "LLM 쿼리 분석 실패"}), 500
+
+        query_attr_emb = await llm_async.get_embeddings_for_attributes_async(query_obj)
+        if not (query_attr_emb and "__merged__" in query_attr_emb):
+            return jsonify({"error": "임베딩 생성 실패"}), 500
+
+        # ◀ 알림 INSERT(DB)도 검색 스레드 안에서 처리되므로 이벤트 루프를 막지 않음
+        snap = sync_app.g_snapshots.get("missing")
+        final_results_data = await llm_async.run_search(search_service.rank_sighting, snap, query_obj, query_attr_emb,
+                                                        sync_app.create_notification_signal)
+
+        print(f"✅ /api/report_sighting 검색 완료 (총 {time.time() - start_time_total:.2f}초)")
+        return jsonify({"message": "검색 성공", "results": final_results_data})
+
+    except Exception as e:
+        print(f"❌ /api/report_sighting 처리 중 심각한 오류: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/index_status', methods=['GET'])
+async def index_status():
+    status = sync_app.g_snapshots.status()
+    status["ready"], status["load_state"] = sync_app.readiness()
+    status["adapt_query_cache"] = dict(sync_app.g_adapt_cache.stats(), shared_inflight=g_adapt_flight.shared)
+    status["image_preprocess"] = image_preprocess.stats() # ◀ 전처리 전/후 바이트 수
+    return jsonify(status)
+
+@app.route('/metrics', methods=['GET'])
+async def metrics_endpoint():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/api/refresh_index', methods=['POST', 'GET'])
+async def refresh_index():
+    target = request.args.get('db') or (await request.get_json(silent=True) or {}).get('db') or "all"
+    print(f"\n[요청 수신] /api/refresh_index (Hot Reload - Background, db={target})")
+    body, status = sync_app.refresh_response(target)
+    return jsonify(body), status
+
+@app.route('/api/refresh_status', methods=['GET'])
+async def refresh_status():
+    return jsonify(sync_app.g_refresh_jobs.status())
+
+if __name__ == '__main__':
+    # (개발용) 운영에서는 hypercorn으로 실행
+    app.run(host='0.0.0.0', port=5000, debug=False)
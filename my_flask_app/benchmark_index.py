@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+# FAISS 인덱스 종류별 벤치마크 (실제 DB 데이터 사용)
+# - DB 항목 일부를 쿼리로 떼어내고(hold-out), 나머지로 인덱스를 만들어
+#   정확한 flat 인덱스 결과 대비 recall@K_CANDIDATES / 지연 시간 / 인덱스 메모리를 비교합니다.
+# - 검색은 실제 서비스와 같이 쿼리와 같은 종의 파티션 안에서만 수행
+#
+# 실행 예시)
+#   python benchmark_index.py adopt
+#   python benchmark_index.py missing 300
+import sys
+import time
+
+import faiss
+import numpy as np
+
+import index_manager
+import llm_animal
+
+DB_FILES = {
+    "adopt": llm_animal.DB_FILE,
+    "missing": llm_animal.MISSING_DB_FILE,
+}
+DEFAULT_QUERIES = 200
+RANDOM_SEED = 0
+
+# ◀ (구축 파라미터, [검색 시점 파라미터 후보들]) - 구축은 1번, 검색 파라미터만 바꿔가며 측정
+BENCHMARK_CONFIGS = [
+    ({"type": "flat"}, [{}]),
+    ({"type": "hnsw", "M": 32, "efConstruction": 200}, [{"efSearch": 64}, {"efSearch": 128}, {"efSearch": 256}]),
+    ({"type": "ivf_flat", "nlist": 256}, [{"nprobe": 8}, {"nprobe": 16}, {"nprobe": 32}]),
+    ({"type": "ivf_pq", "nlist": 256, "m": 64, "nbits": 8}, [{"nprobe": 16}, {"nprobe": 32}]),
+]
+
+def split_queries(store, n_queries):
+    """
+    merged 벡터가 있는 행 중 n_queries개를 쿼리로, 나머지를 인덱스 대상으로 나눕니다.
+    """
+    _, merged_valid = store.merged_vectors()
+    valid_rows = np.flatnonzero(merged_valid)
+    rng = np.random.default_rng(RANDOM_SEED)
+    query_rows = np.sort(rng.choice(valid_rows, size=min(n_queries, len(valid_rows) // 2), replace=False))
+    base_rows = np.setdiff1d(valid_rows, query_rows)
+    return query_rows, base_rows
+
+def normalized_merged(store, rows):
+    merged, _ = store.merged_vectors()
+    vectors = np.ascontiguousarray(merged[rows], dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+def run_queries(index, partitions, query_vectors, query_species, k):
+    """
+    쿼리를 1개씩 검색하며 (결과 ID 리스트, 쿼리별 지연 시간 ms 배열)을 반환합니다.
+    """
+    results = []
+    latencies = []
+    for q, species in zip(query_vectors, query_species):
+        partition = partitions.get(species)
+        start = time.perf_counter()
+        _, I = index_manager.search_partition(index, q[None, :], k, partition)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([int(i) for i in I[0] if i != -1])
+    return results, np.array(latencies)
+
+def recall_at_k(results, truth):
+    hits = sum(len(set(r) & set(t)) for r, t in zip(results, truth))
+    total = sum(len(t) for t in truth)
+    return hits / total if total else 1.0
+
+def main():
+    db_name = sys.argv[1] if len(sys.argv) > 1 else "adopt"
+    if db_name not in DB_FILES:
+        print(f"❌ [실행 오류] DB 이름은 {', '.join(DB_FILES)} 중 하나여야 합니다.")
+        sys.exit()
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_QUERIES
+    k = llm_animal.K_CANDIDATES
+
+    store = llm_animal.load_db(DB_FILES[db_name])
+    query_rows, base_rows = split_queries(store, n_queries)
+    if len(query_rows) == 0:
+        print(f"❌ '{DB_FILES[db_name]}'에 벤치마크할 항목이 부족합니다. ({len(store)}개)")
+        sys.exit()
+
+    base_store = store.take(base_rows)
+    base_vectors = normalized_merged(store, base_rows)
+    query_vectors = normalized_merged(store, query_rows)
+    query_species = [index_manager.species_key(store.attributes[r].get(index_manager.SPECIES_ATTR)) for r in query_rows]
+    print(f"--- [벤치마크] {db_name}: 인덱스 {len(base_rows)}개, 쿼리 {len(query_rows)}개, K={k} ---")
+
+    truth = None
+    rows_out = []
+    for build_params, query_param_list in BENCHMARK_CONFIGS:
+        start = time.time()
+        try:
+            index, built = index_manager.build_index(base_vectors, base_store.ids, llm_animal.VECTOR_DIMENSION, build_params)
+        except Exception as e:
+            print(f"⚠️ {build_params['type']} 구축 실패: {e}")
+            continue
+        build_seconds = time.time() - start
+        memory_mb = faiss.serialize_index(index).nbytes / 1e6
+        groups = index_manager.build_species_partitions(index, base_store)
+        partitions = {key: index_manager.SpeciesPartition(ids) for key, ids in groups.items()}
+
+        for query_params in query_param_list:
+            index_manager.apply_query_params(index, query_params)
+            results, latencies = run_queries(index, partitions, query_vectors, query_species, k)
+            if truth is None:
+                truth = results # ◀ 첫 설정(flat)의 결과가 정답
+            label = " ".join(f"{key}={value}" for key, value in {**built, **query_params}.items() if key != "type")
+            rows_out.append((built["type"], label, recall_at_k(results, truth),
+                             np.percentile(latencies, 50), np.percentile(latencies, 95),
+                             memory_mb, build_seconds))
+
+    print(f"\n{'종류':<9} {'파라미터':<40} {'recall@' + str(k):>11} {'p50(ms)':>9} {'p95(ms)':>9} {'메모리(MB)':>11} {'구축(초)':>9}")
+    for kind, label, recall, p50, p95, memory_mb, build_seconds in rows_out:
+        print(f"{kind:<9} {label:<40} {recall:>11.4f} {p50:>9.3f} {p95:>9.3f} {memory_mb:>11.1f} {build_seconds:>9.1f}")
+
+if __name__ == "__main__":
+    main()
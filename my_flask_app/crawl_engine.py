@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+# 크롤러 공용 비동기 HTTP 엔진 (httpx.AsyncClient 1개 + 연결 재사용)
+# - 기존 animal_crawler.py는 목록 / 상세 / 사진마다 requests.get을 새로 호출하여 매번 kcanimal.or.kr에
+#   TLS 연결을 새로 맺었고, 5개 스레드 풀 안에 다시 5개 스레드 풀을 만들어 동시 요청 수가 최대 25개까지 제멋대로 늘어남
+# - 변경: 요청은 모두 이 엔진을 거침
+#   - keep-alive 연결 풀 재사용
+#   - 전체 동시 요청 수 상한 (max_concurrency) + 호스트별 동시 요청 수 / 최소 간격 (서버 예의)
+#   - 네트워크 오류 / 429 / 5xx는 지수 백오프로 재시도 (Retry-After가 있으면 그 값을 따름)
+#   - 종류(list / detail / image)별 요청 수, 받은 바이트, 304(변경 없음) 수, 초당 페이지 수 통계
+#
+# 사용 예시)
+#   async with crawl_engine.CrawlEngine(headers=HEADERS) as engine:
+#       html = await engine.fetch_text(url, kind="list", encoding="euc-kr")
+#       image_bytes = await engine.fetch_bytes(image_url, kind="image")
+#   engine.print_stats()
+import asyncio
+import random
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+DEFAULT_CONCURRENCY = 8    # ◀ 전체 동시 요청 수 상한
+DEFAULT_PER_HOST = 4       # ◀ 호스트 1개에 대한 동시 요청 수 상한
+DEFAULT_HOST_INTERVAL = 0.1 # ◀ (초) 같은 호스트에 요청을 시작하는 최소 간격
+DEFAULT_TIMEOUT = 10       # ◀ (초) 요청 1회 타임아웃
+DEFAULT_RETRIES = 3        # ◀ 첫 시도 이후 재시도 횟수
+DEFAULT_BACKOFF = 0.5      # ◀ (초) 재시도 대기 = backoff * 2^시도 + 지터
+MAX_RETRY_AFTER = 30       # ◀ (초) 서버가 준 Retry-After 상한
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class CrawlError(Exception):
+    """
+    재시도를 모두 써도 실패한 요청. (status: 마지막 HTTP 코드, 네트워크 오류면 None)
+    """
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+class _HostGate:
+    """
+    호스트 1개의 동시 요청 수와 요청 시작 간격을 제한합니다.
+    """
+
+    def __init__(self, per_host, interval):
+        self.semaphore = asyncio.Semaphore(per_host)
+        self.interval = interval
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def wait_turn(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+class CrawlEngine:
+    """
+    크롤링 1회(job) 동안 사용하는 HTTP 엔진. async with 블록 안에서만 사용합니다.
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST,
+                 host_interval=DEFAULT_HOST_INTERVAL, timeout=DEFAULT_TIMEOUT,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, headers=None):
+        self.max_concurrency = max_concurrency
+        self.per_host = per_host
+        self.host_interval = host_interval
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.headers = headers or {}
+        self._client = None
+        self._semaphore = None
+        self._hosts = {}
+        self._started_at = None
+        self._finished_at = None
+        self._stats = {} # ◀ kind -> {"pages", "bytes", "requests", "retries", "failures", "not_modified"}
+
+    async def __aenter__(self):
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        self._client = httpx.AsyncClient(headers=self.headers, timeout=self.timeout, limits=limits, follow_redirects=True)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._started_at = time.monotonic()
+        self._finished_at = None
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._finished_at = time.monotonic()
+        await self._client.aclose()
+        self._client = None
+
+    def _host_gate(self, url):
+        host = urlsplit(url).netloc
+        gate = self._hosts.get(host)
+        if gate is None:
+            gate = self._hosts[host] = _HostGate(self.per_host, self.host_interval)
+        return gate
+
+    def _count(self, kind, **amounts):
+        entry = self._stats.setdefault(kind, {"pages": 0, "bytes": 0, "requests": 0, "retries": 0, "failures": 0,
+                                              "not_modified": 0})
+        for key, amount in amounts.items():
+            entry[key] += amount
+
+    def _retry_delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(int(retry_after), MAX_RETRY_AFTER)
+        return self.backoff * (2 ** attempt) + random.uniform(0, self.backoff)
+
+    async def fetch(self, url, kind="page", **kwargs):
+        """
+        GET url을 실행하고 성공한 httpx.Response를 반환합니다. (본문은 모두 읽은 상태, 조건부 GET이면 304도 성공)
+        네트워크 오류 / RETRY_STATUS는 재시도하고, 끝내 실패하거나 그 밖의 4xx면 CrawlError.
+        """
+        gate = self._host_gate(url)
+        last_error, last_status = None, None
+        for attempt in range(self.retries + 1):
+            response = None
+            async with self._semaphore, gate.semaphore:
+                await gate.wait_turn()
+                self._count(kind, requests=1)
+                try:
+                    response = await self._client.get(url, **kwargs)
+                except httpx.TransportError as e:
+                    last_error, last_status = e, None
+                else:
+                    if response.status_code < 400:
+                        self._count(kind, pages=1, bytes=len(response.content),
+                                    not_modified=int(response.status_code == 304)) # ◀ 조건부 GET
+                        return response
+                    last_error, last_status = f"HTTP {response.status_code}", response.status_code
+                    if response.status_code not in RETRY_STATUS:
+                        break
+
+            if attempt < self.retries:
+                self._count(kind, retries=1)
+                await asyncio.sleep(self._retry_delay(attempt, response)) # ◀ 대기 중에는 동시 요청 자리를 비워둠
+
+        self._count(kind, failures=1)
+        raise CrawlError(f"요청 실패 ({kind}): {url} ({last_error})", status=last_status)
+
+    async def fetch_text(self, url, kind="page", encoding=None, **kwargs):
+        response = await self.fetch(url, kind=kind, **kwargs)
+        if encoding:
+            response.encoding = encoding # ◀ (예: kcanimal.or.kr은 euc-kr)
+        return response.text
+
+    async def fetch_bytes(self, url, kind="image", **kwargs):
+        response = await self.fetch(url, kind=kind, **kwargs)
+        return response.content
+
+    def stats(self):
+        """
+        종류별 통계와 합계, 초당 페이지 수를 반환합니다.
+        """
+        if self._started_at is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self._finished_at or time.monotonic()) - self._started_at
+        total = {"pages": 0, "bytes": 0, "requests": 0, "retries": 0, "failures": 0, "not_modified": 0}
+        for entry in self._stats.values():
+            for key in total:
+                total[key] += entry[key]
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "pages_per_second": total["pages"] / elapsed if elapsed else 0.0,
+            "total": total,
+            "by_kind": {kind: dict(entry) for kind, entry in self._stats.items()},
+        }
+
+    def print_stats(self):
+        st = self.stats()
+        total = st["total"]
+        print(f"📊 [크롤링 엔진] {total['pages']}개 응답, {total['bytes'] / 1048576:.1f}MB, "
+              f"{st['elapsed_seconds']:.1f}초 ({st['pages_per_second']:.1f} pages/s), "
+              f"재시도 {total['retries']}회, 실패 {total['failures']}건")
+        for kind, entry in sorted(st["by_kind"].items()):
+            print(f"    - {kind}: {entry['pages']}개 (304 {entry['not_modified']}개), {entry['bytes'] / 1048576:.1f}MB, "
+                  f"실패 {entry['failures']}건")
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# 증분 크롤링 상태 파일 (BOARD_IDX -> 목록 내용 지문 + 마지막으로 저장한 DB 행)
+# - 기존 job_crawl_and_save는 실행할 때마다 목록 / 상세 / 사진을 전부 다시 받았지만,
+#   실행 사이에 바뀌는 공고는 몇 개뿐임
+# - 목록 항목의 내용(링크 + 이름 / 상태 + 구조 장소·날짜·나이·성별·무게)으로 지문을 만들어,
+#   아는 공고이고 지문이 같으면 상세 페이지 / 사진 요청을 생략함
+# - 주기적인 전체 순회(full sweep) 때 목록에서 사라진 공고를 상태에서도 제거
+#
+# 파일 형식 (JSON)
+#   {"version": 1, "last_full_sweep": 1718000000.0,
+#    "postings": {"38576": {"fp": "…", "row": [...] 또는 null, "updated_at": 1718000000.0}}}
+#   row가 null이면 필수 정보가 없어 DB에 저장하지 않은 공고 (다음에도 상세 요청 생략)
+import hashlib
+import json
+import os
+import time
+from datetime import date
+
+STATE_VERSION = 1
+
+def fingerprint(*parts):
+    """
+    목록 항목의 텍스트 조각들로 지문을 만듭니다. (공백 차이는 무시)
+    """
+    text = "\x1f".join(" ".join(str(p).split()) for p in parts)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+class CrawlState:
+    """
+    증분 크롤링 상태. date_columns: 행에서 date 값인 열 위치 (JSON 저장 시 ISO 문자열로 변환)
+    """
+
+    def __init__(self, path, date_columns=()):
+        self.path = path
+        self.date_columns = tuple(date_columns)
+        self.postings = {}
+        self.last_full_sweep = None
+        self.seen = set() # ◀ 이번 실행에서 목록에서 본 BOARD_IDX
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != STATE_VERSION:
+                print(f"⚠️ [증분 크롤링] 상태 파일 버전이 달라 새로 시작합니다: {self.path}")
+                return
+            self.postings = data.get("postings", {})
+            self.last_full_sweep = data.get("last_full_sweep")
+            print(f"  [증분 크롤링] 상태 파일 로드: 공고 {len(self.postings)}개")
+        except Exception as e:
+            print(f"⚠️ [증분 크롤링] 상태 파일 로드 실패 (새로 시작): {e}")
+            self.postings = {}
+            self.last_full_sweep = None
+
+    def needs_full_sweep(self, interval):
+        """
+        상태가 비었거나 마지막 전체 순회 후 interval초가 지났으면 True.
+        """
+        return not self.postings or self.last_full_sweep is None or time.time() - self.last_full_sweep >= interval
+
+    def is_unchanged(self, board_idx, fp):
+        entry = self.postings.get(str(board_idx))
+        self.seen.add(str(board_idx))
+        return entry is not None and entry["fp"] == fp
+
+    def known_row(self, board_idx):
+        """
+        마지막으로 저장한 DB 행(튜플)을 반환합니다. (저장하지 않은 공고면 None)
+        """
+        values = self.postings[str(board_idx)]["row"]
+        if values is None:
+            return None
+        return tuple(date.fromisoformat(v) if i in self.date_columns and v else v for i, v in enumerate(values))
+
+    def record(self, board_idx, fp, row):
+        self.seen.add(str(board_idx))
+        values = None
+        if row is not None:
+            values = [v.isoformat() if isinstance(v, date) else v for v in row]
+        self.postings[str(board_idx)] = {"fp": fp, "row": values, "updated_at": time.time()}
+
+    def prune_unseen(self):
+        """
+        (전체 순회 후) 이번 실행에서 목록에 없던 공고를 제거하고, 제거한 수를 반환합니다.
+        """
+        removed = [key for key in self.postings if key not in self.seen]
+        for key in removed:
+            del self.postings[key]
+        return len(removed)
+
+    def save(self, full_sweep=False):
+        """
+        임시 파일에 쓴 뒤 교체합니다. (DB 저장이 끝난 뒤에만 호출)
+        """
+        if full_sweep:
+            self.last_full_sweep = time.time()
+        data = {"version": STATE_VERSION, "last_full_sweep": self.last_full_sweep, "postings": self.postings}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        print(f"  [증분 크롤링] 상태 파일 저장: 공고 {len(self.postings)}개 ({self.path})")
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+# MySQL(pymysql) 커넥션 풀
+# - 요청마다 pymysql.connect()로 TCP 연결 + 인증을 새로 하던 것을, 열어둔 연결을 재사용하도록 변경
+# - app.py / animal_crawler.py / notification_worker.py 공용
+#
+# 사용 예시)
+#   g_db_pool = db_pool.ConnectionPool(DB_CONFIG, max_size=8)
+#   with g_db_pool.connection() as conn:
+#       with conn.cursor() as curs:
+#           curs.execute(...)
+#       conn.commit()
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pymysql
+
+DEFAULT_MAX_SIZE = 8
+DEFAULT_IDLE_TIMEOUT = 300   # ◀ (초) 이보다 오래 쉰 연결은 닫음 (서버 wait_timeout보다 짧게)
+DEFAULT_PING_INTERVAL = 30   # ◀ (초) 이보다 오래 쉰 연결은 꺼내기 전에 ping으로 확인
+DEFAULT_ACQUIRE_TIMEOUT = 10 # ◀ (초) 풀이 가득 찼을 때 빈 연결을 기다리는 최대 시간
+
+# ◀ 연결 자체가 끊긴 경우의 에러 (이 연결은 풀에 돌려놓지 않고 버림)
+CONNECTION_ERRORS = (pymysql.err.OperationalError, pymysql.err.InterfaceError, ConnectionError, OSError)
+
+class PoolTimeoutError(Exception):
+    pass
+
+class ConnectionPool:
+    """
+    스레드 안전한 pymysql 커넥션 풀.
+    - 최대 max_size개까지 연결을 만들고, 모두 사용 중이면 acquire_timeout초까지 대기
+    - 오래 쉰 연결은 ping(reconnect=True)으로 확인, idle_timeout을 넘긴 연결은 닫음
+    - 돌려받을 때 커밋하지 않은 트랜잭션은 rollback (연결을 닫던 기존 동작과 동일)
+    """
+
+    def __init__(self, db_config, max_size=DEFAULT_MAX_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 ping_interval=DEFAULT_PING_INTERVAL, acquire_timeout=DEFAULT_ACQUIRE_TIMEOUT, name="db"):
+        self.db_config = dict(db_config)
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+        self.acquire_timeout = acquire_timeout
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size) # ◀ (사용 중 + 대기 중) 연결 수 상한
+        self._idle = deque() # ◀ (연결, 반납 시각) - 최근에 반납된 연결부터 재사용 (LIFO)
+        self._borrowed = set() # ◀ 이 프로세스(세대)에서 빌려준 연결의 id (fork 전에 빌린 연결 구분용)
+        self._pid = os.getpid()
+
+        self._created = 0
+        self._reused = 0
+        self._discarded = 0
+        self._in_use = 0
+
+    def _connect(self):
+        conn = pymysql.connect(**self.db_config)
+        with self._lock:
+            self._created += 1
+        return conn
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._discarded += 1
+
+    def _check_fork(self):
+        # ◀ fork된 자식 프로세스는 부모의 소켓을 공유하면 안 되므로 대기 연결을 버리고 새로 시작
+        #   (부모 소켓에 QUIT을 보내지 않도록 close() 없이 버림)
+        if self._pid != os.getpid():
+            with self._lock:
+                self._idle.clear()
+                self._borrowed = set()
+                self._slots = threading.BoundedSemaphore(self.max_size)
+                self._in_use = 0
+                self._pid = os.getpid()
+
+    def _take_idle(self):
+        """
+        대기 중인 연결 하나를 꺼냅니다. 너무 오래 쉰 연결은 닫고, 애매하게 쉰 연결은 ping으로 확인합니다.
+        """
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                conn, released_at = self._idle.pop()
+            idle_seconds = time.time() - released_at
+            if idle_seconds > self.idle_timeout:
+                self._close_quietly(conn)
+                continue
+            if idle_seconds > self.ping_interval:
+                try:
+                    conn.ping(reconnect=True) # ◀ 서버가 끊었으면 같은 객체로 재연결
+                except Exception:
+                    self._close_quietly(conn)
+                    continue
+            with self._lock:
+                self._reused += 1
+            return conn
+
+    def acquire(self):
+        self._check_fork()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise PoolTimeoutError(f"[{self.name}] {self.acquire_timeout}초 안에 DB 연결을 얻지 못했습니다. (최대 {self.max_size}개 사용 중)")
+        try:
+            conn = self._take_idle() or self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._borrowed.add(id(conn))
+            self._in_use += 1
+        return conn
+
+    def release(self, conn, discard=False):
+        self._check_fork()
+        with self._lock:
+            owned = id(conn) in self._borrowed
+            self._borrowed.discard(id(conn))
+        if not owned:
+            # ◀ fork 전에 (부모 프로세스에서) 빌린 연결: 소켓을 부모와 공유하므로 재사용하지도 닫지도(QUIT) 않고 버리며,
+            #   새 세마포어의 자리도 돌려주지 않음 (이 프로세스에서 빌린 적이 없으므로)
+            with self._lock:
+                self._discarded += 1
+            return
+        if not discard:
+            try:
+                conn.rollback() # ◀ 커밋하지 않은 작업은 버리고, 다음 사용자는 새 트랜잭션으로 시작
+            except Exception:
+                discard = True
+        if discard:
+            self._close_quietly(conn)
+        else:
+            with self._lock:
+                self._idle.append((conn, time.time()))
+        with self._lock:
+            self._in_use -= 1
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """
+        with 블록 동안 연결 하나를 빌려줍니다. 블록 안에서 예외가 나면 rollback하고,
+        연결 자체가 끊긴 에러였다면 그 연결은 풀에 돌려놓지 않습니다.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        except CONNECTION_ERRORS:
+            self.release(conn, discard=True)
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def close_all(self):
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "created": self._created,
+                "reused": self._reused,
+                "discarded": self._discarded,
+            }
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# 속성 텍스트 임베딩 디스크 캐시
+# - 키: sha256(모델명 + 정규화된 텍스트)
+# - 값: float32 바이너리 벡터 (JSON 대비 약 1/5 크기)
+# - SQLite(WAL) 파일 하나를 app.py / animal_crawler.py / llm_animal.py CLI가 함께 사용
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 200000 # ◀ 약 200,000 x 3072 x 4byte = 약 2.4GB 상한
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_text(text):
+    """
+    캐시 키 생성을 위해 텍스트를 정규화합니다. (유니코드 NFC + 앞뒤/연속 공백 정리)
+    """
+    text = unicodedata.normalize("NFC", str(text))
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+def make_cache_key(model, text):
+    raw = f"{model}\x00{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+class EmbeddingCache:
+    """
+    임베딩 결과를 저장하는 LRU(최근 사용 순) 디스크 캐시.
+    여러 프로세스가 같은 파일을 열어도 SQLite 잠금으로 안전하게 공유됩니다.
+    """
+
+    def __init__(self, db_path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._local = threading.local() # ◀ SQLite 연결은 스레드별로 따로 사용
+        self._stats_lock = threading.Lock()
+
+        # ◀ 절감 효과 측정용 카운터 (프로세스 단위)
+        self.hits = 0
+        self.misses = 0
+        self.requests_avoided = 0   # 캐시만으로 처리되어 API 요청 자체가 생략된 횟수
+        self.api_requests = 0       # 실제로 나간 API 요청 수
+        self.api_time_ms = 0.0      # 실제 API 요청에 걸린 총 시간
+
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vec BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            db_dir = os.path.dirname(os.path.abspath(self.db_path))
+            os.makedirs(db_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, model, texts):
+        """
+        texts와 같은 순서로 벡터(list[float]) 또는 None(캐시 없음)을 반환합니다.
+        """
+        if not texts:
+            return []
+
+        keys = [make_cache_key(model, t) for t in texts]
+        found = {}
+        conn = self._conn()
+        unique_keys = list(dict.fromkeys(keys))
+
+        # ◀ SQLite 변수 개수 제한(999)을 넘지 않도록 나눠서 조회
+        for start in range(0, len(unique_keys), 500):
+            chunk = unique_keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(f"SELECT key, vec FROM embeddings WHERE key IN ({placeholders})", chunk).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+        if found:
+            now = time.time()
+            try:
+                conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, k) for k in found])
+                conn.commit()
+            except sqlite3.OperationalError as e:
+                # (방어 코드) 다른 프로세스가 쓰는 중이라 갱신에 실패해도 조회 결과는 그대로 사용
+                print(f"⚠️ [임베딩 캐시] 최근 사용 시각 갱신 실패: {e}")
+
+        results = [found.get(k) for k in keys]
+        hit_count = sum(1 for r in results if r is not None)
+        with self._stats_lock:
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+            if hit_count == len(results):
+                self.requests_avoided += 1
+        return results
+
+    def put_many(self, model, texts, vectors):
+        """
+        (텍스트, 벡터) 쌍을 저장합니다. 벡터가 None인 항목(임베딩 실패)은 저장하지 않습니다.
+        """
+        now = time.time()
+        rows = []
+        for text, vec in zip(texts, vectors):
+            if vec is None:
+                continue
+            arr = np.asarray(vec, dtype=np.float32)
+            rows.append((make_cache_key(model, text), model, int(arr.shape[0]), arr.tobytes(), now))
+        if not rows:
+            return
+
+        conn = self._conn()
+        try:
+            conn.executemany("INSERT OR REPLACE INTO embeddings (key, model, dim, vec, last_access) VALUES (?, ?, ?, ?, ?)", rows)
+            conn.commit()
+            self._evict_if_needed(conn)
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ [임베딩 캐시] 저장 실패 (캐시 없이 계속 진행): {e}")
+
+    def _evict_if_needed(self, conn):
+        count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        # ◀ 상한의 90%까지 오래 사용하지 않은 항목부터 삭제 (매 저장마다 삭제가 일어나지 않도록 여유 확보)
+        to_delete = count - int(self.max_entries * 0.9)
+        conn.execute("""
+            DELETE FROM embeddings WHERE key IN (
+                SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?
+            )
+        """, (to_delete,))
+        conn.commit()
+        print(f"🧹 [임베딩 캐시] 오래된 항목 {to_delete}개 삭제 (상한 {self.max_entries}개)")
+
+    def record_api_call(self, elapsed_ms):
+        with self._stats_lock:
+            self.api_requests += 1
+            self.api_time_ms += elapsed_ms
+
+    def stats(self):
+        """
+        캐시 적중/미스 횟수와 절감된 API 요청 수, 추정 절감 시간(ms)을 반환합니다.
+        """
+        with self._stats_lock:
+            total = self.hits + self.misses
+            avg_ms = (self.api_time_ms / self.api_requests) if self.api_requests else 0.0
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "api_requests": self.api_requests,
+                "requests_avoided": self.requests_avoided,
+                "avg_api_ms": avg_ms,
+                "saved_ms_estimate": self.requests_avoided * avg_ms,
+            }
+
+    def entry_count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
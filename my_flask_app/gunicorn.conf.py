@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# gunicorn 멀티 워커 실행 설정 (gunicorn -c gunicorn.conf.py app:app)
+# - preload_app: 마스터가 app.py와 faiss / numpy 등을 1번 import한 뒤 fork
+#   스냅샷(인덱스 + DB)은 워커마다 fork 후 백그라운드로 로드하지만, 인덱스 / 벡터는 읽기 전용 메모리 맵이라
+#   워커 수와 관계없이 같은 페이지 캐시를 공유
+# - gc.freeze(): fork 전에 만든 객체를 GC 대상에서 빼서, GC가 참조 카운트 헤더를 건드려
+#   공유 페이지가 워커마다 복사(copy-on-write)되는 것을 줄임
+# - 새로고침은 요청을 받은 워커 1개에서만 실행되므로, 나머지 워커는 스냅샷 감시 스레드가
+#   파일 변경을 감지하여 다시 로드함 (app.start_snapshot_watcher)
+import gc
+import os
+
+# ◀ 마스터에서는 워밍업 스레드를 띄우지 않음 (스레드는 fork 후 사라지고, 로드 중인 잠금이 워커로 복사될 수 있음)
+os.environ.setdefault("CONNECTDOG_WARMUP", "manual")
+
+bind = "0.0.0.0:5000"
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+worker_class = "gthread"
+threads = 4
+preload_app = True
+timeout = 120 # ◀ 이미지 분석(gpt-4o) 요청이 수십 초 걸릴 수 있음
+
+def pre_fork(server, worker):
+    gc.freeze()
+
+def post_fork(server, worker):
+    import app
+    app.start_warmup() # ◀ 워커는 바로 요청을 받고, DB는 백그라운드에서 로드 (준비 전에는 503)
+    app.start_snapshot_watcher()
+    server.log.info(f"스냅샷 감시 시작 (pid {worker.pid})")
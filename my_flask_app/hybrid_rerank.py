@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# 하이브리드 검색 2단계(본선) 벡터화 재정렬
+# - DB의 속성별 임베딩을 미리 L2 정규화된 float32 행렬(아이템 x 차원)로 묶어두고,
+#   후보 전체의 점수를 속성별 행렬곱 몇 번으로 계산합니다.
+# - llm_animal.compare_query_to_item (속성별 cosine 루프)과 같은 점수를 냅니다.
+import numpy as np
+
+NORM_EPS = 1e-10
+
+def normalize_rows(mat):
+    """
+    각 행을 L2 정규화합니다. (노름은 float64로 계산, 영벡터는 그대로 0)
+    """
+    mat64 = np.asarray(mat, dtype=np.float64)
+    norms = np.linalg.norm(mat64, axis=-1, keepdims=True)
+    return mat64 / (norms + NORM_EPS)
+
+class PackedEmbeddings:
+    """
+    아이템 N개의 속성별 임베딩 묶음.
+    - keys: 속성 이름 순서 (A개)
+    - vectors: {속성 이름: (N, D) 정규화된 행렬}
+    - valid: (N, A) bool, 해당 아이템에 그 속성 벡터가 있는지 여부
+    """
+
+    def __init__(self, keys, vectors, valid):
+        self.keys = list(keys)
+        self.vectors = vectors
+        self.valid = valid
+
+    def __len__(self):
+        return self.valid.shape[0]
+
+def pack_items(items, keys, dim, dtype=np.float32):
+    """
+    JSON DB 아이템 리스트(각 아이템의 "attr_embeddings")를 PackedEmbeddings로 변환합니다.
+    """
+    n = len(items)
+    valid = np.zeros((n, len(keys)), dtype=bool)
+    vectors = {}
+
+    for a, key in enumerate(keys):
+        mat = np.zeros((n, dim), dtype=dtype)
+        for i, item in enumerate(items):
+            vec = item.get("attr_embeddings", {}).get(key)
+            if vec is None:
+                continue
+            mat[i] = normalize_rows(vec)
+            valid[i, a] = True
+        vectors[key] = mat
+
+    return PackedEmbeddings(keys, vectors, valid)
+
+def pack_query(query_attr_emb, keys, dim):
+    """
+    쿼리 임베딩 딕셔너리를 (A, D) 정규화 행렬과 (A,) 유효 마스크로 변환합니다.
+    """
+    q = np.zeros((len(keys), dim), dtype=np.float64)
+    q_valid = np.zeros(len(keys), dtype=bool)
+    for a, key in enumerate(keys):
+        vec = query_attr_emb.get(key)
+        if vec is None:
+            continue
+        q[a] = normalize_rows(vec)
+        q_valid[a] = True
+    return q, q_valid
+
+def score_candidates(packed, query_attr_emb, rows, weights, exponent=3.0):
+    """
+    후보 행(rows)들의 하이브리드 점수를 한 번에 계산하여 (len(rows),) 배열로 반환합니다.
+    - weights: {속성 이름: 가중치}
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    if rows.size == 0:
+        return np.zeros(0, dtype=np.float64)
+
+    dim = next(iter(packed.vectors.values())).shape[1]
+    q, q_valid = pack_query(query_attr_emb, packed.keys, dim)
+    w = np.array([weights.get(k, 0.0) for k in packed.keys], dtype=np.float64)
+
+    # ◀ (N, A) 비교 가능 마스크: 쿼리와 아이템 양쪽 모두 벡터가 있고, 가중치가 있는 속성만
+    mask = packed.valid[rows] & q_valid[None, :] & np.array([k in weights for k in packed.keys])[None, :]
+
+    sims = np.zeros((rows.size, len(packed.keys)), dtype=np.float64)
+    for a, key in enumerate(packed.keys):
+        if not q_valid[a] or key not in weights:
+            continue
+        # ◀ (핵심) 후보 전체 x 쿼리 속성 벡터를 행렬곱 1번으로 계산
+        sims[:, a] = np.asarray(packed.vectors[key][rows], dtype=np.float64) @ q[a]
+
+    calibrated = ((sims + 1) / 2) ** exponent
+    weighted = np.where(mask, calibrated * w[None, :], 0.0)
+    total_w = (mask * w[None, :]).sum(axis=1)
+    score = weighted.sum(axis=1)
+
+    # (방어 코드) 유효한 비교가 하나도 없었다면 0 반환
+    return np.where(total_w == 0, 0.0, score / (total_w + 1e-8))
+
+def score_candidates_batch(packed, query_attr_embs, rows_list, weights, exponent=3.0):
+    """
+    쿼리 여러 개의 후보 점수를 한 번에 계산합니다. (score_candidates와 같은 점수)
+    - query_attr_embs[i]의 후보 행이 rows_list[i]
+    - 모든 쿼리의 후보를 이어 붙여, 속성마다 (후보 전체 x 차원) 행렬 1번으로 계산
+    반환값: 쿼리별 (len(rows_list[i]),) 점수 배열 리스트
+    """
+    counts = [len(rows) for rows in rows_list]
+    if sum(counts) == 0:
+        return [np.zeros(0, dtype=np.float64) for _ in counts]
+
+    all_rows = np.concatenate([np.asarray(rows, dtype=np.int64) for rows in rows_list])
+    owner = np.repeat(np.arange(len(rows_list)), counts) # ◀ 각 후보가 몇 번째 쿼리의 후보인지
+
+    dim = next(iter(packed.vectors.values())).shape[1]
+    packed_queries = [pack_query(q, packed.keys, dim) for q in query_attr_embs]
+    Q = np.stack([q for q, _ in packed_queries])            # (쿼리 수, A, D)
+    Q_valid = np.stack([valid for _, valid in packed_queries]) # (쿼리 수, A)
+    w = np.array([weights.get(k, 0.0) for k in packed.keys], dtype=np.float64)
+    has_weight = np.array([k in weights for k in packed.keys])
+
+    mask = packed.valid[all_rows] & Q_valid[owner] & has_weight[None, :]
+
+    sims = np.zeros((all_rows.size, len(packed.keys)), dtype=np.float64)
+    for a, key in enumerate(packed.keys):
+        if not has_weight[a] or not Q_valid[:, a].any():
+            continue
+        # ◀ (핵심) 후보 행마다 자기 쿼리의 속성 벡터와 내적 (모든 쿼리를 한 번에)
+        item_vecs = np.asarray(packed.vectors[key][all_rows], dtype=np.float64)
+        sims[:, a] = np.einsum("nd,nd->n", item_vecs, Q[owner, a])
+
+    calibrated = ((sims + 1) / 2) ** exponent
+    weighted = np.where(mask, calibrated * w[None, :], 0.0)
+    total_w = (mask * w[None, :]).sum(axis=1)
+    score = np.where(total_w == 0, 0.0, weighted.sum(axis=1) / (total_w + 1e-8))
+    return np.split(score, np.cumsum(counts)[:-1])
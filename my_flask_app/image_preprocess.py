@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+# gpt-4o 분석 전 이미지 전처리 (업로드 / S3 / 크롤러 사진 공용)
+# - 기존 /api/search 등은 JSON 안에 image_base64를 담아 받으므로 전송량이 약 33% 늘고,
+#   수 MB짜리 JSON 파싱 + 문자열 사본 여러 개가 요청마다 메모리에 남음
+#   → 업로드 엔드포인트는 이미지를 바이트 그대로 받아 크기를 제한 (read_limited / prepare_upload)
+# - analyze_image_bytes는 원본 해상도 JPEG를 그대로 데이터 URL로 보내 업로드 시간 / 비전 토큰 / 지연이 늘었음
+#   → LLM 호출 직전에 EXIF 회전 보정 → (선택) 가운데 자르기 → 긴 변 축소 → JPEG 재인코딩 (preprocess_image)
+# - 설정(PREPROCESS_CONFIG)이 바뀌면 config_version()이 달라지므로, 분석 캐시의 프롬프트 버전에 포함시켜
+#   이전 설정으로 분석한 결과가 재사용되지 않도록 함
+import hashlib
+import io
+import json
+import threading
+import time
+
+from PIL import Image, ImageOps
+
+import metrics
+
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024 # ◀ 업로드 1건 최대 크기 (Node 서버의 Multer 제한과 동일한 10MB)
+READ_CHUNK_SIZE = 64 * 1024
+MULTIPART_OVERHEAD_BYTES = 64 * 1024 # ◀ 멀티파트 경계 / 헤더 / 다른 폼 필드 여유분
+EXIF_ORIENTATION = 0x0112
+
+# ◀◀ [신규] LLM 분석 전 전처리 설정 (모든 analyze_image_bytes 호출에 적용)
+PREPROCESS_CONFIG = {
+    "enabled": True,
+    "exif_transpose": True, # ◀ 휴대폰 사진의 EXIF 회전 정보대로 실제 픽셀을 돌림 (모델은 EXIF를 보지 않음)
+    "max_side": 1024,       # ◀ 긴 변을 이 픽셀 이하로 축소 (분석 품질에 영향 없는 수준)
+    "quality": 85,          # ◀ JPEG 재인코딩 품질
+    "center_crop": None,    # ◀ (선택) 가로/세로 비율 (예: 1.0 = 가운데 정사각형만 남김), None이면 자르지 않음
+}
+
+class ImageUploadError(ValueError):
+    """
+    업로드 이미지가 없거나, 너무 크거나, 이미지로 읽을 수 없는 경우. (status: 응답 HTTP 코드)
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+# --- 전처리 통계 (전/후 바이트 수) ---
+_stats_lock = threading.Lock()
+_stats = {"images": 0, "bytes_before": 0, "bytes_after": 0, "kept_original": 0, "failures": 0, "total_ms": 0.0}
+
+def _record(before, after, elapsed_ms, kept_original=False, failed=False):
+    metrics.IMAGE_BYTES.inc(before, phase="before")
+    metrics.IMAGE_BYTES.inc(after, phase="after")
+    with _stats_lock:
+        _stats["images"] += 1
+        _stats["bytes_before"] += before
+        _stats["bytes_after"] += after
+        _stats["total_ms"] += elapsed_ms
+        if kept_original:
+            _stats["kept_original"] += 1
+        if failed:
+            _stats["failures"] += 1
+
+def stats():
+    with _stats_lock:
+        st = dict(_stats)
+    st["saved_ratio"] = 1 - st["bytes_after"] / st["bytes_before"] if st["bytes_before"] else 0.0
+    return st
+
+def print_stats():
+    st = stats()
+    if not st["images"]:
+        return
+    print(f"📊 [이미지 전처리] {st['images']}장, {st['bytes_before'] / 1048576:.1f}MB -> {st['bytes_after'] / 1048576:.1f}MB "
+          f"({st['saved_ratio']*100:.0f}% 절감), 평균 {st['total_ms'] / st['images']:.0f}ms, 실패 {st['failures']}장")
+
+def config_version(config=None):
+    """
+    전처리 설정으로부터 짧은 버전 문자열을 만듭니다. (분석 캐시 키에 포함)
+    """
+    config = PREPROCESS_CONFIG if config is None else config
+    if not config.get("enabled", True):
+        return "raw"
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+
+# --- 전처리 ---
+def _center_crop(img, aspect):
+    width, height = img.size
+    if width / height > aspect: # ◀ 가로가 더 긴 경우 좌우를 자름
+        new_width = round(height * aspect)
+        left = (width - new_width) // 2
+        return img.crop((left, 0, left + new_width, height))
+    new_height = round(width / aspect)
+    top = (height - new_height) // 2
+    return img.crop((0, top, width, top + new_height))
+
+def _transform(raw_bytes, config):
+    """
+    raw_bytes를 설정대로 변환한 (JPEG 바이트, 원본 크기, 결과 크기, 픽셀 변경 여부)를 반환합니다.
+    """
+    max_side = config["max_side"]
+    img = Image.open(io.BytesIO(raw_bytes))
+    original_size = img.size
+    fmt = img.format
+    img.draft("RGB", (max_side, max_side)) # ◀ JPEG는 디코딩 단계에서 미리 축소 (메모리 / 시간 절약)
+    changed = img.size != original_size
+
+    if config.get("exif_transpose") and img.getexif().get(EXIF_ORIENTATION, 1) != 1:
+        img = ImageOps.exif_transpose(img)
+        changed = True
+    if config.get("center_crop"):
+        cropped = _center_crop(img, config["center_crop"])
+        changed = changed or cropped.size != img.size
+        img = cropped
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+        changed = True
+    if max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.LANCZOS) # ◀ 비율 유지, 작은 이미지는 그대로
+        changed = True
+
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=config["quality"], optimize=True)
+    return out.getvalue(), original_size, img.size, changed or fmt != "JPEG"
+
+def preprocess_image(raw_bytes, config=None):
+    """
+    gpt-4o로 보내기 전 이미지 바이트를 전처리합니다.
+    반환값: (JPEG 바이트, {"original_bytes", "prepared_bytes", "original_size", "prepared_size"})
+    - 픽셀 변화 없이 재인코딩만 했는데 오히려 커지면 원본을 그대로 사용
+    - 이미지를 읽을 수 없으면 ImageUploadError
+    """
+    config = PREPROCESS_CONFIG if config is None else config
+    start_time = time.time()
+    if not config.get("enabled", True):
+        return raw_bytes, {"original_bytes": len(raw_bytes), "prepared_bytes": len(raw_bytes),
+                           "original_size": None, "prepared_size": None}
+    try:
+        prepared, original_size, prepared_size, changed = _transform(raw_bytes, config)
+    except Exception as e:
+        _record(len(raw_bytes), len(raw_bytes), (time.time() - start_time) * 1000, failed=True)
+        raise ImageUploadError(f"이미지를 읽을 수 없습니다: {e}")
+
+    kept_original = not changed and len(prepared) >= len(raw_bytes)
+    if kept_original:
+        prepared = raw_bytes
+    _record(len(raw_bytes), len(prepared), (time.time() - start_time) * 1000, kept_original=kept_original)
+    return prepared, {
+        "original_bytes": len(raw_bytes),
+        "prepared_bytes": len(prepared),
+        "original_size": original_size,
+        "prepared_size": prepared_size,
+    }
+
+# --- 업로드 ---
+def check_content_length(content_length, multipart=False, limit=MAX_UPLOAD_BYTES):
+    """
+    업로드 요청의 Content-Length가 limit(+ 멀티파트 여유분)을 넘으면 본문을 읽기 전에 413 에러를 냅니다.
+    (Content-Length가 없는 chunked 요청은 read_limited가 읽으면서 제한)
+    """
+    allowed = limit + (MULTIPART_OVERHEAD_BYTES if multipart else 0)
+    if content_length is not None and content_length > allowed:
+        raise ImageUploadError(f"이미지가 너무 큽니다. (최대 {limit // (1024 * 1024)}MB)", status=413)
+
+def read_limited(stream, limit=MAX_UPLOAD_BYTES):
+    """
+    스트림을 READ_CHUNK_SIZE씩 읽어 바이트로 반환합니다. limit을 넘는 순간 중단하고 413 에러를 냅니다.
+    """
+    buf = io.BytesIO()
+    while True:
+        chunk = stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        buf.write(chunk)
+        if buf.tell() > limit:
+            raise ImageUploadError(f"이미지가 너무 큽니다. (최대 {limit // (1024 * 1024)}MB)", status=413)
+    return buf.getvalue()
+
+def prepare_upload(raw_bytes, config=None):
+    """
+    업로드된 이미지 바이트를 전처리합니다. (preprocess_image와 같고, 빈 업로드는 400)
+    """
+    if not raw_bytes:
+        raise ImageUploadError("이미지 데이터가 없습니다.")
+    return preprocess_image(raw_bytes, config)
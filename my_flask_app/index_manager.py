@@ -0,0 +1,485 @@
+# -*- coding: utf-8 -*-
+# FAISS 인덱스 증분 관리
+# - 인덱스는 IndexIDMap2로 감싸 저장소(VectorStore)의 고정 ID로 검색 결과를 돌려줌
+# - 동기화 때는 새 항목 추가 / 사라진 항목 삭제만 수행하고, 변경분(delta)만 파일로 기록
+#     animal_vectors.index              ◀ 기준(base) 인덱스
+#     animal_vectors.index.delta/00001.npz  ◀ 변경분 (add_ids, add_vectors, remove_ids)
+# - 변경분 파일이 MAX_DELTA_FILES개를 넘으면 기준 인덱스로 합쳐(compact) 다시 저장
+# - ◀◀ [신규] 인덱스 종류(flat / hnsw / ivf_flat / ivf_pq)와 파라미터는 <인덱스 파일>.params.json 에 함께 저장
+# - ◀◀ [신규] 인덱스에 넣은 '고정 ID -> 파일명'은 <인덱스 파일>.ids.json 에 함께 저장
+#   (저장소를 새로 만들어 ID가 0부터 다시 매겨져도, 같은 ID가 다른 파일을 가리키면 감지하여 전체 재구축)
+import glob
+import json
+import os
+
+import faiss
+import numpy as np
+
+DELTA_SUFFIX = ".delta"
+MAX_DELTA_FILES = 20
+
+PARAMS_SUFFIX = ".params.json"
+IDS_SUFFIX = ".ids.json"
+# ◀ 인덱스 종류별 기본 파라미터 (efSearch / nprobe는 검색 시점 값이라 재구축 없이 바꿀 수 있음)
+DEFAULT_INDEX_PARAMS = {
+    "flat": {},
+    "hnsw": {"M": 32, "efConstruction": 200, "efSearch": 128},
+    "ivf_flat": {"nlist": 256, "nprobe": 16},
+    "ivf_pq": {"nlist": 256, "m": 64, "nbits": 8, "nprobe": 16},
+}
+QUERY_PARAM_KEYS = ("efSearch", "nprobe")
+MIN_POINTS_PER_CENTROID = 39 # ◀ FAISS k-means 권장 최소 학습 벡터 수 (클러스터당)
+
+def delta_dir_for(index_file):
+    return index_file + DELTA_SUFFIX
+
+def list_delta_files(index_file):
+    return sorted(glob.glob(os.path.join(delta_dir_for(index_file), "*.npz")))
+
+def is_id_mapped(index):
+    return isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2))
+
+def has_stable_ids(index):
+    """
+    검색 결과가 저장소의 고정 ID인지 여부. (IndexIDMap 래퍼 또는 ID를 직접 저장하는 IVF 계열)
+    """
+    return is_id_mapped(index) or isinstance(index, faiss.IndexIVF)
+
+def _base_index(index):
+    return faiss.downcast_index(index.index) if is_id_mapped(index) else index
+
+def index_kind(index):
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(base, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(base, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+def supports_remove(index):
+    # ◀ HNSW 그래프는 항목 삭제를 지원하지 않음 (삭제가 필요하면 전체 재구축)
+    return index_kind(index) != "hnsw"
+
+def index_ids(index):
+    """
+    인덱스에 들어있는 고정 ID 배열을 반환합니다. (IVF는 역색인 리스트에서 직접 수집)
+    """
+    if is_id_mapped(index):
+        return faiss.vector_to_array(index.id_map).astype(np.int64)
+    invlists = faiss.extract_index_ivf(index).invlists
+    parts = [faiss.rev_swig_ptr(invlists.get_ids(l), invlists.list_size(l)).copy()
+             for l in range(invlists.nlist) if invlists.list_size(l)]
+    return np.concatenate(parts).astype(np.int64) if parts else np.zeros(0, dtype=np.int64)
+
+# --- ◀◀ [신규] 인덱스 종류 / 파라미터 ---
+def normalize_index_params(params):
+    """
+    {"type": "hnsw", "efSearch": 64} 처럼 일부만 지정된 설정에 기본값을 채워 반환합니다.
+    """
+    params = dict(params or {})
+    kind = params.pop("type", "flat")
+    if kind not in DEFAULT_INDEX_PARAMS:
+        raise ValueError(f"지원하지 않는 인덱스 종류입니다: {kind} (가능: {', '.join(DEFAULT_INDEX_PARAMS)})")
+    merged = dict(DEFAULT_INDEX_PARAMS[kind])
+    merged.update(params)
+    merged["type"] = kind
+    return merged
+
+def build_params_of(params):
+    """
+    재구축이 필요한 파라미터만 남깁니다. (검색 시점 값 제외)
+    """
+    return {k: v for k, v in params.items() if k not in QUERY_PARAM_KEYS}
+
+def read_index_params(index_file):
+    """
+    저장된 {"requested": 요청 설정, "built": 실제로 만든 설정}을 읽습니다.
+    파일이 없는 이전 인덱스는 flat으로 간주합니다.
+    """
+    try:
+        with open(index_file + PARAMS_SUFFIX, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        flat = normalize_index_params({"type": "flat"})
+        return {"requested": flat, "built": flat}
+
+def write_index_params(index_file, requested, built):
+    tmp_file = index_file + PARAMS_SUFFIX + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump({"requested": requested, "built": built}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, index_file + PARAMS_SUFFIX)
+
+# --- ◀◀ [신규] 고정 ID -> 파일명 ---
+def expected_id_map(store):
+    """
+    저장소에서 인덱스에 들어가야 할 {고정 ID: 파일명}을 만듭니다. (merged 벡터가 있는 항목만)
+    """
+    _, merged_valid = store.merged_vectors()
+    return {int(i): f for i, f, ok in zip(store.ids, store.filenames, merged_valid) if ok}
+
+def read_index_id_map(index_file):
+    """
+    인덱스를 만들 때 저장한 {고정 ID: 파일명}을 읽습니다. 파일이 없으면(이전 버전 인덱스) None.
+    """
+    try:
+        with open(index_file + IDS_SUFFIX, "r", encoding="utf-8") as f:
+            return {int(k): v for k, v in json.load(f).items()}
+    except FileNotFoundError:
+        return None
+
+def write_index_id_map(index_file, id_map):
+    tmp_file = index_file + IDS_SUFFIX + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump({str(k): v for k, v in id_map.items()}, f, ensure_ascii=False)
+    os.replace(tmp_file, index_file + IDS_SUFFIX)
+
+def apply_query_params(index, params):
+    """
+    efSearch(HNSW) / nprobe(IVF) 같은 검색 시점 파라미터를 인덱스에 설정합니다.
+    """
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexHNSW) and "efSearch" in params:
+        base.hnsw.efSearch = int(params["efSearch"])
+    elif isinstance(base, faiss.IndexIVF) and "nprobe" in params:
+        base.nprobe = max(1, min(int(params["nprobe"]), base.nlist))
+
+def build_index(vectors, ids, dim, params=None):
+    """
+    정규화된 벡터와 고정 ID로 새 인덱스를 만듭니다.
+    - flat / hnsw: IndexIDMap2로 감싸 고정 ID 사용
+    - ivf_flat / ivf_pq: 벡터로 학습(train) 후 IVF가 ID를 직접 저장 (데이터가 적으면 nlist/nbits를 줄임)
+    반환값: (인덱스, 실제로 적용된 파라미터)
+    """
+    params = normalize_index_params(params)
+    kind = params["type"]
+    n = len(ids)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(n, dim)
+    ids = np.asarray(ids, dtype=np.int64)
+    built = dict(params)
+
+    if kind.startswith("ivf") and n == 0:
+        print(f"⚠️ [인덱스] 학습할 벡터가 없어 {kind} 대신 flat 인덱스를 만듭니다.")
+        kind = "flat"
+        built = normalize_index_params({"type": "flat"})
+
+    if kind == "flat":
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+    elif kind == "hnsw":
+        base = faiss.IndexHNSWFlat(dim, int(params["M"]), faiss.METRIC_INNER_PRODUCT)
+        base.hnsw.efConstruction = int(params["efConstruction"])
+        index = faiss.IndexIDMap2(base)
+    else:
+        built["nlist"] = max(1, min(int(params["nlist"]), n // MIN_POINTS_PER_CENTROID))
+        if kind == "ivf_flat":
+            description = f"IVF{built['nlist']},Flat"
+        else:
+            if dim % int(params["m"]):
+                raise ValueError(f"ivf_pq의 m({params['m']})은 벡터 차원({dim})의 약수여야 합니다.")
+            built["nbits"] = max(1, min(int(params["nbits"]), int(np.log2(n)))) # ◀ 코드북 크기(2^nbits) <= 학습 벡터 수
+            description = f"IVF{built['nlist']},PQ{params['m']}x{built['nbits']}"
+        index = faiss.index_factory(dim, description, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+
+    apply_query_params(index, built)
+    if n:
+        index.add_with_ids(vectors, ids)
+    return index, built
+
+def _apply_delta(index, add_ids, add_vectors, remove_ids):
+    add_ids = np.asarray(add_ids, dtype=np.int64)
+    remove_ids = np.asarray(remove_ids, dtype=np.int64)
+    add_vectors = np.ascontiguousarray(add_vectors, dtype=np.float32).reshape(len(add_ids), -1)
+    if not supports_remove(index):
+        # ◀ (HNSW) 삭제 불가: 이미 들어있는 ID는 건너뛰고 추가만 (삭제가 섞인 변경분은 기록되지 않음)
+        if remove_ids.size:
+            raise ValueError("HNSW 인덱스에는 삭제가 포함된 변경분을 적용할 수 없습니다. (전체 재구축 필요)")
+        keep = ~np.isin(add_ids, index_ids(index))
+        if keep.any():
+            index.add_with_ids(np.ascontiguousarray(add_vectors[keep]), add_ids[keep])
+        return
+    # ◀ (멱등) 추가할 ID도 먼저 지운 뒤 다시 넣으므로, 같은 변경분이 두 번 적용돼도 중복이 생기지 않음
+    to_remove = np.unique(np.concatenate([remove_ids, add_ids]))
+    if to_remove.size:
+        index.remove_ids(to_remove)
+    if len(add_ids):
+        index.add_with_ids(add_vectors, add_ids)
+
+def write_base_index(index, index_file):
+    """
+    기준 인덱스를 원자적으로 저장하고, 그 안에 이미 반영된 변경분 파일들을 정리합니다.
+    """
+    tmp_file = index_file + ".tmp"
+    faiss.write_index(index, tmp_file)
+    os.replace(tmp_file, index_file)
+    for path in list_delta_files(index_file):
+        os.remove(path)
+
+def load_index(index_file, io_flags=0):
+    """
+    기준 인덱스를 읽고, 쌓여있는 변경분 파일을 순서대로 적용해 최신 인덱스를 반환합니다.
+    (저장된 efSearch / nprobe도 함께 설정)
+    """
+    index = faiss.read_index(index_file, io_flags) if io_flags else faiss.read_index(index_file)
+    delta_files = list_delta_files(index_file)
+    if delta_files and not has_stable_ids(index):
+        raise ValueError(f"'{index_file}'는 고정 ID 인덱스가 아니어서 변경분을 적용할 수 없습니다. (전체 재구축 필요)")
+    for path in delta_files:
+        with np.load(path) as d:
+            _apply_delta(index, d["add_ids"], d["add_vectors"], d["remove_ids"])
+    apply_query_params(index, read_index_params(index_file)["built"])
+    return index
+
+# ◀◀ [신규] 서빙용 읽기 전용 메모리 맵 로드 플래그
+# (MMAP_IFC: IndexFlat 벡터까지 파일에서 바로 매핑 - 이를 지원하는 FAISS 버전에서만 적용)
+MMAP_IO_FLAGS = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_READ_ONLY", 0) | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+
+def load_index_readonly(index_file):
+    """
+    검색 전용 인덱스를 읽기 전용 메모리 맵으로 엽니다.
+    - 벡터 데이터가 프로세스 힙이 아닌 파일 페이지 캐시에 올라가므로, fork된 워커들이 같은 페이지를 공유하고
+      시작할 때 파일 전체를 읽지 않음
+    - 변경분(delta)이 남아 있으면 매핑된 인덱스에 추가할 수 없으므로 일반 로드로 대체 (compact_index 권장)
+    반환값: (인덱스, 메모리 맵 사용 여부)
+    """
+    if list_delta_files(index_file):
+        print(f"  [인덱스] '{index_file}'에 변경분이 남아 있어 일반 로드합니다. (compact_index로 합치면 메모리 맵 사용)")
+        return load_index(index_file), False
+    try:
+        index = load_index(index_file, MMAP_IO_FLAGS)
+        return index, True
+    except Exception as e:
+        print(f"⚠️ [인덱스] '{index_file}' 메모리 맵 로드 실패 (일반 로드로 진행): {e}")
+        return load_index(index_file), False
+
+def compact_index(index_file):
+    """
+    기준 인덱스에 변경분을 모두 합쳐 새 기준 인덱스로 저장합니다. 합친 변경분 파일 수를 반환합니다.
+    (기존 파일은 os.replace로 교체되므로, 이미 매핑해 둔 프로세스는 옛 파일을 계속 안전하게 사용)
+    """
+    delta_files = list_delta_files(index_file)
+    if not delta_files:
+        return 0
+    write_base_index(load_index(index_file), index_file)
+    return len(delta_files)
+
+def source_signature(index_file):
+    """
+    인덱스 파일 + 변경분 파일들의 (이름, 수정 시각, 크기). 다른 프로세스가 인덱스를 갱신했는지 확인하는 용도.
+    """
+    signature = []
+    for path in [index_file] + list_delta_files(index_file):
+        try:
+            st = os.stat(path)
+            signature.append((os.path.basename(path), st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            signature.append((os.path.basename(path), None, None))
+    return tuple(signature)
+
+def append_delta(index_file, add_ids, add_vectors, remove_ids):
+    """
+    변경분 1건을 다음 순번의 .npz 파일로 기록합니다. (임시 파일에 쓴 뒤 이름 변경)
+    """
+    delta_dir = delta_dir_for(index_file)
+    os.makedirs(delta_dir, exist_ok=True)
+    existing = list_delta_files(index_file)
+    next_seq = int(os.path.basename(existing[-1]).split(".")[0]) + 1 if existing else 1
+    path = os.path.join(delta_dir, f"{next_seq:05d}.npz")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f,
+                 add_ids=np.asarray(add_ids, dtype=np.int64),
+                 add_vectors=np.ascontiguousarray(add_vectors, dtype=np.float32).reshape(len(add_ids), -1),
+                 remove_ids=np.asarray(remove_ids, dtype=np.int64))
+    os.replace(tmp_path, path)
+    return path
+
+def sync_index(index_file, store, dim, force_full=False, params=None):
+    """
+    저장소(VectorStore)의 '__merged__' 벡터에 맞춰 인덱스를 최신화합니다.
+    - 기존 고정 ID 인덱스가 있으면 추가/삭제된 항목만 반영하고 변경분만 기록
+    - 없거나(최초/구버전 위치 기반 인덱스), 인덱스 종류/구축 파라미터가 바뀌었거나,
+      삭제를 지원하지 않는 인덱스(HNSW)에서 삭제가 필요하거나, force_full이면 전체 재구축
+    반환값: (인덱스, 추가 수, 삭제 수, 전체 재구축 여부)
+    """
+    requested = normalize_index_params(params)
+    merged, merged_valid = store.merged_vectors()
+    expected_ids = store.ids[merged_valid]
+    row_of_id = {int(i): row for row, i in enumerate(store.ids) if merged_valid[row]}
+    expected_map = expected_id_map(store)
+
+    index = None
+    stored = read_index_params(index_file)
+    if not force_full and os.path.exists(index_file):
+        if build_params_of(stored["requested"]) != build_params_of(requested):
+            print(f"  [인덱스] 인덱스 설정이 바뀌었습니다 ({stored['requested']['type']} -> {requested['type']}). 전체 재구축합니다.")
+        else:
+            try:
+                index = load_index(index_file)
+                if not has_stable_ids(index):
+                    print(f"  [인덱스] '{index_file}'는 위치 기반 인덱스입니다. 고정 ID 인덱스로 전체 재구축합니다.")
+                    index = None
+            except Exception as e:
+                print(f"⚠️ [인덱스] 기존 인덱스 로드 실패. 전체 재구축합니다: {e}")
+                index = None
+
+    if index is not None:
+        current_ids = set(int(i) for i in index_ids(index))
+        expected_set = set(int(i) for i in expected_ids)
+        # ◀ 같은 ID가 다른 파일을 가리키면 (저장소가 새로 만들어져 ID가 다시 매겨진 경우 등) 벡터가 뒤섞이므로 전체 재구축
+        indexed_map = read_index_id_map(index_file)
+        if indexed_map is None:
+            print(f"  [인덱스] '{index_file}'의 ID -> 파일명 기록이 없습니다. 전체 재구축합니다.")
+            index = None
+        else:
+            moved = [i for i in current_ids & expected_set if indexed_map.get(i) != expected_map[i]]
+            if moved:
+                print(f"  [인덱스] 다른 파일을 가리키는 ID {len(moved)}개가 있어 전체 재구축합니다.")
+                index = None
+
+    if index is not None:
+        add_ids = sorted(expected_set - current_ids)
+        remove_ids = sorted(current_ids - expected_set)
+        if remove_ids and not supports_remove(index):
+            print(f"  [인덱스] {index_kind(index)} 인덱스는 삭제를 지원하지 않아 전체 재구축합니다. (삭제 {len(remove_ids)}개)")
+            index = None
+
+    if index is None:
+        vectors = np.ascontiguousarray(merged[merged_valid], dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        index, built = build_index(vectors, expected_ids, dim, requested)
+        write_base_index(index, index_file)
+        write_index_params(index_file, requested, built)
+        write_index_id_map(index_file, expected_map)
+        return index, len(expected_ids), 0, True
+
+    # ◀ 검색 시점 파라미터(efSearch / nprobe)만 바뀐 경우는 재구축 없이 설정 파일만 갱신
+    if stored["requested"] != requested:
+        built = dict(stored["built"])
+        built.update({k: v for k, v in requested.items() if k in QUERY_PARAM_KEYS})
+        write_index_params(index_file, requested, built)
+        apply_query_params(index, built)
+
+    if not add_ids and not remove_ids:
+        return index, 0, 0, False
+
+    add_vectors = np.ascontiguousarray(merged[[row_of_id[i] for i in add_ids]], dtype=np.float32).reshape(len(add_ids), dim)
+    if len(add_ids):
+        faiss.normalize_L2(add_vectors)
+    _apply_delta(index, add_ids, add_vectors, remove_ids)
+
+    # ◀ 변경분이 너무 많이 쌓였으면 기준 인덱스로 합쳐서 저장, 아니면 변경분만 기록
+    if len(list_delta_files(index_file)) + 1 > MAX_DELTA_FILES:
+        write_base_index(index, index_file)
+    else:
+        append_delta(index_file, add_ids, add_vectors, remove_ids)
+    write_index_id_map(index_file, expected_map)
+
+    return index, len(add_ids), len(remove_ids), False
+
+def check_index_consistency(index, store, index_file=None):
+    """
+    인덱스에 들어있는 ID 집합이 저장소의 (merged 벡터가 있는) 항목 ID 집합과 같은지 확인합니다.
+    index_file을 주면 인덱스를 만들 때 저장한 'ID -> 파일명'도 저장소와 같은지 비교합니다. (기록이 없으면 ID 집합만)
+    """
+    expected_map = expected_id_map(store)
+    if not has_stable_ids(index):
+        # (하위 호환) 위치 기반 인덱스는 행 수만 비교
+        return index.ntotal == len(expected_map)
+    actual = index_ids(index)
+    if len(actual) != len(expected_map) or set(int(i) for i in actual) != set(expected_map):
+        return False
+    indexed_map = read_index_id_map(index_file) if index_file else None
+    return indexed_map is None or indexed_map == expected_map
+
+# --- ◀◀ [신규] 종(species)별 파티션: 같은 종 안에서만 FAISS 검색 ---
+# - 인덱스 갱신 시 '종 -> 고정 ID 목록'을 <인덱스 파일>.species.json 으로 함께 저장
+# - 검색 시 IDSelectorBatch로 해당 종의 ID만 탐색하므로, 다른 종에 후보 자리를 뺏기지 않음
+SPECIES_SUFFIX = ".species.json"
+SPECIES_ATTR = "dog_or_cat_or_other"
+
+def species_key(value):
+    return "" if value is None else str(value)
+
+class SpeciesPartition:
+    """
+    한 종의 FAISS ID 목록과 (읽기 전용으로 공유되는) ID 선택기.
+    """
+    __slots__ = ("ids", "selector")
+
+    def __init__(self, ids):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.selector = faiss.IDSelectorBatch(self.ids) if len(self.ids) else None
+
+    def __len__(self):
+        return len(self.ids)
+
+def build_species_partitions(index, store):
+    """
+    저장소의 attributes로부터 '종 -> FAISS ID 배열'을 계산합니다.
+    (구버전 위치 기반 인덱스는 행 번호가 곧 FAISS ID)
+    """
+    _, merged_valid = store.merged_vectors()
+    faiss_ids = store.ids if has_stable_ids(index) else np.arange(len(store), dtype=np.int64)
+    groups = {}
+    for row, attrs in enumerate(store.attributes):
+        if not merged_valid[row]:
+            continue
+        groups.setdefault(species_key(attrs.get(SPECIES_ATTR)), []).append(int(faiss_ids[row]))
+    return groups
+
+def write_species_partitions(index_file, groups):
+    tmp_file = index_file + SPECIES_SUFFIX + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(groups, f, ensure_ascii=False)
+    os.replace(tmp_file, index_file + SPECIES_SUFFIX)
+
+def load_species_partitions(index_file, index, store):
+    """
+    인덱스 갱신 때 저장된 종별 ID 목록을 읽습니다.
+    파일이 없거나 인덱스와 개수가 맞지 않으면 저장소에서 다시 계산합니다.
+    """
+    groups = None
+    try:
+        with open(index_file + SPECIES_SUFFIX, "r", encoding="utf-8") as f:
+            groups = json.load(f)
+        if sum(len(v) for v in groups.values()) != index.ntotal:
+            print(f"⚠️ [인덱스] '{index_file}{SPECIES_SUFFIX}'의 항목 수가 인덱스와 달라 다시 계산합니다.")
+            groups = None
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"⚠️ [인덱스] 종별 ID 목록 로드 실패. 다시 계산합니다: {e}")
+        groups = None
+
+    if groups is None:
+        groups = build_species_partitions(index, store)
+    return {key: SpeciesPartition(ids) for key, ids in groups.items()}
+
+def make_search_params(index, selector):
+    """
+    요청마다 새 SearchParameters를 만듭니다. (IndexIDMap이 검색 중 params를 잠시 바꾸므로 공유하지 않음)
+    params를 넘기면 인덱스에 설정된 efSearch / nprobe 대신 params 값이 쓰이므로 여기에 그대로 옮겨 담습니다.
+    """
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = base.hnsw.efSearch
+    elif isinstance(base, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = base.nprobe
+    else:
+        params = faiss.SearchParameters()
+    params.sel = selector
+    return params
+
+def search_partition(index, query_vectors, k, partition):
+    """
+    한 종의 파티션 안에서만 상위 k개를 검색합니다. 파티션이 k보다 작으면 파티션 전체를 반환합니다.
+    """
+    n_queries = query_vectors.shape[0]
+    if partition is None or len(partition) == 0:
+        return np.zeros((n_queries, 0), dtype=np.float32), np.full((n_queries, 0), -1, dtype=np.int64)
+    k = min(k, len(partition))
+    return index.search(query_vectors, k, params=make_search_params(index, partition.selector))
@@ -14,6 +14,15 @@ from openai import OpenAI
 import faiss  # ◀◀ (추가) FAISS import
 import re
 
+from embedding_cache import EmbeddingCache
+from analysis_cache import AnalysisCache, hash_image_bytes, make_prompt_version
+import hybrid_rerank
+import vector_store
+import index_manager
+import refresh_jobs
+import image_preprocess
+import metrics
+
 # --- (신규) ◀◀ 전역 상수 설정 ---
 VECTOR_DIMENSION = 3072
 K_CANDIDATES = 100 # FAISS 예선 후보 수
@@ -23,6 +32,24 @@ DB_FILE = "./dog_cat_features_attr_emb.json"
 ID_MAP_FILE = "id_map.json"
 INDEX_FILE = "animal_vectors.index"
 
+# ◀◀ [신규] 실종동물 DB 파일 (app.py / 크롤러 / refresh_missing_data_from_db 공용)
+MISSING_DB_FILE = "missing_pets.json"
+MISSING_MAP_FILE = "missing_map.json"
+MISSING_INDEX_FILE = "missing_vectors.index"
+
+# ◀◀ [신규] DB(인덱스 파일)별 FAISS 인덱스 종류: flat(정확) / hnsw / ivf_flat / ivf_pq (근사)
+# (종류를 바꾸면 다음 update 때 전체 재구축, efSearch / nprobe만 바꾸면 재구축 없이 적용)
+# (변경 전 benchmark_index.py로 지연 시간 / 메모리 / recall@K_CANDIDATES 확인)
+INDEX_PARAMS = {
+    INDEX_FILE: {"type": "flat"},
+    MISSING_INDEX_FILE: {"type": "flat"},
+}
+
+STORE_DTYPE = "float32" # ◀ 컬럼형 저장소 벡터 타입 ("float16"이면 디스크/메모리 절반)
+EMBEDDING_CACHE_FILE = "./cache/embedding_cache.sqlite3" # ◀ app.py / 크롤러 / CLI 공용 임베딩 캐시
+ANALYSIS_CACHE_FILE = "./cache/analysis_cache.sqlite3"   # ◀ 이미지 해시 -> gpt-4o 분석 결과 캐시
+VISION_MODEL = "gpt-4o"
+
 # --- 0. 클라이언트 초기화 ---
 try:
     # 1. OpenAI 키 로드 및 클라이언트 초기화
@@ -104,6 +131,16 @@ prompt = """
 
 """
 
+# ◀◀ [신규] 프롬프트 버전 (prompt 문구나 모델이 바뀌면 자동으로 달라져 이전 분석 캐시가 무효화됨)
+# (이미지 전처리 설정도 모델 입력을 바꾸므로 함께 포함)
+PROMPT_VERSION = make_prompt_version(VISION_MODEL, prompt, image_preprocess.config_version())
+
+try:
+    analysis_cache = AnalysisCache(ANALYSIS_CACHE_FILE)
+except Exception as e:
+    print(f"⚠️ [분석 캐시] 초기화 실패. 캐시 없이 동작합니다: {e}")
+    analysis_cache = None
+
 # --- 2. 헬퍼 함수 정의 ---
 def attribute_to_text(attr_key, attr_value):
     if isinstance(attr_value, list):
@@ -125,28 +162,118 @@ def extract_json_from_text(text):
         return None
 
 # --- 3. 이미지 분석 (LLM 호출) ---
-def analyze_image_bytes(image_data_base64, image_name_for_log):
+def prepare_image_for_llm(image_bytes, image_name_for_log):
+    """
+    ◀◀ [신규] LLM에 보낼 이미지를 전처리(EXIF 회전 / 자르기 / 축소 / 재인코딩)하여 Base64로 반환합니다.
+    이미지를 읽지 못하면 원본 그대로 보냅니다.
+    """
+    try:
+        with metrics.stage("preprocess"):
+            image_bytes, _ = image_preprocess.preprocess_image(image_bytes)
+    except image_preprocess.ImageUploadError as e:
+        print(f"⚠️ [이미지 전처리] {image_name_for_log} 전처리 실패 (원본으로 진행): {e}")
+    return base64.b64encode(image_bytes).decode("utf-8")
+
+def analyze_image_bytes(image_data_base64, image_name_for_log, preprocessed=False):
     """
     Base64 인코딩된 이미지 바이트를 받아 LLM 분석을 수행합니다. (S3/로컬 공용)
+    preprocessed=True면 이미 전처리된 이미지(업로드 엔드포인트)이므로 전처리를 생략합니다.
     """
+    try:
+        image_bytes = base64.b64decode(image_data_base64)
+    except Exception as e:
+        print(f"❌ [LLM 오류] {image_name_for_log} Base64 디코딩 실패: {e}")
+        return None
+
+    # ◀◀ [신규] 동일한 이미지(디코딩된 원본 바이트 기준)는 저장된 분석 결과를 바로 반환 (전처리도 생략)
+    image_hash = None
+    if analysis_cache is not None:
+        try:
+            image_hash = hash_image_bytes(image_bytes)
+            cached_json = analysis_cache.get(image_hash, PROMPT_VERSION)
+            if cached_json:
+                print(f"[LLM 분석 캐시 적중] {image_name_for_log}")
+                metrics.LLM_CALLS.inc(kind="image", result="cache_hit")
+                return json.loads(cached_json)
+        except Exception as e:
+            print(f"⚠️ [분석 캐시] 조회 실패 (LLM 분석으로 진행): {e}")
+
     print(f"[LLM 분석중] {image_name_for_log}")
+    if not preprocessed:
+        image_data_base64 = prepare_image_for_llm(image_bytes, image_name_for_log)
     final_prompt = prompt
     try:
-        resp = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[ { "role": "user", "content": [ {"type": "text", "text": final_prompt}, {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_data_base64}"}} ] } ],
-            temperature=0
-        )
+        with metrics.stage("llm"):
+            resp = client.chat.completions.create(
+                model=VISION_MODEL,
+                messages=[ { "role": "user", "content": [ {"type": "text", "text": final_prompt}, {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_data_base64}"}} ] } ],
+                temperature=0
+            )
         text = resp.choices[0].message.content
         json_str = extract_json_from_text(text)
         if not json_str:
             print(f"[경고] JSON 감지 실패: {image_name_for_log}")
+            metrics.LLM_CALLS.inc(kind="image", result="error")
             return None
-        return json.loads(json_str)
+        result = json.loads(json_str)
+        metrics.LLM_CALLS.inc(kind="image", result="ok")
+
+        # ◀ 파싱에 성공한 결과만 캐시에 저장
+        if analysis_cache is not None and image_hash:
+            analysis_cache.put(image_hash, PROMPT_VERSION, json.dumps(result, ensure_ascii=False))
+        return result
     except Exception as e:
         print(f"❌ [LLM 오류] {image_name_for_log} 분석 중 오류: {e}")
+        metrics.LLM_CALLS.inc(kind="image", result="error")
         return None
 
+# ◀◀ [신규] S3 키 단위 분석 (크롤러 Trigger 1 / update_db_from_s3 공용)
+def record_s3_object(s3_key, image_hash, changed=None):
+    """
+    S3 키의 내용 해시를 기록합니다. (크롤러가 사진을 올리거나 확인한 직후 호출)
+    changed: 크롤러가 아는 경우 True(새로 업로드) / False(304 또는 같은 내용), 모르면 None (해시 비교)
+    """
+    if analysis_cache is not None:
+        analysis_cache.record_object(s3_key, image_hash, changed)
+
+def s3_object_changed(s3_key, etag):
+    """
+    마지막 DB 동기화 이후 s3_key의 내용이 바뀌었으면 True. (기록이 없거나 ETag를 모르는 키는 지금 ETag를 채택)
+    """
+    if analysis_cache is None:
+        return False
+    return analysis_cache.object_changed(s3_key, etag)
+
+def mark_s3_object_synced(s3_key, etag):
+    """
+    s3_key가 S3 목록의 ETag etag인 내용으로 DB에 반영되었음을 기록합니다. (update_db_from_s3에서 임베딩까지 끝난 뒤 호출)
+    """
+    if analysis_cache is not None:
+        analysis_cache.mark_object_synced(s3_key, etag)
+
+def analyze_s3_object(s3_key, image_bytes=None, s3=None):
+    """
+    S3에 있는 사진 1장을 분석합니다. 반환값: 분석 결과(dict) 또는 None
+    1) 바이트가 없으면 S3 키 기록(키 -> 내용 해시)으로 분석 캐시를 먼저 조회 → 적중하면 다운로드 / LLM 모두 생략
+    2) 그래도 없으면 S3에서 받아 analyze_image_bytes로 분석 (결과는 내용 해시로 캐시됨)
+    ('동기화됨' 표시는 하지 않음 → update_db_from_s3가 DB에 반영한 뒤 mark_s3_object_synced로 기록)
+    """
+    record = analysis_cache.get_object(s3_key) if analysis_cache is not None else None
+    if image_bytes is None and record and record["image_hash"]:
+        cached_json = analysis_cache.get(record["image_hash"], PROMPT_VERSION)
+        if cached_json:
+            print(f"[LLM 분석 캐시 적중 (S3 키 기록)] {s3_key}")
+            metrics.LLM_CALLS.inc(kind="image", result="cache_hit")
+            return json.loads(cached_json)
+
+    if image_bytes is None:
+        obj = (s3 or get_s3_client()).get_object(Bucket=bucket_name, Key=s3_key)
+        image_bytes = obj['Body'].read()
+    result = analyze_image_bytes(base64.b64encode(image_bytes).decode("utf-8"), s3_key)
+    if result is not None:
+        record_s3_object(s3_key, hash_image_bytes(image_bytes))
+    return result
+
 def analyze_image_with_llm(image_path):
     """
     로컬 파일 경로를 받아 바이트로 변환 후, 메인 분석 함수를 호출합니다.
@@ -236,20 +363,23 @@ def analyze_text_with_llm(user_query_text):
     
     try:
         # 2. LLM 호출
-        resp = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[ { "role": "user", "content": final_prompt } ],
-            temperature=0
-        )
+        with metrics.stage("llm"):
+            resp = client.chat.completions.create(
+                model="gpt-4o",
+                messages=[ { "role": "user", "content": final_prompt } ],
+                temperature=0
+            )
         text = resp.choices[0].message.content
         
         # 3. JSON 파싱
         json_str = extract_json_from_text(text)
         if not json_str:
             print(f"[경고] JSON 감지 실패 (텍스트 쿼리): {user_query_text}")
+            metrics.LLM_CALLS.inc(kind="text", result="error")
             return None
         
         raw_obj = json.loads(json_str)
+        metrics.LLM_CALLS.inc(kind="text", result="ok")
         
         # 4. ◀◀ [핵심 수정] LLM이 반환한 JSON의 키(Key)를 강제로 정리합니다.
         clean_obj = clean_json_keys(raw_obj)
@@ -258,49 +388,164 @@ def analyze_text_with_llm(user_query_text):
     
     except Exception as e:
         print(f"❌ [LLM 오류] 텍스트 쿼리 분석/파싱 중 오류: {e}")
+        metrics.LLM_CALLS.inc(kind="text", result="error")
         return None
 
 # --- 4. 속성별 임베딩 생성 ---
-def get_embeddings_for_attributes(attr_dict):
+EMBEDDING_MODEL = "text-embedding-3-large"
+EMBED_BATCH_SIZE = 256 # ◀ 한 번의 embeddings.create 요청에 담을 최대 텍스트 수 (API 한도 2048)
+EMBED_ITEMS_PER_BATCH = 8 # ◀ update_db_from_s3에서 한 번에 묶어 임베딩할 신규 항목 수 (약 25개 속성 x 8)
+
+# ◀◀ [신규] 임베딩 디스크 캐시 (실패해도 캐시 없이 동작)
+try:
+    embedding_cache = EmbeddingCache(EMBEDDING_CACHE_FILE)
+except Exception as e:
+    print(f"⚠️ [임베딩 캐시] 초기화 실패. 캐시 없이 동작합니다: {e}")
+    embedding_cache = None
+
+def is_empty_attr_value(value):
     """
-    JSON 객체를 받아, 유효한(비어있지 않은) 값만 임베딩합니다.
+    임베딩하지 않을 값(None, 빈 문자열, "None")인지 확인합니다.
     """
-    attr_embeds = {} # ◀ 빈 딕셔너리로 시작
-    valid_embeddings_for_merge = [] # ◀ 평균('__merged__') 계산을 위한 유효한 벡터 리스트
+    if value is None:
+        return True
+    text_value = str(value).strip() # str(None)은 "None"이 됨
+    return text_value == "" or text_value == "None"
 
-    # ◀ (수정) .keys()와 .values()를 함께 순회
-    for key, value in attr_dict.items():
-        
-        # ◀ (핵심) 유효성 검사: 값이 None이거나, 빈 문자열("")이 아닌지 확인
-        text_value = str(value) # str(None)은 "None"이 됨
-        
-        if value is None or text_value.strip() == "" or text_value.strip() == "None":
-            attr_embeds[key] = None # ◀ 이 속성의 벡터는 None (검색 시 skip됨)
-            continue # ◀ 다음 키로 넘어감 (임베딩 API 호출 안 함)
+def embed_texts_batch(texts):
+    """
+    텍스트 리스트를 EMBED_BATCH_SIZE 단위로 묶어 한 번에 임베딩합니다.
+    (입력 순서와 같은 순서의 벡터 리스트를 반환, 실패한 항목은 None)
+    """
+    results = [None] * len(texts)
 
-        # ◀ (정상) 유효한 값이므로 API 호출
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        chunk = texts[start:start + EMBED_BATCH_SIZE]
         try:
-            emb = client.embeddings.create(model="text-embedding-3-large", input=[text_value]).data[0].embedding
-            attr_embeds[key] = emb
-            
-            # ◀ '__merged__' 계산용 리스트에 추가 (단, __merged__ 키 자체는 제외)
-            if key != "__merged__":
-                valid_embeddings_for_merge.append(emb)
-                
+            with metrics.stage("embedding"):
+                resp = client.embeddings.create(model=EMBEDDING_MODEL, input=chunk)
+            metrics.EMBEDDING_CALLS.inc(result="ok")
+            # ◀ 응답 순서가 바뀌어도 안전하도록 index 기준으로 배치
+            for d in resp.data:
+                results[start + d.index] = d.embedding
+
         except Exception as e:
-            # (방어 코드) 만약 API가 특정 값(예: "알수없음")을 거부할 경우
-            print(f"⚠️ [임베딩 경고] '{key}' 값 '{text_value}'의 임베딩 실패: {e}")
-            attr_embeds[key] = None
-
-    # ◀ (수정) 유효한 벡터가 하나라도 있을 때만 '__merged__' 생성
-    if valid_embeddings_for_merge:
-        merged_emb = np.mean(np.array(valid_embeddings_for_merge), axis=0).tolist()
-        attr_embeds["__merged__"] = merged_emb
-    else:
-        # (방어 코드) 유효한 값이 하나도 없으면 __merged__도 None
-        attr_embeds["__merged__"] = None
+            metrics.EMBEDDING_CALLS.inc(result="error")
+            # (방어 코드) 배치 안의 특정 값(예: "알수없음")이 거부되면 배치 전체가 실패하므로,
+            #            해당 묶음만 1개씩 다시 요청하여 나머지 항목은 살린다.
+            print(f"⚠️ [임베딩 경고] 배치({len(chunk)}개) 요청 실패, 개별 요청으로 재시도: {e}")
+            for offset, text_value in enumerate(chunk):
+                try:
+                    with metrics.stage("embedding"):
+                        results[start + offset] = client.embeddings.create(model=EMBEDDING_MODEL, input=[text_value]).data[0].embedding
+                    metrics.EMBEDDING_CALLS.inc(result="ok")
+                except Exception as item_e:
+                    metrics.EMBEDDING_CALLS.inc(result="error")
+                    print(f"⚠️ [임베딩 경고] 값 '{text_value}'의 임베딩 실패: {item_e}")
+
+    return results
+
+def embed_texts_with_cache(texts):
+    """
+    임베딩 캐시를 먼저 조회하고, 캐시에 없는 텍스트만 embed_texts_batch로 요청합니다.
+    """
+    if embedding_cache is None:
+        metrics.EMBEDDING_TEXTS.inc(len(texts), source="api")
+        return embed_texts_batch(texts)
+
+    try:
+        results = embedding_cache.get_many(EMBEDDING_MODEL, texts)
+    except Exception as e:
+        print(f"⚠️ [임베딩 캐시] 조회 실패 (API로 진행): {e}")
+        results = [None] * len(texts)
+
+    # ◀ 같은 텍스트가 여러 번 나와도 API에는 한 번만 요청
+    miss_texts = list(dict.fromkeys(t for t, r in zip(texts, results) if r is None))
+    metrics.EMBEDDING_TEXTS.inc(len(texts) - sum(r is None for r in results), source="cache")
+    metrics.EMBEDDING_TEXTS.inc(len(miss_texts), source="api")
+    if miss_texts:
+        start_time = time.time()
+        miss_vectors = embed_texts_batch(miss_texts)
+        embedding_cache.record_api_call((time.time() - start_time) * 1000)
 
-    return attr_embeds
+        try:
+            embedding_cache.put_many(EMBEDDING_MODEL, miss_texts, miss_vectors)
+        except Exception as e:
+            print(f"⚠️ [임베딩 캐시] 저장 실패: {e}")
+
+        miss_map = dict(zip(miss_texts, miss_vectors))
+        results = [r if r is not None else miss_map.get(t) for t, r in zip(texts, results)]
+
+    return results
+
+def print_embedding_cache_stats():
+    if embedding_cache is None:
+        return
+    st = embedding_cache.stats()
+    print(f"📊 [임베딩 캐시] 적중 {st['hits']} / 미스 {st['misses']} (적중률 {st['hit_rate']*100:.1f}%), "
+          f"API 요청 {st['api_requests']}회, 생략된 요청 {st['requests_avoided']}회 (약 {st['saved_ms_estimate']:.0f}ms 절감)")
+
+def prepare_attribute_texts(attr_dicts):
+    """
+    JSON 객체 리스트에서 임베딩할 (객체 번호, 키)와 텍스트를 모읍니다.
+    반환값: (객체별 빈 임베딩 딕셔너리 리스트, [(객체 번호, 키)], [텍스트])
+    """
+    all_attr_embeds = []
+    pending = [] # ◀ (몇 번째 객체, 키)
+    texts = []
+
+    for obj_i, attr_dict in enumerate(attr_dicts):
+        attr_embeds = {}
+        for key, value in attr_dict.items():
+            # ◀ (핵심) 유효성 검사: 값이 None이거나, 빈 문자열("")이면 API 호출 안 함
+            if is_empty_attr_value(value):
+                attr_embeds[key] = None # ◀ 이 속성의 벡터는 None (검색 시 skip됨)
+                continue
+            attr_embeds[key] = None # ◀ (자리 확보) 키 순서를 원본과 동일하게 유지
+            pending.append((obj_i, key))
+            texts.append(str(value))
+        all_attr_embeds.append(attr_embeds)
+
+    return all_attr_embeds, pending, texts
+
+def assemble_attribute_embeddings(all_attr_embeds, pending, vectors):
+    """
+    임베딩 결과를 객체별 딕셔너리에 채우고 '__merged__'(평균 벡터)를 계산합니다.
+    """
+    for (obj_i, key), emb in zip(pending, vectors):
+        all_attr_embeds[obj_i][key] = emb
+
+    for attr_embeds in all_attr_embeds:
+        # ◀ '__merged__' 계산용 리스트 (단, __merged__ 키 자체는 제외)
+        valid_embeddings_for_merge = [emb for key, emb in attr_embeds.items() if key != "__merged__" and emb is not None]
+
+        # ◀ 유효한 벡터가 하나라도 있을 때만 '__merged__' 생성
+        if valid_embeddings_for_merge:
+            attr_embeds["__merged__"] = np.mean(np.array(valid_embeddings_for_merge), axis=0).tolist()
+        else:
+            # (방어 코드) 유효한 값이 하나도 없으면 __merged__도 None
+            attr_embeds["__merged__"] = None
+
+    return all_attr_embeds
+
+def get_embeddings_for_attributes_batch(attr_dicts):
+    """
+    여러 개의 JSON 객체를 받아, 유효한(비어있지 않은) 값 전체를 한 번의 배치 요청으로 임베딩합니다.
+    반환값은 get_embeddings_for_attributes와 같은 형식의 딕셔너리 리스트입니다.
+    """
+    all_attr_embeds, pending, texts = prepare_attribute_texts(attr_dicts)
+
+    # ◀ (핵심) 캐시에 없는 텍스트만 모아서 한 번에 요청
+    vectors = embed_texts_with_cache(texts) if texts else []
+
+    return assemble_attribute_embeddings(all_attr_embeds, pending, vectors)
+
+def get_embeddings_for_attributes(attr_dict):
+    """
+    JSON 객체를 받아, 유효한(비어있지 않은) 값만 임베딩합니다.
+    (속성 전체를 1회의 배치 요청으로 처리)
+    """
+    return get_embeddings_for_attributes_batch([attr_dict])[0]
 
 # --- 5. 코사인 유사도 ---
 def cosine(a,b):
@@ -380,6 +625,34 @@ def compare_query_to_item(query_attr_emb, item, exponent=3.0):
         
     return score / (total_w + 1e-8)
 
+# --- 8. ◀◀ [신규] 벡터화 재정렬 (compare_query_to_item과 같은 점수를 후보 전체에 대해 한 번에 계산) ---
+RERANK_KEYS = list(weights.keys())
+
+def load_db(db_file, mmap=True):
+    """
+    DB를 컬럼형 저장소(VectorStore)로 로드합니다. (저장소가 없으면 기존 JSON을 읽어 변환)
+    """
+    return vector_store.load_db(db_file, RERANK_KEYS, VECTOR_DIMENSION, mmap=mmap)
+
+def filter_species_rows(candidate_indices, store, query_species):
+    """
+    FAISS 후보 중 쿼리와 종(dog_or_cat_or_other)이 같은 행 번호만 남깁니다. (-1 = 빈 결과 제외)
+    """
+    return [int(idx) for idx in candidate_indices
+            if idx >= 0 and store.attributes[idx].get("dog_or_cat_or_other") == query_species]
+
+def rerank_candidates(query_attr_emb, store, rows, exponent=3.0):
+    """
+    후보 행(rows)들의 하이브리드 점수 배열을 반환합니다.
+    """
+    return hybrid_rerank.score_candidates(store.packed, query_attr_emb, rows, weights, exponent)
+
+def rerank_candidates_batch(query_attr_embs, store, rows_list, exponent=3.0):
+    """
+    쿼리 여러 개의 후보 점수 배열 리스트를 반환합니다. (rerank_candidates의 배치 버전)
+    """
+    return hybrid_rerank.score_candidates_batch(store.packed, query_attr_embs, rows_list, weights, exponent)
+
 def get_s3_client():
     print("NCS (S3) 클라이언트 생성 중... (환경 변수 사용)")
     # (수정) ◀◀ 하드코딩된 키 대신 os.environ을 사용
@@ -391,26 +664,35 @@ def get_s3_client():
                      )
     return s3
 
+def save_db(store, db_file, id_map_file):
+    """
+    DB를 컬럼형 저장소로 저장하고, ID 맵(JSON 파일명 리스트)도 함께 갱신합니다.
+    """
+    version = store.save(vector_store.store_path_for(db_file))
+    with open(id_map_file, "w", encoding="utf-8") as f:
+        json.dump(store.filenames, f, ensure_ascii=False, indent=2)
+    return version
+
 # llm_animal.py의 update_db_from_s3 함수 (덮어쓰기)
 
 def update_db_from_s3(s3_folder_path, db_file, id_map_file):
     s3 = get_s3_client()
     
-    # 1. ◀◀ [수정] 기존 DB 로드 -> "맵(Map)"으로 변환 (빠른 조회를 위함)
+    # 1. ◀◀ [수정] 기존 DB(컬럼형 저장소) 로드 -> "파일명 -> 행 번호 맵"으로 변환 (빠른 조회를 위함)
     print(f"'{db_file}'에서 기존 DB 로드 중...")
+    old_store = None
     old_db_map = {}
-    if os.path.exists(db_file):
+    if vector_store.read_current_version(vector_store.store_path_for(db_file)) or os.path.exists(db_file):
         try:
-            with open(db_file, "r", encoding="utf-8") as f:
-                db_full_old = json.load(f)
-                # 파일명을 key로, item 전체를 value로 하는 맵 생성
-                old_db_map = {item['filename']: item for item in db_full_old}
+            old_store = load_db(db_file, mmap=True)
+            # 파일명을 key로, 행 번호를 value로 하는 맵 생성
+            old_db_map = old_store.row_map()
             print(f"현재 DB 항목: {len(old_db_map)}개 (맵으로 로드)")
         except Exception as e:
             print(f"⚠️ 경고: 기존 {db_file} 로드/파싱 실패. DB를 처음부터 다시 생성합니다. {e}")
-            db_full_old = [] # (Just in case)
+            old_store = None
+            old_db_map = {}
     else:
-        db_full_old = [] # (Just in case)
         print("기존 DB 파일 없음. DB를 새로 생성합니다.")
     
     # 2. S3 목록 가져오기 (원본 동일)
@@ -420,50 +702,60 @@ def update_db_from_s3(s3_folder_path, db_file, id_map_file):
         if 'Contents' not in response:
             print(f"❌ [오류] S3 폴더 '{s3_folder_path}'에 파일이 없습니다.")
             # (수정) ◀ S3 폴더가 비어있다면, 빈 DB를 저장하고 성공으로 처리
-            with open(db_file, "w", encoding="utf-8") as f:
-                json.dump([], f)
-            with open(id_map_file, "w", encoding="utf-8") as f:
-                json.dump([], f)
-            print(f"✅ S3 폴더가 비어있어, '{db_file}'을(를) 빈 파일로 저장했습니다.")
+            save_db(vector_store.VectorStore.empty(RERANK_KEYS, VECTOR_DIMENSION, STORE_DTYPE), db_file, id_map_file)
+            print(f"✅ S3 폴더가 비어있어, '{db_file}'을(를) 빈 DB로 저장했습니다.")
             return True # ◀ FAISS 재구축 신호
         
         image_keys = [obj['Key'] for obj in response['Contents'] if obj['Key'].lower().endswith(('.jpg', '.jpeg', '.png'))]
+        etags = {obj['Key']: obj.get('ETag') for obj in response['Contents']} # ◀ 내용이 바뀐 키 감지용
         print(f"S3에서 총 {len(image_keys)}개의 이미지를 발견했습니다. (삭제된 파일은 제외됨)")
         
     except Exception as e:
         print(f"❌ [S3 오류] 스토리지 연결 또는 목록 조회를 실패했습니다: {e}")
         return False
 
-    # 3. ◀◀ [신규] "새로운 DB"를 담을 빈 리스트 초기화
-    new_db_full = []
-    new_id_to_filename = []
+    # 3. ◀◀ [신규] "새로운 DB"의 순서를 담을 리스트 초기화
+    #    ('old', 기존 행 번호) 또는 ('new', 신규 항목 번호)
+    new_db_order = []
+    new_items = []
     new_item_count = 0
     synced_item_count = 0
+    pending_new_items = [] # ◀ (new_db_order 내 위치, S3 키, LLM 분석 결과) - 임베딩 대기 중인 신규 항목
+
+    # ◀ 내용이 바뀐 기존 파일을 다시 처리하다 실패하면 기존 행을 그대로 유지 (DB / 인덱스에서 빠지지 않도록)
+    #   '동기화됨' 표시(ETag)는 남기지 않으므로 다음 갱신 때 다시 시도함
+    def keep_old_row(s3_key, pos=None):
+        if s3_key not in old_db_map:
+            return 0
+        print(f"    [Keep] 재처리 실패, 기존 데이터 유지: {s3_key}")
+        if pos is None:
+            new_db_order.append(('old', old_db_map[s3_key]))
+        else:
+            new_db_order[pos] = ('old', old_db_map[s3_key])
+        return 1
     
     # 4. (핵심) "현재 S3 목록 (image_keys)"을 기준으로 새 DB를 재구성
     #    (S3에서 삭제된 파일은 이 루프에 포함되지 않음)
     for i, s3_key in enumerate(image_keys):
         
-        # --- (A) 이미 DB에 존재하는 파일 (데이터 재사용, 비용 절약) ---
-        if s3_key in old_db_map:
+        # --- (A) 이미 DB에 존재하고 내용도 그대로인 파일 (데이터 재사용, 비용 절약) ---
+        # ◀ 같은 키에 사진이 다시 올라간 경우(ETag 변경)는 (B)로 다시 처리
+        if s3_key in old_db_map and not s3_object_changed(s3_key, etags.get(s3_key)):
             print(f"  [{i+1}/{len(image_keys)}] (Sync) 기존 데이터 재사용: {s3_key}")
-            new_db_full.append(old_db_map[s3_key]) # ◀ 기존 item을 그대로 추가
-            new_id_to_filename.append(s3_key)
+            new_db_order.append(('old', old_db_map[s3_key])) # ◀ 기존 행을 그대로 사용
             synced_item_count += 1
         
-        # --- (B) S3에 새로 추가된 파일 (LLM/임베딩 실행, 비용 발생) ---
+        # --- (B) S3에 새로 추가되었거나 내용이 바뀐 파일 (LLM/임베딩 실행, 비용 발생) ---
         else:
             print(f"  [{i+1}/{len(image_keys)}] (New) 신규 처리: {s3_key}")
             
             try:
-                # 3-1. S3 다운로드
-                obj = s3.get_object(Bucket=bucket_name, Key=s3_key)
-                image_bytes = obj['Body'].read()
-                image_data_b64 = base64.b64encode(image_bytes).decode("utf-8")
-                
-                # 3-2. LLM 분석 (비용 발생 부분)
-                obj_attr = analyze_image_bytes(image_data_b64, s3_key)
-                if obj_attr is None: continue
+                # 3-1. ◀◀ [수정] S3 다운로드 + LLM 분석 (비용 발생 부분)
+                #      크롤러(Trigger 1)가 이미 분석한 사진은 S3 키 기록으로 다운로드 / LLM 모두 생략
+                obj_attr = analyze_s3_object(s3_key, s3=s3)
+                if obj_attr is None:
+                    synced_item_count += keep_old_row(s3_key)
+                    continue
                 
                 # (user_num 파싱 로직은 원본 그대로 유지)
                 parsed_user_num = None
@@ -477,22 +769,36 @@ def update_db_from_s3(s3_folder_path, db_file, id_map_file):
                     else:
                         print(f"    [Warn] 파일명 {filename_only}에서 user_num을 파싱할 수 없습니다.")
 
-                # 3-3. 임베딩 (비용 발생 없음)
-                emb = get_embeddings_for_attributes(obj_attr)
-                if emb is None: continue
-                    
-                # 3-4. "새 리스트"에 Append
-                new_item = {
-                    "filename": s3_key,
-                    "attributes": obj_attr,
-                    "attr_embeddings": emb
-                }
-                new_db_full.append(new_item) # ◀ "새 리스트"에 추가
-                new_id_to_filename.append(s3_key) # ◀ "새 리스트"에 추가
-                new_item_count += 1
+                # 3-3. ◀◀ [수정] 임베딩은 바로 하지 않고, 아래에서 여러 항목을 묶어 배치로 처리
+                pending_new_items.append((len(new_db_order), s3_key, obj_attr))
+                new_db_order.append(None) # ◀ (자리 확보) S3 목록 순서 유지
                 
             except Exception as e:
                 print(f"❌ [오류] {s3_key} 처리 중 실패: {e}")
+                synced_item_count += keep_old_row(s3_key)
+
+    # 4-1. ◀◀ [신규] 신규 항목 임베딩 (EMBED_ITEMS_PER_BATCH개 항목씩 묶어 1회 요청)
+    for start in range(0, len(pending_new_items), EMBED_ITEMS_PER_BATCH):
+        chunk = pending_new_items[start:start + EMBED_ITEMS_PER_BATCH]
+        print(f"  [임베딩] 신규 항목 {start+1}~{start+len(chunk)}/{len(pending_new_items)} 배치 처리 중...")
+        try:
+            chunk_embs = get_embeddings_for_attributes_batch([obj_attr for _, _, obj_attr in chunk])
+        except Exception as e:
+            print(f"❌ [오류] 임베딩 배치 처리 중 실패: {e}")
+            for pos, s3_key, _ in chunk:
+                synced_item_count += keep_old_row(s3_key, pos)
+            continue
+
+        # 3-4. 확보해 둔 자리에 신규 항목 번호를 채워 넣기
+        for (pos, s3_key, obj_attr), emb in zip(chunk, chunk_embs):
+            new_db_order[pos] = ('new', len(new_items))
+            new_items.append({
+                "filename": s3_key,
+                "attributes": obj_attr,
+                "attr_embeddings": emb
+            })
+            new_item_count += 1
+            mark_s3_object_synced(s3_key, etags.get(s3_key)) # ◀ DB에 반영된 키만 '동기화됨' 표시
 
     # 5. ◀◀ [수정] 변경 사항 감지 및 저장
     deleted_item_count = len(old_db_map) - synced_item_count
@@ -502,51 +808,117 @@ def update_db_from_s3(s3_folder_path, db_file, id_map_file):
         # (중요) ◀ 변경이 없어도 FAISS 재구축은 필요할 수 있으므로 True 반환
         return True 
 
-    # 6. JSON 파일 저장 (변경된 경우 "new_db_full"로 덮어쓰기)
+    # 6. ◀◀ [수정] 기존 행 + 신규 항목을 S3 목록 순서대로 합쳐 컬럼형 저장소로 저장
+    #    (기존 항목은 고정 ID 유지, 신규 항목은 next_id부터 새 ID 부여)
     print(f"\n{new_item_count}개 추가, {deleted_item_count}개 삭제됨. 새 DB 저장 중...")
-    with open(db_file, "w", encoding="utf-8") as f:
-        json.dump(new_db_full, f, ensure_ascii=False, indent=2)
-    with open(id_map_file, "w", encoding="utf-8") as f:
-        json.dump(new_id_to_filename, f, ensure_ascii=False, indent=2)
-        
-    print(f"✅ DB 저장 완료 (총 {len(new_db_full)}개 항목)")
+    old_part = old_store if old_store is not None else vector_store.VectorStore.empty(RERANK_KEYS, VECTOR_DIMENSION, STORE_DTYPE)
+    new_part = vector_store.VectorStore.from_items(new_items, RERANK_KEYS, VECTOR_DIMENSION, STORE_DTYPE, first_id=old_part.next_id)
+    combined = vector_store.VectorStore.concat([old_part, new_part])
+
+    # ◀ 분석/임베딩에 실패해 비어 있는 자리(None)는 제외
+    order_rows = []
+    for entry in new_db_order:
+        if entry is None:
+            continue
+        kind, row = entry
+        order_rows.append(row if kind == 'old' else len(old_part) + row)
+    new_store = combined.take(order_rows)
+    version = save_db(new_store, db_file, id_map_file)
+
+    print(f"✅ DB 저장 완료 (총 {len(new_store)}개 항목, 저장소 버전 {version})")
+    print_embedding_cache_stats()
+    image_preprocess.print_stats()
     return True # ◀ DB 변경되었으므로 FAISS 재구축 신호
 
-def rebuild_faiss_index(db_file, index_file, id_map_file):
-    print(f"\n--- FAISS 인덱스 재구축 시작 ---")
+def index_params_for(index_file):
+    """
+    인덱스 파일에 지정된 FAISS 인덱스 설정을 반환합니다. (지정이 없으면 flat)
+    """
+    return INDEX_PARAMS.get(os.path.basename(index_file), {"type": "flat"})
+
+def rebuild_faiss_index(db_file, index_file, id_map_file, full_rebuild=False):
+    """
+    ◀◀ [수정] 저장소의 고정 ID 기준으로 인덱스를 증분 갱신합니다.
+    (새 항목만 추가, S3에서 사라진 항목만 삭제, 변경분만 파일로 기록 / full_rebuild=True면 전체 재구축)
+    """
+    print(f"\n--- FAISS 인덱스 갱신 시작 ---")
     try:
-        with open(db_file, "r", encoding="utf-8") as f:
-            db = json.load(f)
+        store = load_db(db_file, mmap=True)
         with open(id_map_file, "r", encoding="utf-8") as f:
             id_to_filename_check = json.load(f)
     except Exception as e:
         print(f"❌ {db_file} 또는 {id_map_file} 로드 실패: {e}")
         return
 
-    all_vectors = []
-    id_map_for_faiss = []
-    
-    for item in db:
-        vector = item.get("attr_embeddings", {}).get("__merged__")
-        if vector:
-            all_vectors.append(vector)
-            id_map_for_faiss.append(item.get("filename"))
+    _, merged_valid = store.merged_vectors()
+    id_map_for_faiss = [f for f, ok in zip(store.filenames, merged_valid) if ok]
             
     if id_map_for_faiss != id_to_filename_check:
         print("❌ [치명적 오류] DB와 ID맵의 순서가 불일치합니다. 인덱스 생성을 중단합니다.")
         return
 
-    print(f"총 {len(all_vectors)}개의 벡터로 인덱스 생성...")
-    all_vectors_np = np.array(all_vectors).astype('float32')
-    
-    faiss.normalize_L2(all_vectors_np)
-    
     # (중요) ◀◀ 전역 변수 VECTOR_DIMENSION 사용
-    index = faiss.IndexFlatIP(VECTOR_DIMENSION) 
-    index.add(all_vectors_np)
-    
-    faiss.write_index(index, index_file)
-    print(f"✅ FAISS 인덱스 저장 완료 → {index_file} (총 {index.ntotal}개)")
+    index_params = index_params_for(index_file)
+    index, added, removed, was_full = index_manager.sync_index(index_file, store, VECTOR_DIMENSION,
+                                                               force_full=full_rebuild, params=index_params)
+
+    # ◀ 인덱스의 ID 집합 / ID -> 파일명이 DB 항목과 어긋나면 (변경분 유실 등) 전체 재구축으로 복구
+    if not index_manager.check_index_consistency(index, store, index_file):
+        print("⚠️ [인덱스] 인덱스와 DB의 ID가 불일치합니다. 전체 재구축합니다.")
+        index, added, removed, was_full = index_manager.sync_index(index_file, store, VECTOR_DIMENSION,
+                                                                   force_full=True, params=index_params)
+
+    # ◀◀ [신규] 종별 ID 목록(파티션)을 인덱스 옆에 저장 (검색 시 같은 종 안에서만 탐색)
+    species_groups = index_manager.build_species_partitions(index, store)
+    index_manager.write_species_partitions(index_file, species_groups)
+    print("  [인덱스] 종별 파티션: " + ", ".join(f"{k or '(미상)'} {len(v)}개" for k, v in species_groups.items()))
+
+    print(f"  [인덱스] 종류: {index_manager.index_kind(index)} {index_manager.read_index_params(index_file)['built']}")
+    if was_full:
+        print(f"✅ FAISS 인덱스 전체 재구축 완료 → {index_file} (총 {index.ntotal}개)")
+    elif added or removed:
+        print(f"✅ FAISS 인덱스 증분 갱신 완료 → {index_file} (추가 {added}개, 삭제 {removed}개, 총 {index.ntotal}개)")
+    else:
+        print(f"✅ FAISS 인덱스 변경 없음 → {index_file} (총 {index.ntotal}개)")
+
+def load_index(index_file):
+    """
+    기준 인덱스 + 변경분(delta)을 적용한 최신 인덱스를 로드합니다.
+    """
+    return index_manager.load_index(index_file)
+
+def search_species_candidates(index, store, partitions, query_vector_np, query_species, k=K_CANDIDATES):
+    """
+    ◀◀ [신규] 쿼리와 같은 종의 파티션 안에서만 FAISS 검색하여 후보 행 번호를 반환합니다.
+    (다른 종이 상위권을 차지해 후보가 모자라는 문제 없이 항상 최대 k개를 채움)
+    """
+    partition = partitions.get(index_manager.species_key(query_species))
+    D_faiss, I_faiss = index_manager.search_partition(index, query_vector_np, k, partition)
+    return candidate_rows(index, store, I_faiss[0])
+
+def search_species_candidates_batch(index, store, partitions, query_vectors_np, query_species_list, k=K_CANDIDATES):
+    """
+    ◀◀ [신규] 쿼리 여러 개를 종별로 묶어, 종마다 (쿼리 수, D) 행렬로 FAISS 검색을 1번씩만 수행합니다.
+    반환값: 쿼리 순서대로 후보 행 번호 리스트
+    """
+    groups = {}
+    for i, query_species in enumerate(query_species_list):
+        groups.setdefault(index_manager.species_key(query_species), []).append(i)
+
+    results = [None] * len(query_species_list)
+    for key, query_ids in groups.items():
+        D_faiss, I_faiss = index_manager.search_partition(index, query_vectors_np[query_ids], k, partitions.get(key))
+        for i, faiss_ids in zip(query_ids, I_faiss):
+            results[i] = candidate_rows(index, store, faiss_ids)
+    return results
+
+def candidate_rows(index, store, faiss_ids):
+    """
+    FAISS 검색 결과(고정 ID)를 저장소의 행 번호로 변환합니다. (구버전 위치 기반 인덱스는 그대로 사용)
+    """
+    if index_manager.has_stable_ids(index):
+        return store.rows_for_ids(faiss_ids)
+    return [int(i) for i in faiss_ids]
 
 # ◀◀ [신규 추가] DB 덮어쓰기 전용 함수 (app.py에서 호출)
 def refresh_missing_data_from_db():
@@ -558,9 +930,9 @@ def refresh_missing_data_from_db():
 
     # (주의) 경로 설정이 중요합니다. app.py가 실행되는 위치 기준입니다.
     s3_folder = "abandon/missing"  # S3 폴더명
-    db_file = "missing_pets.json"
-    map_file = "missing_map.json"
-    index_file = "missing_vectors.index"
+    db_file = MISSING_DB_FILE
+    map_file = MISSING_MAP_FILE
+    index_file = MISSING_INDEX_FILE
 
     # 1. DB 갱신 (update_db_from_s3 함수 재사용)
     success = update_db_from_s3(s3_folder, db_file, map_file)
@@ -588,12 +960,20 @@ def refresh_crawled_data():
     map_file = "id_map.json"
     index_file = "animal_vectors.index"
 
-    # 1. DB 및 맵 파일 갱신
-    success = update_db_from_s3(s3_folder, db_file, map_file)
+    # ◀ 서버의 새로고침(app.run_refresh_job)과 같은 파일을 동시에 쓰지 않도록 같은 잠금을 사용
+    with refresh_jobs.file_lock(refresh_jobs.REFRESH_LOCK_FILE):
+        # 1. DB 및 맵 파일 갱신
+        success = update_db_from_s3(s3_folder, db_file, map_file)
+
+        # 2. 벡터 인덱스 재구축
+        if success:
+            rebuild_faiss_index(db_file, index_file, map_file)
+            # 3. ◀ 변경분을 기준 인덱스에 합침 (변경분이 남아 있으면 서버 워커마다 인덱스를 메모리에 따로 올림)
+            merged = index_manager.compact_index(index_file)
+            if merged:
+                print(f"  [인덱스] 변경분 {merged}개를 기준 인덱스에 합쳤습니다. (메모리 맵 로드 가능)")
 
-    # 2. 벡터 인덱스 재구축
     if success:
-        rebuild_faiss_index(db_file, index_file, map_file)
         print("✅ [Crawler Trigger] 파일 갱신 완료.")
         return True
     else:
@@ -631,9 +1011,9 @@ if __name__ == "__main__":
         # 2. (수정) ◀ 동적 인자를 사용해 DB에 Append
         success = update_db_from_s3(s3_folder_to_scan, db_file_arg, id_map_file_arg)
         
-        # 3. (수정) ◀ 동적 인자를 사용해 FAISS 인덱스 재구축
+        # 3. (수정) ◀ 동적 인자를 사용해 FAISS 인덱스 갱신 (--full: 증분 대신 전체 재구축)
         if success:
-            rebuild_faiss_index(db_file_arg, index_file_arg, id_map_file_arg)
+            rebuild_faiss_index(db_file_arg, index_file_arg, id_map_file_arg, full_rebuild='--full' in sys.argv[6:])
         
         print(f"--- [DB 갱신 완료]: {db_file_arg} ---")
             
@@ -647,24 +1027,24 @@ if __name__ == "__main__":
         
         print(f"'{INDEX_FILE}'에서 FAISS 인덱스를 로드합니다.")
         try:
-            index = faiss.read_index(INDEX_FILE)
+            index = load_index(INDEX_FILE)
         except Exception as e:
             print(f"❌ [오류] FAISS 인덱스({INDEX_FILE}) 로드 실패: {e}")
             sys.exit()
         
-        print(f"'{MAP_FILE}'에서 ID-파일명 맵을 로드합니다.")
+        print(f"'{ID_MAP_FILE}'에서 ID-파일명 맵을 로드합니다.")
         try:
-            with open(MAP_FILE, "r", encoding="utf-8") as f:
+            with open(ID_MAP_FILE, "r", encoding="utf-8") as f:
                 id_to_filename = json.load(f)
         except Exception as e:
-            print(f"❌ [오류] ID 맵({MAP_FILE}) 로드 실패: {e}")
+            print(f"❌ [오류] ID 맵({ID_MAP_FILE}) 로드 실패: {e}")
             sys.exit()
             
         print(f"'{DB_FILE}'에서 2단계 재정렬을 위한 원본 DB 로드 중...")
         try:
-            with open(DB_FILE,"r",encoding="utf-8") as f:
-                db_full = json.load(f)
-            print(f"✅ 원본 DB 로드 완료 ({len(db_full)}개 항목)")
+            db_store = load_db(DB_FILE)
+            db_partitions = index_manager.load_species_partitions(INDEX_FILE, index, db_store)
+            print(f"✅ 원본 DB 로드 완료 ({len(db_store)}개 항목)")
         except Exception as e:
             print(f"❌ 원본 DB({DB_FILE}) 로드 실패: {e}")
             sys.exit()
@@ -683,19 +1063,15 @@ if __name__ == "__main__":
                 query_merged_vector = query_attr_emb["__merged__"]
                 query_vector_np = np.array([query_merged_vector]).astype('float32')
                 faiss.normalize_L2(query_vector_np)
-                D_faiss, I_faiss = index.search(query_vector_np, K_CANDIDATES)
-                candidate_indices = I_faiss[0]
+                query_species = query_obj.get("dog_or_cat_or_other")
+                candidate_indices = search_species_candidates(index, db_store, db_partitions, query_vector_np, query_species)
                 print(f"✅ FAISS 예선 완료 (처리 시간: {time.time() - start_time_faiss:.2f}초)")
                 
                 print(f"\n--- [2단계: 원본 로직 본선] 시작 (후보 {len(candidate_indices)}개 재정렬) ---")
                 (start_time_rerank) = time.time()
-                query_species = query_obj.get("dog_or_cat_or_other")
-                final_results = []
-                for idx in candidate_indices:
-                    item = db_full[idx]
-                    if item.get("attributes", {}).get("dog_or_cat_or_other") == query_species:
-                        score = compare_query_to_item(query_attr_emb, item)
-                        final_results.append((item["filename"], score))
+                rows = filter_species_rows(candidate_indices, db_store, query_species)
+                scores = rerank_candidates(query_attr_emb, db_store, rows)
+                final_results = [(db_store.filenames[idx], float(score)) for idx, score in zip(rows, scores)]
                 final_results.sort(key=lambda x: x[1], reverse=True)
                 print(f"✅ 원본 로직 본선 완료 (처리 시간: {time.time() - start_time_rerank:.2f}초)")
                 
@@ -706,11 +1082,42 @@ if __name__ == "__main__":
                 print("="*40)
                 for i, (filename, score) in enumerate(final_results[:K_FINAL]):
                     print(f"  {i+1}순위: {filename} (유사도: {score:.4f})")
+                print_embedding_cache_stats()
             else:
                 print("❌ [실행 중단] 쿼리 이미지의 임베딩 생성에 실패했습니다.")
         else:
             print("❌ [실행 중단] 쿼리 이미지의 LLM 분석에 실패했습니다.")
             
+    # --- (C) 기존 JSON DB -> 컬럼형 저장소 1회 변환 모드 ---
+    elif mode == 'migrate':
+        if len(sys.argv) < 3:
+            print("❌ [실행 오류] 'migrate' 모드는 JSON DB 파일 경로가 필요합니다.")
+            print("   (예시) python llm_animal.py migrate dog_cat_features_attr_emb.json [float16]")
+            print("   (예시) python llm_animal.py migrate missing_pets.json")
+            sys.exit()
+        dtype_arg = sys.argv[3] if len(sys.argv) >= 4 else STORE_DTYPE
+        vector_store.migrate_json_to_store(sys.argv[2], RERANK_KEYS, VECTOR_DIMENSION, dtype_arg)
+
+    # --- (D) 분석 캐시 무효화 모드 (prompt 문구 변경 후 실행) ---
+    elif mode == 'invalidate-analysis':
+        if analysis_cache is None:
+            print("❌ [오류] 분석 캐시가 비활성화되어 있습니다.")
+        elif len(sys.argv) >= 3 and sys.argv[2] == '--all':
+            deleted = analysis_cache.invalidate()
+            print(f"✅ 분석 캐시 전체 삭제 완료 ({deleted}개)")
+        else:
+            deleted = analysis_cache.invalidate(keep_prompt_version=PROMPT_VERSION)
+            print(f"✅ 이전 프롬프트 버전의 분석 결과 {deleted}개 삭제 (현재 버전: {PROMPT_VERSION})")
+
+    # --- (E) 캐시 상태 확인 모드 ---
+    elif mode == 'cache-stats':
+        if embedding_cache is None:
+            print("❌ [오류] 임베딩 캐시가 비활성화되어 있습니다.")
+        else:
+            print(f"'{EMBEDDING_CACHE_FILE}' 저장 항목 수: {embedding_cache.entry_count()}개 (상한 {embedding_cache.max_entries}개)")
+        if analysis_cache is not None:
+            print(f"'{ANALYSIS_CACHE_FILE}' 저장 항목 수: {analysis_cache.entry_count()}개 (현재 프롬프트 버전: {PROMPT_VERSION})")
+
     else:
         print(f"❌ [실행 오류] 알 수 없는 모드입니다: '{mode}'")
-        print("   (사용 가능 모드: 'update' 또는 'search')")
+        print("   (사용 가능 모드: 'update', 'search', 'migrate', 'cache-stats' 또는 'invalidate-analysis')")
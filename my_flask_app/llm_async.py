@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+# LLM / 임베딩 호출의 asyncio 버전 (async_app.py 전용)
+# - llm_animal.py의 프롬프트, 캐시(분석 / 임베딩), JSON 파싱 로직을 그대로 재사용하고
+#   OpenAI 호출만 AsyncOpenAI로 바꿔, 응답을 기다리는 동안 스레드를 붙잡지 않음
+# - 쿼리 1건의 속성 텍스트(약 25개)는 EMBED_ASYNC_CHUNK개씩 나눠 동시에 요청
+# - FAISS 검색 / 재정렬(CPU 작업)은 크기가 정해진 스레드 풀(search executor)에서 실행
+import asyncio
+import base64
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import AsyncOpenAI
+
+import llm_animal
+import metrics
+from analysis_cache import hash_image_bytes
+
+LLM_CONCURRENCY = 64      # ◀ 동시에 진행할 gpt-4o 요청 수 상한 (OpenAI 분당 한도에 맞춰 조정)
+EMBED_CONCURRENCY = 128   # ◀ 동시에 진행할 임베딩 요청 수 상한
+EMBED_ASYNC_CHUNK = 8     # ◀ 한 번의 임베딩 요청에 담을 텍스트 수 (작게 나눠 동시에 보내 지연 시간 단축)
+SEARCH_WORKERS = 4        # ◀ FAISS / 재정렬 전용 스레드 수 (CPU 코어 수 정도)
+
+_client = None
+_llm_semaphore = None
+_embed_semaphore = None
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="search")
+
+def get_client():
+    """
+    AsyncOpenAI 클라이언트와 동시 요청 제한(semaphore)을 처음 사용할 때 만듭니다.
+    (llm_animal import 시 API 키가 환경변수로 설정됨)
+    """
+    global _client, _llm_semaphore, _embed_semaphore
+    if _client is None:
+        _client = AsyncOpenAI()
+        _llm_semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+        _embed_semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+    return _client
+
+async def run_search(func, *args):
+    """
+    CPU 작업(FAISS 검색, 재정렬)을 search executor에서 실행하고 결과를 기다립니다.
+    """
+    # ◀ run_in_executor는 contextvars를 넘기지 않으므로 bind()로 엔드포인트 라벨을 유지
+    return await asyncio.get_running_loop().run_in_executor(search_executor, metrics.bind(func), *args)
+
+# --- 1. 이미지 / 텍스트 분석 ---
+def _lookup_analysis(image_bytes):
+    image_hash = hash_image_bytes(image_bytes)
+    return image_hash, llm_animal.analysis_cache.get(image_hash, llm_animal.PROMPT_VERSION)
+
+async def analyze_image_bytes_async(image_data_base64, image_name_for_log, preprocessed=False):
+    """
+    llm_animal.analyze_image_bytes의 비동기 버전. (같은 분석 캐시 / 같은 전처리 사용)
+    """
+    try:
+        image_bytes = base64.b64decode(image_data_base64)
+    except Exception as e:
+        print(f"❌ [LLM 오류] {image_name_for_log} Base64 디코딩 실패: {e}")
+        return None
+
+    analysis_cache = llm_animal.analysis_cache
+    image_hash = None
+    if analysis_cache is not None:
+        try:
+            # ◀ 해시 + sqlite 조회는 스레드에서 (이벤트 루프를 막지 않음)
+            image_hash, cached_json = await asyncio.to_thread(_lookup_analysis, image_bytes)
+            if cached_json:
+                print(f"[LLM 분석 캐시 적중] {image_name_for_log}")
+                metrics.LLM_CALLS.inc(kind="image", result="cache_hit")
+                return json.loads(cached_json)
+        except Exception as e:
+            print(f"⚠️ [분석 캐시] 조회 실패 (LLM 분석으로 진행): {e}")
+
+    if not preprocessed:
+        # ◀ 축소 / 재인코딩(CPU 작업)도 스레드에서
+        image_data_base64 = await asyncio.to_thread(llm_animal.prepare_image_for_llm, image_bytes, image_name_for_log)
+
+    print(f"[LLM 분석중] {image_name_for_log}")
+    client = get_client()
+    try:
+        async with _llm_semaphore:
+            with metrics.stage("llm"):
+                resp = await client.chat.completions.create(
+                    model=llm_animal.VISION_MODEL,
+                    messages=[ { "role": "user", "content": [ {"type": "text", "text": llm_animal.prompt}, {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_data_base64}"}} ] } ],
+                    temperature=0
+                )
+        text = resp.choices[0].message.content
+        json_str = llm_animal.extract_json_from_text(text)
+        if not json_str:
+            print(f"[경고] JSON 감지 실패: {image_name_for_log}")
+            metrics.LLM_CALLS.inc(kind="image", result="error")
+            return None
+        result = json.loads(json_str)
+        metrics.LLM_CALLS.inc(kind="image", result="ok")
+
+        # ◀ 파싱에 성공한 결과만 캐시에 저장
+        if analysis_cache is not None and image_hash:
+            await asyncio.to_thread(analysis_cache.put, image_hash, llm_animal.PROMPT_VERSION,
+                                    json.dumps(result, ensure_ascii=False))
+        return result
+    except Exception as e:
+        print(f"❌ [LLM 오류] {image_name_for_log} 분석 중 오류: {e}")
+        metrics.LLM_CALLS.inc(kind="image", result="error")
+        return None
+
+async def analyze_text_async(user_query_text):
+    """
+    llm_animal.analyze_text_with_llm의 비동기 버전.
+    """
+    print(f"[LLM 텍스트 분석중] {user_query_text}")
+    final_prompt = llm_animal.prompt_for_text_query.replace("{user_query}", user_query_text)
+    client = get_client()
+    try:
+        async with _llm_semaphore:
+            with metrics.stage("llm"):
+                resp = await client.chat.completions.create(
+                    model="gpt-4o",
+                    messages=[ { "role": "user", "content": final_prompt } ],
+                    temperature=0
+                )
+        text = resp.choices[0].message.content
+        json_str = llm_animal.extract_json_from_text(text)
+        if not json_str:
+            print(f"[경고] JSON 감지 실패 (텍스트 쿼리): {user_query_text}")
+            metrics.LLM_CALLS.inc(kind="text", result="error")
+            return None
+        result = llm_animal.clean_json_keys(json.loads(json_str))
+        metrics.LLM_CALLS.inc(kind="text", result="ok")
+        return result
+    except Exception as e:
+        print(f"❌ [LLM 오류] 텍스트 쿼리 분석/파싱 중 오류: {e}")
+        metrics.LLM_CALLS.inc(kind="text", result="error")
+        return None
+
+# --- 2. 임베딩 ---
+async def _embed_one(text_value):
+    try:
+        async with _embed_semaphore:
+            with metrics.stage("embedding"):
+                resp = await get_client().embeddings.create(model=llm_animal.EMBEDDING_MODEL, input=[text_value])
+        metrics.EMBEDDING_CALLS.inc(result="ok")
+        return resp.data[0].embedding
+    except Exception as item_e:
+        metrics.EMBEDDING_CALLS.inc(result="error")
+        print(f"⚠️ [임베딩 경고] 값 '{text_value}'의 임베딩 실패: {item_e}")
+        return None
+
+async def _embed_chunk(chunk):
+    """
+    텍스트 묶음 1개를 임베딩합니다. 묶음 요청이 실패하면 항목별 요청을 동시에 보내 나머지 항목은 살립니다.
+    """
+    results = [None] * len(chunk)
+    try:
+        async with _embed_semaphore:
+            with metrics.stage("embedding"):
+                resp = await get_client().embeddings.create(model=llm_animal.EMBEDDING_MODEL, input=chunk)
+        metrics.EMBEDDING_CALLS.inc(result="ok")
+        # ◀ 응답 순서가 바뀌어도 안전하도록 index 기준으로 배치
+        for d in resp.data:
+            results[d.index] = d.embedding
+        return results
+    except Exception as e:
+        metrics.EMBEDDING_CALLS.inc(result="error")
+        print(f"⚠️ [임베딩 경고] 배치({len(chunk)}개) 요청 실패, 개별 요청으로 재시도: {e}")
+        return list(await asyncio.gather(*(_embed_one(t) for t in chunk)))
+
+async def embed_texts_async(texts):
+    """
+    llm_animal.embed_texts_with_cache의 비동기 버전. 캐시에 없는 텍스트만 여러 요청으로 나눠 동시에 임베딩합니다.
+    """
+    get_client()
+    embedding_cache = llm_animal.embedding_cache
+    results = [None] * len(texts)
+    if embedding_cache is not None:
+        try:
+            results = await asyncio.to_thread(embedding_cache.get_many, llm_animal.EMBEDDING_MODEL, texts)
+        except Exception as e:
+            print(f"⚠️ [임베딩 캐시] 조회 실패 (API로 진행): {e}")
+
+    # ◀ 같은 텍스트가 여러 번 나와도 API에는 한 번만 요청
+    miss_texts = list(dict.fromkeys(t for t, r in zip(texts, results) if r is None))
+    metrics.EMBEDDING_TEXTS.inc(len(texts) - sum(r is None for r in results), source="cache")
+    metrics.EMBEDDING_TEXTS.inc(len(miss_texts), source="api")
+    if not miss_texts:
+        return results
+
+    start_time = time.time()
+    chunks = [miss_texts[i:i + EMBED_ASYNC_CHUNK] for i in range(0, len(miss_texts), EMBED_ASYNC_CHUNK)]
+    chunk_vectors = await asyncio.gather(*(_embed_chunk(chunk) for chunk in chunks))
+    miss_vectors = [vec for vectors in chunk_vectors for vec in vectors]
+
+    if embedding_cache is not None:
+        embedding_cache.record_api_call((time.time() - start_time) * 1000)
+        try:
+            await asyncio.to_thread(embedding_cache.put_many, llm_animal.EMBEDDING_MODEL, miss_texts, miss_vectors)
+        except Exception as e:
+            print(f"⚠️ [임베딩 캐시] 저장 실패: {e}")
+
+    miss_map = dict(zip(miss_texts, miss_vectors))
+    return [r if r is not None else miss_map.get(t) for t, r in zip(texts, results)]
+
+async def get_embeddings_for_attributes_batch_async(attr_dicts):
+    """
+    llm_animal.get_embeddings_for_attributes_batch의 비동기 버전. (같은 형식의 딕셔너리 리스트 반환)
+    """
+    all_attr_embeds, pending, texts = llm_animal.prepare_attribute_texts(attr_dicts)
+    vectors = await embed_texts_async(texts) if texts else []
+    return llm_animal.assemble_attribute_embeddings(all_attr_embeds, pending, vectors)
+
+async def get_embeddings_for_attributes_async(attr_dict):
+    """
+    llm_animal.get_embeddings_for_attributes의 비동기 버전. (같은 형식의 딕셔너리 반환)
+    """
+    return (await get_embeddings_for_attributes_batch_async([attr_dict]))[0]
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+# 단계별 지연 시간 히스토그램 / 카운터 + Prometheus 텍스트 형식 출력 (/metrics)
+# - 기존에는 요청마다 총 소요 시간(time.time() 차이) 한 줄만 print하여
+#   LLM / 임베딩 / FAISS / 재정렬 / MySQL 중 어디가 병목인지 알 수 없었음
+# - 요청 시작 시 set_endpoint()로 엔드포인트를 정해두면, 그 요청 안에서 호출되는 함수들의
+#   stage("llm") 등이 자동으로 같은 엔드포인트 라벨로 기록됨 (contextvars → 스레드 / asyncio 모두 동작)
+# - 별도 스레드 풀로 넘기는 작업은 bind()로 감싸야 엔드포인트 라벨이 따라감
+#
+# 사용 예시)
+#   with metrics.stage("faiss"):
+#       candidates = snap.search(...)
+#   metrics.LLM_CALLS.inc(kind="image", result="ok")
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# ◀ LLM 호출(수 초)부터 FAISS 검색(수 ms)까지 한 번에 보이도록 넓게 잡은 구간 (초)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+_current_endpoint = contextvars.ContextVar("metrics_endpoint", default="background")
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, values):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["counts"][i] += 1
+                    break
+            entry["sum"] += value
+            entry["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start_time, **labels)
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, dict(entry, counts=list(entry["counts"]))) for key, entry in self._values.items())
+        lines = self.header()
+        for key, entry in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry["counts"]):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(entry['sum'])}")
+            lines.append(f"{self.name}_count{labels} {entry['count']}")
+        return lines
+
+class GaugeCallback:
+    """
+    출력할 때마다 func()를 호출해 값을 읽는 게이지. (캐시 / 커넥션 풀처럼 이미 통계를 가진 객체용)
+    func는 숫자 하나, 또는 {라벨 값 튜플: 숫자} 딕셔너리를 반환합니다.
+    """
+    kind = "gauge"
+
+    def __init__(self, name, help_text, func, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.func = func
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def render(self):
+        try:
+            values = self.func()
+        except Exception as e:
+            return [f"# {self.name} 수집 실패: {e}"]
+        if not isinstance(values, dict):
+            values = {(): values}
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+REGISTRY = []
+
+def render():
+    """
+    등록된 모든 지표를 Prometheus 텍스트 형식(0.0.4)으로 반환합니다.
+    """
+    lines = []
+    for metric in list(REGISTRY):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- 요청 컨텍스트 ---
+def set_endpoint(endpoint):
+    """
+    현재 요청(스레드 / 코루틴)의 엔드포인트 라벨을 정합니다. 반환된 토큰은 reset_endpoint()에 넘깁니다.
+    """
+    return _current_endpoint.set(endpoint)
+
+def reset_endpoint(token):
+    _current_endpoint.reset(token)
+
+def current_endpoint():
+    return _current_endpoint.get()
+
+def bind(func):
+    """
+    현재 엔드포인트 라벨을 유지한 채 다른 스레드에서 func를 실행하도록 감쌉니다. (ThreadPoolExecutor / run_in_executor용)
+    """
+    ctx = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return ctx.copy().run(func, *args, **kwargs)
+    return wrapper
+
+# --- 지표 정의 ---
+REQUESTS = Counter("connectdog_requests_total", "엔드포인트별 요청 수", ("endpoint", "status"))
+REQUEST_SECONDS = Histogram("connectdog_request_seconds", "엔드포인트별 전체 처리 시간", ("endpoint",))
+STAGE_SECONDS = Histogram("connectdog_stage_seconds", "엔드포인트별 단계(llm / embedding / faiss / rerank / db / preprocess) 처리 시간",
+                          ("endpoint", "stage"))
+
+LLM_CALLS = Counter("connectdog_llm_calls_total", "gpt-4o 호출 수 (kind=image|text, result=ok|error|cache_hit)", ("kind", "result"))
+EMBEDDING_CALLS = Counter("connectdog_embedding_calls_total", "임베딩 API 요청 수 (result=ok|error)", ("result",))
+EMBEDDING_TEXTS = Counter("connectdog_embedding_texts_total", "임베딩 대상 텍스트 수 (source=cache|api)", ("source",))
+QUERY_CACHE = Counter("connectdog_query_cache_total", "쿼리 결과 캐시 조회 (cache, result=hit|miss)", ("cache", "result"))
+
+CANDIDATES = Counter("connectdog_candidates_total", "FAISS 예선 후보 수 (db)", ("db",))
+SPECIES_FILTERED = Counter("connectdog_species_filtered_total", "종이 달라 재정렬 전에 제외된 후보 수 (db)", ("db",))
+
+IMAGE_BYTES = Counter("connectdog_image_bytes_total", "LLM 분석 전 이미지 전처리 바이트 수 (phase=before|after)", ("phase",))
+
+MODEL_LOAD_SECONDS = Histogram("connectdog_model_load_seconds", "스냅샷(인덱스 + DB) 로드 시간 (db, result)", ("db", "result"))
+REFRESH_SECONDS = Histogram("connectdog_refresh_seconds", "백그라운드 새로고침 단계별 시간 (phase)", ("phase",))
+REFRESH_RUNS = Counter("connectdog_refresh_runs_total", "백그라운드 새로고침 작업 수 (result=ok|failed)", ("result",))
+
+@contextmanager
+def stage(name):
+    """
+    with 블록의 소요 시간을 현재 엔드포인트의 stage 히스토그램에 기록합니다.
+    """
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start_time, endpoint=current_endpoint(), stage=name)
@@ -10,6 +10,8 @@ import requests
 import pymysql
 import os
 
+import db_pool
+
 # =========================================================
 # 1. 환경 설정
 # =========================================================
@@ -27,6 +29,9 @@ DB_CONFIG = {
     "cursorclass": pymysql.cursors.DictCursor
 }
 
+# ◀◀ [신규] 5초마다 새로 연결하지 않고 연결 1개를 계속 재사용 (오래 쉬면 ping으로 확인 후 재연결)
+g_db_pool = db_pool.ConnectionPool(DB_CONFIG, max_size=1, name="worker")
+
 def get_kst_now():
     return datetime.datetime.utcnow() + datetime.timedelta(hours=9)
 
@@ -77,71 +82,66 @@ def send_sms_solapi(to_phone, content):
         return False
 
 def job():
-    conn = None
     try:
-        conn = pymysql.connect(**DB_CONFIG)
-        curs = conn.cursor()
-
-        kst_now = get_kst_now()
-        now_hour = kst_now.hour
+        with g_db_pool.connection() as conn, conn.cursor() as curs: # ◀ 풀에서 빌리고, 끝나면 반납
+            kst_now = get_kst_now()
+            now_hour = kst_now.hour
         
-        sql_fetch = """
-            SELECT 
-                N.notification_id, N.user_num, N.message, N.type, U.phone
-            FROM NOTIFICATIONS N
-            JOIN USERS U ON N.user_num = U.USER_NUM
-            WHERE N.status = 'pending'
-            ORDER BY N.created_at ASC
-            LIMIT 10
-        """
-        curs.execute(sql_fetch)
-        rows = curs.fetchall()
-
-        if not rows: return
-
-        print(f"📬 [Worker] 대기 중인 알림 {len(rows)}건 확인.")
-
-        for row in rows:
-            noti_id = row['notification_id']
-            noti_type = row.get('type') or 'IMMEDIATE' 
-            user_phone = row['phone']
-            msg = row['message']
-
-            # 예약 발송 시간 체크
-            if noti_type == 'SCHEDULED':
-                if now_hour >= 22 or now_hour < 8:
-                    print(f"  ⏳ [예약 대기] 야간 보류 (ID: {noti_id})")
-                    continue 
-
-            if not user_phone:
-                print(f"  ⚠️ [Skip] 전화번호 없음 -> 'failed' 처리")
-                curs.execute("UPDATE NOTIFICATIONS SET status='failed' WHERE notification_id=%s", (noti_id,))
-                conn.commit()
-                continue
-
-            # --- [핵심 수정 부분] ---
-            result = send_sms_solapi(user_phone, msg)
-
-            if result == True:
-                # 성공 -> sent
-                curs.execute("UPDATE NOTIFICATIONS SET status='sent', sent_at=NOW() WHERE notification_id=%s", (noti_id,))
-                conn.commit()
-                print(f"  🚀 [DB 업데이트] 알림 #{noti_id} 발송 완료")
+            sql_fetch = """
+                SELECT 
+                    N.notification_id, N.user_num, N.message, N.type, U.phone
+                FROM NOTIFICATIONS N
+                JOIN USERS U ON N.user_num = U.USER_NUM
+                WHERE N.status = 'pending'
+                ORDER BY N.created_at ASC
+                LIMIT 10
+            """
+            curs.execute(sql_fetch)
+            rows = curs.fetchall()
+
+            if not rows: return
+
+            print(f"📬 [Worker] 대기 중인 알림 {len(rows)}건 확인.")
+
+            for row in rows:
+                noti_id = row['notification_id']
+                noti_type = row.get('type') or 'IMMEDIATE' 
+                user_phone = row['phone']
+                msg = row['message']
+
+                # 예약 발송 시간 체크
+                if noti_type == 'SCHEDULED':
+                    if now_hour >= 22 or now_hour < 8:
+                        print(f"  ⏳ [예약 대기] 야간 보류 (ID: {noti_id})")
+                        continue 
+
+                if not user_phone:
+                    print(f"  ⚠️ [Skip] 전화번호 없음 -> 'failed' 처리")
+                    curs.execute("UPDATE NOTIFICATIONS SET status='failed' WHERE notification_id=%s", (noti_id,))
+                    conn.commit()
+                    continue
+
+                # --- [핵심 수정 부분] ---
+                result = send_sms_solapi(user_phone, msg)
+
+                if result == True:
+                    # 성공 -> sent
+                    curs.execute("UPDATE NOTIFICATIONS SET status='sent', sent_at=NOW() WHERE notification_id=%s", (noti_id,))
+                    conn.commit()
+                    print(f"  🚀 [DB 업데이트] 알림 #{noti_id} 발송 완료")
             
-            elif result == "INVALID":
-                # 번호 오류 -> failed (재시도 안 함!)
-                curs.execute("UPDATE NOTIFICATIONS SET status='failed' WHERE notification_id=%s", (noti_id,))
-                conn.commit()
-                print(f"  🗑️ [DB 정리] 알림 #{noti_id} 번호 오류로 폐기 처리")
+                elif result == "INVALID":
+                    # 번호 오류 -> failed (재시도 안 함!)
+                    curs.execute("UPDATE NOTIFICATIONS SET status='failed' WHERE notification_id=%s", (noti_id,))
+                    conn.commit()
+                    print(f"  🗑️ [DB 정리] 알림 #{noti_id} 번호 오류로 폐기 처리")
             
-            else:
-                # API 에러 등 -> pending 유지 (나중에 재시도)
-                print(f"  ⚠️ [재시도 대기] 알림 #{noti_id} 일시적 오류")
+                else:
+                    # API 에러 등 -> pending 유지 (나중에 재시도)
+                    print(f"  ⚠️ [재시도 대기] 알림 #{noti_id} 일시적 오류")
 
     except Exception as e:
         print(f"❌ [Worker 에러] {e}")
-    finally:
-        if conn: conn.close()
 
 if __name__ == "__main__":
     print(f"🚀 알림 발송 워커 시작 (KST 기준: {get_kst_now()})")
@@ -152,5 +152,6 @@ if __name__ == "__main__":
             job()
             time.sleep(5)
     except KeyboardInterrupt:
+        g_db_pool.close_all()
         print("\n👋 워커 종료")
         sys.exit()
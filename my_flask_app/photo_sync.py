@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# 보호소 사진 -> S3 동기화 (사진 목록 파일 + 조건부 GET)
+# - 기존 upload_image_to_s3는 크롤링할 때마다 동물 1마리당 사진 최대 3장을 다시 받아
+#   crawled_data/{board_idx}/image_N 으로 다시 올렸음 (바뀌지 않은 사진도 매번)
+# - 변경: S3 키마다 (원본 URL, ETag / Last-Modified, 내용 해시)를 사진 목록 파일에 기록
+#   1) 같은 URL이면 If-None-Match / If-Modified-Since로 요청 → 304면 다운로드 / 업로드 모두 생략
+#   2) 200이어도 내용 해시가 같으면 S3 PUT 생략
+#   → 평상시 크롤링에서는 이미지 바이트가 거의 오가지 않음
+# - (주의) S3에서 파일을 직접 지운 경우 목록 파일(photo_manifest.json)도 지워야 다시 올라감
+# - PhotoBytesCache: 받은 사진 바이트를 Trigger 1(실종동물 비교)에 그대로 넘겨 S3 재다운로드를 없앰
+#
+# 파일 형식 (JSON)
+#   {"crawled_data/38576/image_1.jpg": {"url": "...", "etag": "...", "last_modified": "...",
+#                                       "sha256": "...", "size": 123456, "updated_at": 1718000000.0}}
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+
+NOT_MODIFIED = "not_modified" # ◀ 304 (다운로드 / 업로드 없음)
+UNCHANGED = "unchanged"       # ◀ 받았지만 내용이 같아 업로드 생략
+UPLOADED = "uploaded"
+
+class PhotoSync:
+    """
+    크롤링 1회(job) 동안 사용하는 사진 동기화. sync()는 크롤링 엔진과 같은 이벤트 루프에서 호출합니다.
+    """
+
+    def __init__(self, manifest_path, s3_client, bucket, extra_args=None):
+        self.manifest_path = manifest_path
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.extra_args = extra_args or {}
+        self.manifest = {}
+        self._lock = threading.Lock()
+        self._stats = {NOT_MODIFIED: 0, UNCHANGED: 0, UPLOADED: 0, "bytes_downloaded": 0, "bytes_uploaded": 0}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+            print(f"  [사진 동기화] 사진 목록 로드: {len(self.manifest)}개")
+        except Exception as e:
+            print(f"⚠️ [사진 동기화] 사진 목록 로드 실패 (모든 사진을 새로 확인): {e}")
+            self.manifest = {}
+
+    def _count(self, status, downloaded=0, uploaded=0):
+        with self._lock:
+            self._stats[status] += 1
+            self._stats["bytes_downloaded"] += downloaded
+            self._stats["bytes_uploaded"] += uploaded
+
+    def _conditional_headers(self, entry, image_url):
+        if not entry or entry.get("url") != image_url:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    async def sync(self, engine, image_url, s3_key):
+        """
+        image_url의 사진을 s3_key로 맞춥니다. 반환값: (NOT_MODIFIED | UNCHANGED | UPLOADED, 받은 바이트 또는 None)
+        다운로드 실패는 crawl_engine.CrawlError, 업로드 실패는 boto3 예외를 그대로 던집니다.
+        """
+        entry = self.manifest.get(s3_key)
+        response = await engine.fetch(image_url, kind="image", headers=self._conditional_headers(entry, image_url))
+        if response.status_code == 304:
+            self._count(NOT_MODIFIED)
+            return NOT_MODIFIED, None
+
+        image_bytes = response.content
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        new_entry = {
+            "url": image_url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "sha256": digest,
+            "size": len(image_bytes),
+            "updated_at": time.time(),
+        }
+        if entry and entry.get("sha256") == digest:
+            self.manifest[s3_key] = new_entry # ◀ 검증자(ETag 등)만 갱신
+            self._count(UNCHANGED, downloaded=len(image_bytes))
+            return UNCHANGED, image_bytes
+
+        await asyncio.to_thread(self.s3_client.upload_fileobj, BytesIO(image_bytes), self.bucket, s3_key,
+                                ExtraArgs=self.extra_args)
+        self.manifest[s3_key] = new_entry
+        self._count(UPLOADED, downloaded=len(image_bytes), uploaded=len(image_bytes))
+        return UPLOADED, image_bytes
+
+    def save(self):
+        """
+        임시 파일에 쓴 뒤 교체합니다. (S3 업로드는 이미 끝났으므로 DB 저장 성공 여부와 관계없이 호출)
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.manifest_path)), exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def print_stats(self):
+        st = self.stats()
+        print(f"📊 [사진 동기화] 변경 없음(304) {st[NOT_MODIFIED]}장, 내용 같음 {st[UNCHANGED]}장, 업로드 {st[UPLOADED]}장 "
+              f"(받음 {st['bytes_downloaded'] / 1048576:.1f}MB, 올림 {st['bytes_uploaded'] / 1048576:.1f}MB)")
+
+class PhotoBytesCache:
+    """
+    방금 받은 사진 바이트를 잠시 보관하는 메모리 캐시 (S3 키 -> 바이트, 전체 max_bytes 이하, 오래된 것부터 제거).
+    크롤링(업로드 단계)이 넣고 Trigger 1(비교 단계)이 꺼내 쓰므로, S3에서 같은 사진을 다시 받지 않아도 됨.
+    (304로 바이트가 없거나 이미 밀려난 사진은 호출한 쪽에서 S3 키 기록의 분석 결과 / S3 다운로드로 대체)
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, dropped = self._entries.popitem(last=False)
+                self._size -= len(dropped)
+                self.evicted += 1
+
+    def pop(self, key):
+        """
+        key의 바이트를 꺼내고 캐시에서 지웁니다. (사진 1장은 한 번만 비교하므로) 없으면 None.
+        """
+        with self._lock:
+            data = self._entries.pop(key, None)
+            if data is None:
+                self.misses += 1
+                return None
+            self._size -= len(data)
+            self.hits += 1
+            return data
+
+    def print_stats(self):
+        print(f"📊 [사진 캐시] Trigger 1 재사용 {self.hits}장, 캐시에 없음 {self.misses}장, 용량 초과로 제거 {self.evicted}장")
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# 자연어 쿼리 결과 캐시 + 동일 요청 합치기(single-flight)
+# - "작은 흰색 강아지", "작은  흰색 강아지 " 처럼 정규화하면 같은 쿼리는 결과를 재사용 (TTL)
+# - 캐시 키에 입양DB 스냅샷 버전을 포함하므로, 인덱스가 새로 공개되면 이전 결과는 자동으로 쓰이지 않음
+# - 같은 쿼리가 동시에 여러 개 들어오면 첫 요청만 LLM / 임베딩 / 검색을 수행하고 나머지는 그 결과를 기다림
+import asyncio
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+DEFAULT_TTL = 600           # ◀ (초) 결과 캐시 유효 시간
+DEFAULT_MAX_ENTRIES = 2000
+
+_SPACES = re.compile(r"\s+")
+_TRAILING_PUNCT = re.compile(r"[\s.,!?~…]+$")
+
+def normalize_query(text):
+    """
+    유니코드 정규화(NFKC), 소문자화, 연속 공백 1칸으로, 끝의 문장부호 제거.
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = _SPACES.sub(" ", text).strip()
+    return _TRAILING_PUNCT.sub("", text)
+
+def make_key(text, version):
+    return (normalize_query(text), version)
+
+class QueryResultCache:
+    """
+    (정규화된 쿼리, 스냅샷 버전) -> 결과. TTL이 지나거나 max_entries를 넘으면 오래된 것부터 제거. (스레드 안전)
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # ◀ key -> (만료 시각, 결과)
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+
+    def _switch_version(self, version):
+        # ◀ 새 스냅샷 버전의 결과가 저장되면 이전 버전의 결과는 모두 버림
+        if version != self._version:
+            self._entries = OrderedDict((k, v) for k, v in self._entries.items() if k[1] == version)
+            self._version = version
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._switch_version(key[1])
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "version": self._version,
+            }
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    같은 key의 작업이 진행 중이면 새로 실행하지 않고 그 결과를 함께 받습니다. (스레드용, Flask)
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0 # ◀ 다른 요청의 결과를 나눠 받은 횟수
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+class AsyncSingleFlight:
+    """
+    SingleFlight의 asyncio 버전 (async_app.py). 같은 key의 코루틴은 하나만 실행됩니다.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self.shared = 0
+
+    async def do(self, key, coro_func):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_func())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _t: self._tasks.pop(key, None))
+        else:
+            self.shared += 1
+        # ◀ 기다리던 요청 하나가 취소되어도 공유 작업은 계속 진행되도록 shield
+        return await asyncio.shield(task)
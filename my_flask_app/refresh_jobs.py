@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# 백그라운드 새로고침 작업 관리자
+# - 기존: /api/refresh_index를 호출할 때마다 데몬 스레드를 새로 띄워, 크롤러 여러 번 / 관리자가 연타하면
+#   S3 전체 스캔 + LLM 분석 + 인덱스 재구축이 겹쳐 실행되며 서로의 파일을 덮어씀
+# - 변경: 실행 중인 작업은 항상 1개, 대기 작업은 최대 1개
+#   (실행 중에 들어온 요청은 대기 작업 하나로 합쳐지고, 대상 DB는 합집합으로 늘어남)
+# - 작업마다 단계(phase)별 진행 상태와 소요 시간을 기록하여 상태 API로 확인
+import fcntl
+import itertools
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+
+import metrics
+
+HISTORY_SIZE = 20 # ◀ 상태 API에 보여줄 최근 완료 작업 수
+REFRESH_LOCK_FILE = "./cache/refresh.lock" # ◀ DB / 인덱스 파일 재구축 잠금 (서버 워커 + 크롤러 프로세스 공용)
+
+_job_ids = itertools.count(1)
+
+def _fmt_time(ts):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)) if ts else None
+
+@contextmanager
+def file_lock(path):
+    """
+    프로세스 간 배타 잠금 (fcntl.flock). 여러 gunicorn 워커가 같은 파일을 동시에 재구축하지 않도록 합니다.
+    (관리자는 프로세스마다 따로 있으므로, 파일을 쓰는 단계는 이 잠금으로 한 번 더 감쌈)
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+class RefreshJob:
+    """
+    새로고침 작업 1개. dbs: 다시 만들 DB 이름 집합 ('missing', 'adopt')
+    """
+
+    def __init__(self, dbs):
+        self.id = next(_job_ids)
+        self.dbs = set(dbs)
+        self.state = "queued" # ◀ queued -> running -> done | failed
+        self.requests = 1     # ◀ 이 작업으로 합쳐진 요청 수
+        self.requested_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.phases = []
+        self.error = None
+
+    @contextmanager
+    def phase(self, name):
+        """
+        with 블록을 단계 하나로 기록합니다. 예외가 나면 그 단계를 failed로 표시하고 다시 던집니다.
+        """
+        entry = {"name": name, "state": "running", "started_at": time.time(), "seconds": None}
+        self.phases.append(entry)
+        print(f"  [새로고침 #{self.id}] 단계 시작: {name}")
+        try:
+            yield entry
+        except BaseException:
+            entry["state"] = "failed"
+            raise
+        else:
+            entry["state"] = "done"
+        finally:
+            entry["seconds"] = round(time.time() - entry["started_at"], 3)
+            metrics.REFRESH_SECONDS.observe(entry["seconds"], phase=name)
+            print(f"  [새로고침 #{self.id}] 단계 {entry['state']}: {name} ({entry['seconds']:.2f}초)")
+
+    def info(self):
+        return {
+            "id": self.id,
+            "dbs": sorted(self.dbs),
+            "state": self.state,
+            "requests": self.requests,
+            "requested_at": _fmt_time(self.requested_at),
+            "started_at": _fmt_time(self.started_at),
+            "finished_at": _fmt_time(self.finished_at),
+            "seconds": round((self.finished_at or time.time()) - self.started_at, 3) if self.started_at else None,
+            "phases": [dict(p, started_at=_fmt_time(p["started_at"])) for p in self.phases],
+            "error": self.error,
+        }
+
+class RefreshManager:
+    """
+    runner(job)을 백그라운드 스레드 1개에서 차례로 실행합니다. (실행 중 1개 + 대기 1개)
+    runner는 job.dbs를 보고 필요한 단계를 job.phase(...)로 감싸 실행하고, 실패하면 예외를 던집니다.
+    """
+
+    def __init__(self, runner, name="refresh"):
+        self.runner = runner
+        self.name = name
+        self._lock = threading.Lock()
+        self._running = None
+        self._queued = None
+        self._history = deque(maxlen=HISTORY_SIZE)
+
+    def submit(self, dbs):
+        """
+        새로고침을 요청합니다. 반환값: (작업, 기존 대기 작업에 합쳐졌는지 여부)
+        - 실행 중인 작업이 없으면 바로 시작
+        - 실행 중이면 대기 작업을 만들거나, 이미 있으면 거기에 합침
+          (실행 중인 작업은 이미 옛 데이터를 읽었을 수 있으므로 합치지 않고 한 번 더 실행)
+        """
+        with self._lock:
+            if self._queued is not None:
+                self._queued.dbs |= set(dbs)
+                self._queued.requests += 1
+                return self._queued, True
+
+            job = RefreshJob(dbs)
+            if self._running is None:
+                self._running = job
+                thread = threading.Thread(target=self._worker, name=f"{self.name}-worker", daemon=True)
+                thread.start()
+            else:
+                self._queued = job
+            return job, False
+
+    def _worker(self):
+        metrics.set_endpoint("refresh") # ◀ 이 스레드의 LLM / 임베딩 / DB 지표는 'refresh'로 기록
+        while True:
+            with self._lock:
+                job = self._running
+            self._run(job)
+            with self._lock:
+                self._history.appendleft(job)
+                self._running, self._queued = self._queued, None
+                if self._running is None:
+                    return
+
+    def _run(self, job):
+        job.state = "running"
+        job.started_at = time.time()
+        print(f"⏳ [새로고침 #{job.id}] 시작 (대상: {', '.join(sorted(job.dbs))}, 합쳐진 요청 {job.requests}개)")
+        try:
+            self.runner(job)
+            job.state = "done"
+            metrics.REFRESH_RUNS.inc(result="ok")
+            print(f"✅ [새로고침 #{job.id}] 완료 ({time.time() - job.started_at:.2f}초)")
+        except Exception as e:
+            job.state = "failed"
+            job.error = str(e)
+            metrics.REFRESH_RUNS.inc(result="failed")
+            print(f"❌ [새로고침 #{job.id}] 실패: {e}")
+            traceback.print_exc()
+        finally:
+            job.finished_at = time.time()
+
+    def status(self):
+        with self._lock:
+            running, queued, history = self._running, self._queued, list(self._history)
+        return {
+            "running": running.info() if running else None,
+            "queued": queued.info() if queued else None,
+            "history": [job.info() for job in history],
+        }
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# 검색 본선(FAISS 예선 + 하이브리드 재정렬) 공통 로직
+# - Flask 서버(app.py)와 비동기 서버(async_app.py)가 같은 함수를 사용
+# - LLM / 임베딩 호출은 포함하지 않음 (CPU 작업만 있으므로 비동기 서버에서는 별도 스레드에서 실행)
+import faiss
+import numpy as np
+
+import llm_animal
+import metrics
+
+MATCH_ALERT_SCORE = 0.80 # ◀ 실종동물 제보 시 주인에게 알림을 보내는 최소 유사도
+
+def query_vector(query_attr_emb):
+    """
+    쿼리의 '__merged__' 벡터를 FAISS 검색용 (1, D) 정규화 float32 배열로 변환합니다.
+    """
+    query_vector_np = np.array([query_attr_emb["__merged__"]]).astype('float32')
+    faiss.normalize_L2(query_vector_np)
+    return query_vector_np
+
+def rank_candidates(snap, query_obj, query_attr_emb):
+    """
+    스냅샷에서 쿼리와 같은 종의 후보를 검색하고 재정렬하여 (행 번호, 점수) 리스트를 점수 순으로 반환합니다.
+    """
+    query_species = query_obj.get("dog_or_cat_or_other")
+
+    # ◀ 쿼리와 같은 종의 파티션 안에서만 후보 K_CANDIDATES개를 검색
+    with metrics.stage("faiss"):
+        candidate_indices = snap.search(query_vector(query_attr_emb), query_species)
+
+    with metrics.stage("rerank"):
+        # (중요) LLM이 '개'라고 번역했으면, 고양이는 여기서 자동 필터링됨
+        rows = llm_animal.filter_species_rows(candidate_indices, snap.store, query_species)
+
+        # (중요) `weights`가 여기서 100% 동일하게 적용됨 (후보 전체를 한 번에 계산)
+        scores = llm_animal.rerank_candidates(query_attr_emb, snap.store, rows)
+    record_candidates(snap, [candidate_indices], [rows])
+    ranked = [(idx, float(score)) for idx, score in zip(rows, scores)]
+    ranked.sort(key=lambda x: x[1], reverse=True)
+    return ranked
+
+def record_candidates(snap, candidates_list, rows_list):
+    """
+    FAISS 후보 수와, 그중 종이 달라 재정렬 전에 제외된 수를 지표에 기록합니다.
+    """
+    n_candidates = sum(sum(1 for idx in c if idx >= 0) for c in candidates_list)
+    n_rows = sum(len(rows) for rows in rows_list)
+    metrics.CANDIDATES.inc(n_candidates, db=snap.name)
+    metrics.SPECIES_FILTERED.inc(n_candidates - n_rows, db=snap.name)
+
+def rank_adopt(snap, query_obj, query_attr_emb):
+    """
+    입양DB 검색 (/api/search, /api/adapt): 상위 K_FINAL개의 {"filename", "score"} 리스트를 반환합니다.
+    """
+    ranked = rank_candidates(snap, query_obj, query_attr_emb)
+    return [{"filename": snap.store.filenames[idx], "score": score} for idx, score in ranked[:llm_animal.K_FINAL]]
+
+def query_vectors(query_attr_embs):
+    """
+    쿼리 여러 개의 '__merged__' 벡터를 (쿼리 수, D) 정규화 float32 행렬로 변환합니다.
+    """
+    query_vectors_np = np.array([q["__merged__"] for q in query_attr_embs]).astype('float32')
+    faiss.normalize_L2(query_vectors_np)
+    return query_vectors_np
+
+def rank_candidates_batch(snap, query_objs, query_attr_embs):
+    """
+    rank_candidates의 배치 버전: 종별 행렬 FAISS 검색 1번씩 + 모든 쿼리의 후보를 한 번에 재정렬.
+    반환값: 쿼리 순서대로 (행 번호, 점수) 리스트
+    """
+    query_species_list = [q.get("dog_or_cat_or_other") for q in query_objs]
+    with metrics.stage("faiss"):
+        candidates = snap.search_batch(query_vectors(query_attr_embs), query_species_list)
+    with metrics.stage("rerank"):
+        rows_list = [llm_animal.filter_species_rows(c, snap.store, species)
+                     for c, species in zip(candidates, query_species_list)]
+        scores_list = llm_animal.rerank_candidates_batch(query_attr_embs, snap.store, rows_list)
+    record_candidates(snap, candidates, rows_list)
+
+    ranked_list = []
+    for rows, scores in zip(rows_list, scores_list):
+        ranked = [(idx, float(score)) for idx, score in zip(rows, scores)]
+        ranked.sort(key=lambda x: x[1], reverse=True)
+        ranked_list.append(ranked)
+    return ranked_list
+
+def rank_adopt_batch(snap, query_objs, query_attr_embs):
+    """
+    rank_adopt의 배치 버전 (/api/search/batch): 쿼리별 상위 K_FINAL개 결과 리스트를 반환합니다.
+    """
+    return [[{"filename": snap.store.filenames[idx], "score": score} for idx, score in ranked[:llm_animal.K_FINAL]]
+            for ranked in rank_candidates_batch(snap, query_objs, query_attr_embs)]
+
+def adopt_batch_entries(snap, query_objs, query_attr_embs):
+    """
+    /api/search/batch 응답용: 분석 / 임베딩에 성공한 쿼리만 한 번에 검색하고,
+    쿼리 순서대로 {"results": [...]} 또는 {"error": "..."}를 반환합니다.
+    """
+    entries = []
+    ok_ids = []
+    for i, (query_obj, query_attr_emb) in enumerate(zip(query_objs, query_attr_embs)):
+        if not query_obj:
+            entries.append({"error": "LLM 분석 실패"})
+        elif not (query_attr_emb and query_attr_emb.get("__merged__") is not None):
+            entries.append({"error": "임베딩 생성 실패"})
+        else:
+            entries.append(None)
+            ok_ids.append(i)
+
+    if ok_ids:
+        ranked_list = rank_adopt_batch(snap, [query_objs[i] for i in ok_ids], [query_attr_embs[i] for i in ok_ids])
+        for i, results in zip(ok_ids, ranked_list):
+            entries[i] = {"results": results}
+    return entries
+
+def pet_name_from_filename(full_path):
+    """
+    'abandon/missing/5_뽀삐_1234.jpg' -> '뽀삐' (파싱 실패 시 '반려동물')
+    """
+    try:
+        # 1. 경로 떼고 파일명만 (5_뽀삐_1234.jpg)
+        file_only = full_path.split('/')[-1]
+        # 2. 언더바(_)로 쪼개서 두 번째 덩어리(이름) 가져오기
+        return file_only.split('_')[1]
+    except:
+        return "반려동물" # 이름 파싱 실패 시 기본값 사용
+
+def rank_sighting(snap, query_obj, query_attr_emb, notify):
+    """
+    실종DB 검색 (/api/report_sighting).
+    - MATCH_ALERT_SCORE 이상인 후보의 주인에게 notify(user_num, message)로 알림 (주인당 1회)
+    - 상위 K_FINAL개만 스냅샷의 메타데이터 맵으로 '이름'과 '장소'를 채워 반환
+    """
+    ranked = rank_candidates(snap, query_obj, query_attr_emb)
+    alerted_user_ids = set() # ◀ 중복 알림 방지용 Set
+
+    for idx, score in ranked:
+        if score < MATCH_ALERT_SCORE:
+            break # ◀ 점수 순으로 정렬되어 있으므로 이후 후보는 모두 기준 미만
+
+        # (가정) ◀ 실종동물 DB의 attributes에 user_num (PK)이 저장되어 있어야 함
+        item = snap.store.item(idx)
+        owner_user_num = item.get("attributes", {}).get("user_num")
+
+        if owner_user_num and owner_user_num not in alerted_user_ids:
+            print(f"  [🔔 80% 매칭 발견!] 실종동물: {item.get('filename')}, 주인 ID: {owner_user_num}")
+            pet_name = pet_name_from_filename(item.get('filename', ''))
+
+            # 1. 알림 메시지 생성
+            message = f"[이어주개] 회원님의 실종동물 '{pet_name}'과(와) {score*100:.0f}% 유사한 동물이 제보되었습니다! \n\n▶홈페이지 확인하기\nhttp://connectdog.kro.kr/"
+
+            # 2. ◀ 초간단 "신호" INSERT (연락처 조회 안 함)
+            notify(owner_user_num, message)
+            alerted_user_ids.add(owner_user_num)
+
+    # ◀ 최종 K_FINAL개만 '이름'과 '장소'를 채움 (DB 조회 없이 스냅샷의 메타데이터 맵 사용)
+    results = []
+    for idx, score in ranked[:llm_animal.K_FINAL]:
+        filename = snap.store.filenames[idx]
+        meta = snap.metadata.get(filename, {})
+        results.append({
+            "filename": filename,
+            "score": score,
+            "petName": meta.get("petName", "이름 미상"),        # ◀ DB에서 가져온 이름
+            "location": meta.get("location", "위치 정보 없음"), # ◀ DB에서 가져온 위치
+        })
+    return results
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+# 검색 스냅샷 (인덱스 + 저장소 + 버전) 원자적 교체
+# - 새 스냅샷은 옆에서 완전히 만든 뒤, 참조 1개를 바꾸는 것으로 한 번에 공개(publish)
+# - 요청은 시작할 때 스냅샷 하나를 잡고(pin) 끝날 때까지 그것만 사용
+#   → 인덱스는 새 것, DB는 옛 것인 상태(인덱스 범위 초과)가 생기지 않음
+# - 옛 스냅샷은 잡고 있는 요청이 모두 끝나면 참조 카운트로 자동 해제
+import itertools
+import os
+import threading
+import time
+import weakref
+
+import numpy as np
+
+import index_manager
+import llm_animal
+import vector_store
+
+_serial_counter = itertools.count(1)
+
+class SearchSnapshot:
+    """
+    한 DB의 검색에 필요한 모든 것을 묶은 불변(immutable) 객체.
+    """
+    __slots__ = ("name", "index", "store", "partitions", "metadata", "serial", "version", "loaded_at", "load_seconds",
+                 "index_mmap", "source_signature", "__weakref__")
+
+    def __init__(self, name, index, store, partitions, load_seconds, metadata=None, index_mmap=False, source_signature=None):
+        self.name = name
+        self.index = index
+        self.store = store
+        self.partitions = partitions # ◀ 종 -> SpeciesPartition (같은 종 안에서만 검색)
+        self.metadata = metadata or {} # ◀ S3 키(filename) -> DB 메타데이터 (인덱스와 함께 갱신)
+        self.serial = next(_serial_counter)
+        self.version = f"{store.version or 'json'}#{self.serial}" # ◀ 저장소 버전 + 로드 순번
+        self.loaded_at = time.time()
+        self.load_seconds = load_seconds
+        self.index_mmap = index_mmap # ◀ 인덱스를 읽기 전용 메모리 맵으로 열었는지 (워커 간 페이지 공유)
+        self.source_signature = source_signature # ◀ 로드한 파일들의 서명 (다른 프로세스의 갱신 감지용)
+
+    def info(self):
+        return {
+            "version": self.version,
+            "store_version": self.store.version,
+            "items": len(self.store),
+            "index_total": int(self.index.ntotal),
+            "index_type": index_manager.index_kind(self.index),
+            "index_mmap": self.index_mmap,
+            "store_mmap": isinstance(next(iter(self.store.packed.vectors.values()), None), np.memmap),
+            "metadata": len(self.metadata),
+            "species": {key or "(미상)": len(part) for key, part in self.partitions.items()},
+            "loaded_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.loaded_at)),
+            "load_seconds": round(self.load_seconds, 3),
+        }
+
+    def search(self, query_vector_np, query_species, k=None):
+        """
+        쿼리와 같은 종의 파티션에서 FAISS 후보 행 번호를 반환합니다.
+        """
+        return llm_animal.search_species_candidates(self.index, self.store, self.partitions, query_vector_np,
+                                                    query_species, k or llm_animal.K_CANDIDATES)
+
+    def search_batch(self, query_vectors_np, query_species_list, k=None):
+        """
+        search의 배치 버전. (쿼리 수, D) 행렬을 종별로 묶어 검색하고 쿼리별 후보 행 번호 리스트를 반환합니다.
+        """
+        return llm_animal.search_species_candidates_batch(self.index, self.store, self.partitions, query_vectors_np,
+                                                          query_species_list, k or llm_animal.K_CANDIDATES)
+
+def load_snapshot(name, index_file, db_file, metadata_loader=None):
+    """
+    인덱스와 저장소를 읽어 새 스냅샷을 만듭니다. (공개는 하지 않음)
+    인덱스와 DB가 서로 맞지 않으면 예외를 던져, 기존 스냅샷이 계속 쓰이도록 합니다.
+    metadata_loader(store)가 주어지면 그 결과(filename -> 메타데이터)를 스냅샷에 함께 담습니다.
+    """
+    start_time = time.time()
+    signature = source_signature(index_file, db_file) # ◀ 읽기 전에 서명을 잡아야, 읽는 도중 갱신돼도 다음 확인 때 다시 로드됨
+    index, index_mmap = index_manager.load_index_readonly(index_file) # ◀ 검색 전용이므로 읽기 전용 메모리 맵
+    store = llm_animal.load_db(db_file, mmap=True)
+
+    if not index_manager.check_index_consistency(index, store, index_file):
+        raise ValueError(f"'{index_file}'({index.ntotal}개)와 '{db_file}'({len(store)}개)의 항목이 일치하지 않습니다.")
+
+    partitions = index_manager.load_species_partitions(index_file, index, store)
+    metadata = metadata_loader(store) if metadata_loader else None
+    return SearchSnapshot(name, index, store, partitions, time.time() - start_time, metadata, index_mmap, signature)
+
+def source_signature(index_file, db_file):
+    """
+    스냅샷을 이루는 파일들(저장소 CURRENT 버전 + 인덱스 / 변경분 파일)의 서명.
+    다른 워커 / 프로세스가 파일을 갱신하면 값이 달라집니다.
+    """
+    store_version = vector_store.read_current_version(vector_store.store_path_for(db_file))
+    if store_version is None:
+        try:
+            store_version = ("json", os.stat(db_file).st_mtime_ns)
+        except FileNotFoundError:
+            store_version = None
+    return (store_version, index_manager.source_signature(index_file))
+
+class SnapshotRegistry:
+    """
+    DB 이름('adopt', 'missing') -> 현재 스냅샷.
+    내부 딕셔너리 자체를 새로 만들어 바꿔 끼우므로, 읽는 쪽은 잠금 없이 항상 완전한 상태를 봅니다.
+    """
+
+    def __init__(self):
+        self._snapshots = {}
+        self._publish_lock = threading.Lock()
+        self._retired = weakref.WeakSet() # ◀ 교체되었지만 아직 요청이 잡고 있는 스냅샷
+
+    def get(self, name):
+        return self._snapshots.get(name)
+
+    def publish(self, snapshot):
+        with self._publish_lock:
+            old = self._snapshots.get(snapshot.name)
+            new_map = dict(self._snapshots)
+            new_map[snapshot.name] = snapshot
+            self._snapshots = new_map # ◀ (핵심) 참조 1개 교체 = 원자적 공개
+            if old is not None:
+                self._retired.add(old)
+        return old
+
+    def status(self):
+        snapshots = self._snapshots
+        retired = list(self._retired)
+        return {
+            "snapshots": {name: snap.info() for name, snap in snapshots.items()},
+            "retired_in_use": [snap.version for snap in retired],
+        }
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# my_flask_app의 모듈(import llm_animal 등)은 평면 구조이므로 상위 폴더를 import 경로에 추가
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def llm_animal(tmp_path, monkeypatch):
+    """
+    llm_animal 모듈 (openai / boto3 / faiss / numpy 필요). 모듈 로드 시 읽는 키 파일은 임시 폴더의 더미 파일 사용.
+    """
+    for name in ("openai", "boto3", "faiss", "numpy"):
+        pytest.importorskip(name)
+    monkeypatch.chdir(tmp_path)
+    for name in ("API-Key.txt", "ACCESS_KEY.txt", "SECRET_KEY.txt"):
+        (tmp_path / name).write_text("test")
+    sys.modules.pop("llm_animal", None)
+    yield importlib.import_module("llm_animal")
+    sys.modules.pop("llm_animal", None)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# 증분 크롤링 테스트 (상태 파일 / 목록 순회 중단 조건 / 사진 실패 시 재시도)
+import asyncio
+import importlib
+import sys
+from datetime import date
+
+import pytest
+
+import crawl_state
+
+# --- 상태 파일 ---
+def test_state_round_trip_and_unchanged(tmp_path):
+    path = str(tmp_path / "crawl_state.json")
+    state = crawl_state.CrawlState(path, date_columns=(9,))
+    fp = crawl_state.fingerprint("/detail?board_idx=1", "초코 (25-1) 보호중", "대구 | 2025-01-01")
+    row = (1, "초코", "개", "푸들", "수컷", "상태:보호중", "k1", None, None, date(2025, 1, 1), "대구", "2살", "url")
+    assert not state.is_unchanged(1, fp)
+    state.record(1, fp, row)
+    state.save(full_sweep=True)
+
+    loaded = crawl_state.CrawlState(path, date_columns=(9,))
+    assert loaded.is_unchanged(1, fp)
+    assert loaded.known_row(1) == row # ◀ date 열 복원
+    assert not loaded.is_unchanged(1, crawl_state.fingerprint("/detail?board_idx=1", "초코 (25-1) 입양완료", "대구"))
+    assert not loaded.needs_full_sweep(3600)
+
+def test_fingerprint_ignores_whitespace():
+    assert crawl_state.fingerprint("a  b", " c") == crawl_state.fingerprint("a b", "c")
+
+def test_prune_unseen_after_full_sweep(tmp_path):
+    state = crawl_state.CrawlState(str(tmp_path / "crawl_state.json"))
+    state.record(1, "fp1", None)
+    state.record(2, "fp2", None)
+    state.seen.clear() # ◀ 다음 실행
+    state.is_unchanged(1, "fp1")
+    assert state.prune_unseen() == 1
+    assert list(state.postings) == ["1"]
+
+# --- animal_crawler (bs4 / requests / pandas 필요) ---
+@pytest.fixture
+def animal_crawler(llm_animal, monkeypatch):
+    for name in ("bs4", "requests", "pandas"):
+        pytest.importorskip(name)
+    sys.modules.pop("animal_crawler", None)
+    module = importlib.import_module("animal_crawler")
+    yield module
+    sys.modules.pop("animal_crawler", None)
+
+class FakeEngine:
+    def __init__(self, **kwargs):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def print_stats(self):
+        pass
+
+def run_crawl(animal_crawler, monkeypatch, changed_per_page, full_sweep):
+    fetched = []
+
+    async def fake_total_pages(engine, url):
+        return len(changed_per_page)
+
+    async def fake_fetch_data(engine, url, state=None):
+        page = 1 if url == animal_crawler.CRAWL_URL else int(url.split("page=")[1])
+        fetched.append(page)
+        changed = changed_per_page[page - 1]
+        rows = [(f"{page}-{i}",) for i in range(3)]
+        return {"rows": rows, "fresh": rows[:changed], "items": len(rows), "changed": changed}
+
+    monkeypatch.setattr(animal_crawler.crawl_engine, "CrawlEngine", FakeEngine)
+    monkeypatch.setattr(animal_crawler, "get_total_pages", fake_total_pages)
+    monkeypatch.setattr(animal_crawler, "fetch_data", fake_fetch_data)
+    all_rows, fresh_rows = asyncio.run(animal_crawler.crawl_pages(False, state=None, full_sweep=full_sweep))
+    return sorted(fetched), all_rows, fresh_rows
+
+def test_incremental_stops_at_first_unchanged_page(animal_crawler, monkeypatch):
+    fetched, all_rows, fresh_rows = run_crawl(animal_crawler, monkeypatch, [2, 1, 0, 3, 3], full_sweep=False)
+    assert fetched == [1, 2, 3] # ◀ 3페이지에 바뀐 공고가 없으므로 4, 5페이지는 요청하지 않음
+    assert len(all_rows) == 9 and len(fresh_rows) == 3
+
+def test_full_sweep_visits_every_page(animal_crawler, monkeypatch):
+    fetched, _, _ = run_crawl(animal_crawler, monkeypatch, [2, 1, 0, 3, 3], full_sweep=True)
+    assert fetched == [1, 2, 3, 4, 5]
+
+ITEM_HTML = """<li><a href="/board_gallery01/board_content.asp?board_idx=38576">
+<div><p>초코 (25-1) 보호중</p><span>대구 | 2025-01-01 | 2살 | 수컷 | 3kg</span></div></a></li>"""
+
+def test_posting_with_failed_photo_is_fetched_again(animal_crawler, monkeypatch, tmp_path):
+    from bs4 import BeautifulSoup
+    item = BeautifulSoup(ITEM_HTML, "html.parser").select_one("li")
+    state = crawl_state.CrawlState(str(tmp_path / "crawl_state.json"))
+    detail_calls = []
+
+    async def fake_detail(engine, board_idx, photos_failed):
+        detail_calls.append(board_idx)
+        return "개", "푸들", "특징:온순", "k1", None, None, photos_failed
+
+    monkeypatch.setattr(animal_crawler, "fetch_detail_info", lambda e, b: fake_detail(e, b, True))
+    row, fresh = asyncio.run(animal_crawler.process_item(None, item, state))
+    assert row is not None and fresh
+    assert "38576" not in state.postings # ◀ 사진 실패 → 상태에 기록하지 않음
+
+    monkeypatch.setattr(animal_crawler, "fetch_detail_info", lambda e, b: fake_detail(e, b, False))
+    asyncio.run(animal_crawler.process_item(None, item, state)) # ◀ 다음 실행: 다시 상세 요청
+    assert "38576" in state.postings
+
+    row, fresh = asyncio.run(animal_crawler.process_item(None, item, state)) # ◀ 이후에는 요청 생략
+    assert row is not None and not fresh
+    assert detail_calls == ["38576", "38576"]
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# 커넥션 풀 테스트 (pymysql.connect 대신 가짜 연결 사용)
+
+import pytest
+
+pytest.importorskip("pymysql")
+
+import db_pool
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+    def ping(self, reconnect=True):
+        pass
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(db_pool.pymysql, "connect", lambda **kwargs: FakeConnection())
+    return db_pool.ConnectionPool({}, max_size=2, acquire_timeout=0.1)
+
+def fork(monkeypatch, pool):
+    # ◀ 자식 프로세스가 된 것처럼 pid만 바꿈
+    child_pid = pool._pid + 1
+    monkeypatch.setattr(db_pool.os, "getpid", lambda: child_pid)
+
+def test_reuses_released_connection(pool):
+    with pool.connection() as conn:
+        pass
+    with pool.connection() as again:
+        assert again is conn
+    assert conn.rollbacks == 2
+    assert pool.stats()["created"] == 1 and pool.stats()["reused"] == 1
+
+def test_connection_error_discards(pool):
+    with pytest.raises(db_pool.pymysql.err.OperationalError):
+        with pool.connection() as conn:
+            raise db_pool.pymysql.err.OperationalError(2013, "Lost connection")
+    assert conn.closed
+    assert pool.stats()["idle"] == 0 and pool.stats()["in_use"] == 0
+
+def test_timeout_when_full(pool):
+    pool.acquire()
+    pool.acquire()
+    with pytest.raises(db_pool.PoolTimeoutError):
+        pool.acquire()
+
+def test_connection_borrowed_before_fork_is_dropped_in_child(pool, monkeypatch):
+    parent_conn = pool.acquire()
+    idle_conn = pool.acquire()
+    pool.release(idle_conn)
+    fork(monkeypatch, pool)
+
+    pool.release(parent_conn) # ◀ 새 세마포어를 건드리지 않음 (ValueError 없음)
+    assert not parent_conn.closed # ◀ 부모 소켓에 QUIT을 보내지 않음
+    assert pool.stats()["idle"] == 0
+
+    # ◀ 자식 프로세스는 부모 연결을 재사용하지 않고, 자리 max_size개를 모두 쓸 수 있음
+    first, second = pool.acquire(), pool.acquire()
+    assert first not in (parent_conn, idle_conn) and second not in (parent_conn, idle_conn)
+    with pytest.raises(db_pool.PoolTimeoutError):
+        pool.acquire()
+    pool.release(first)
+    pool.release(second)
+    assert pool.stats()["in_use"] == 0 and pool.stats()["idle"] == 2
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# 벡터화 재정렬(hybrid_rerank)이 기존 항목별 루프 점수(llm_animal.compare_query_to_item)와 같은지 확인
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import hybrid_rerank
+
+DIM = 16
+
+def random_embeddings(rng, keys, missing_rate):
+    # ◀ 속성 일부는 None(임베딩 실패), 일부는 키 자체가 없음
+    emb = {}
+    for key in keys:
+        r = rng.random()
+        if r < missing_rate / 2:
+            continue
+        emb[key] = None if r < missing_rate else rng.normal(size=DIM).tolist()
+    return emb
+
+@pytest.fixture
+def case(llm_animal):
+    rng = np.random.default_rng(42)
+    keys = llm_animal.RERANK_KEYS
+    items = [{"filename": f"item_{i}", "attr_embeddings": random_embeddings(rng, keys, 0.3)} for i in range(60)]
+    items.append({"filename": "empty", "attr_embeddings": {}}) # ◀ 비교할 속성이 하나도 없는 행 (점수 0)
+    queries = [random_embeddings(rng, keys, 0.2) for _ in range(4)] + [{}]
+    return llm_animal, items, queries
+
+@pytest.mark.parametrize("dtype", ["float32", "float64"])
+def test_score_candidates_matches_loop(case, dtype):
+    llm_animal, items, queries = case
+    packed = hybrid_rerank.pack_items(items, llm_animal.RERANK_KEYS, DIM, dtype=np.dtype(dtype))
+    rows = list(range(len(items)))
+    for query in queries:
+        expected = [llm_animal.compare_query_to_item(query, item) for item in items]
+        actual = hybrid_rerank.score_candidates(packed, query, rows, llm_animal.weights)
+        np.testing.assert_allclose(actual, expected, rtol=1e-6, atol=1e-7)
+
+def test_score_candidates_batch_matches_loop(case):
+    llm_animal, items, queries = case
+    packed = hybrid_rerank.pack_items(items, llm_animal.RERANK_KEYS, DIM)
+    rng = np.random.default_rng(7)
+    rows_list = [rng.choice(len(items), size=size, replace=False).tolist() for size in (10, 0, 25, 61, 5)]
+    results = hybrid_rerank.score_candidates_batch(packed, queries, rows_list, llm_animal.weights)
+    assert len(results) == len(queries)
+    for query, rows, actual in zip(queries, rows_list, results):
+        expected = [llm_animal.compare_query_to_item(query, items[r]) for r in rows]
+        np.testing.assert_allclose(actual, expected, rtol=1e-6, atol=1e-7)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# 인덱스 증분 동기화 (변경분 기록 / compact_index / 고정 ID -> 파일명 확인) 테스트
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+
+import index_manager
+from hybrid_rerank import PackedEmbeddings
+from vector_store import VectorStore
+
+DIM = 8
+
+def make_store(filenames, ids, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(len(filenames), DIM)).astype(np.float32)
+    packed = PackedEmbeddings(["__merged__"], {"__merged__": vectors}, np.ones((len(filenames), 1), dtype=bool))
+    return VectorStore(filenames, [{} for _ in filenames], packed, ids=ids)
+
+def vector_of(store, filename):
+    vec = store.merged_vectors()[0][store.filenames.index(filename)].copy()
+    return vec / np.linalg.norm(vec)
+
+def search_top1(index, vec):
+    _, ids = index.search(vec[None, :].astype(np.float32), 1)
+    return int(ids[0, 0])
+
+@pytest.fixture
+def index_file(tmp_path):
+    return str(tmp_path / "animal_vectors.index")
+
+def test_delta_round_trip_through_compact(index_file):
+    store = make_store(["a", "b", "c"], [0, 1, 2])
+    _, added, removed, was_full = index_manager.sync_index(index_file, store, DIM)
+    assert (added, removed, was_full) == (3, 0, True)
+
+    # ◀ b 삭제, d 추가 → 변경분 1개만 기록
+    updated = VectorStore.concat([store.take([0, 2]), make_store(["d"], [3], seed=1)])
+    _, added, removed, was_full = index_manager.sync_index(index_file, updated, DIM)
+    assert (added, removed, was_full) == (1, 1, False)
+    assert len(index_manager.list_delta_files(index_file)) == 1
+
+    assert index_manager.compact_index(index_file) == 1
+    assert index_manager.list_delta_files(index_file) == []
+    index = index_manager.load_index(index_file)
+    assert sorted(int(i) for i in index_manager.index_ids(index)) == [0, 2, 3]
+    assert index_manager.check_index_consistency(index, updated, index_file)
+    for filename in ("a", "c", "d"):
+        assert search_top1(index, vector_of(updated, filename)) == int(updated.ids[updated.filenames.index(filename)])
+
+def test_reset_store_with_reused_ids_rebuilds(index_file):
+    index_manager.sync_index(index_file, make_store(["a", "b"], [0, 1]), DIM)
+
+    # ◀ 저장소를 새로 만들어 같은 ID 0, 1이 다른 파일을 가리킴 (ID 집합만 보면 변경 없음)
+    reset = make_store(["x", "y"], [0, 1], seed=2)
+    index = index_manager.load_index(index_file)
+    assert not index_manager.check_index_consistency(index, reset, index_file)
+
+    index, added, removed, was_full = index_manager.sync_index(index_file, reset, DIM)
+    assert was_full
+    assert index_manager.check_index_consistency(index, reset, index_file)
+    assert search_top1(index, vector_of(reset, "y")) == 1
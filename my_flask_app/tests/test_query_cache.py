@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# 동일 요청 합치기(SingleFlight / AsyncSingleFlight) 테스트
+import asyncio
+import threading
+import time
+
+import pytest
+
+from query_cache import AsyncSingleFlight, SingleFlight
+
+N_CALLERS = 8
+
+def wait_until(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            raise AssertionError("시간 초과")
+        time.sleep(0.005)
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return {"results": [1, 2, 3]}
+
+    results = [None] * N_CALLERS
+    def caller(i):
+        results[i] = flight.do(("작은 흰색 강아지", 1), work)
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(N_CALLERS)]
+    for t in threads:
+        t.start()
+    wait_until(lambda: flight.shared == N_CALLERS - 1) # ◀ 첫 요청이 끝나기 전에 나머지가 모두 합류
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    # ◀ 끝난 작업은 지워지므로 다음 호출은 다시 실행
+    flight.do(("작은 흰색 강아지", 1), lambda: calls.append(1))
+    assert len(calls) == 2
+
+def test_single_flight_shares_errors():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def work():
+        release.wait(5)
+        raise RuntimeError("LLM 오류")
+
+    errors = []
+    def caller():
+        try:
+            flight.do("q", work)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=caller) for _ in range(3)]
+    for t in threads:
+        t.start()
+    wait_until(lambda: flight.shared == 2)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert len(errors) == 3 and all(e is errors[0] for e in errors)
+
+def test_single_flight_runs_different_keys_separately():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight.shared == 0
+
+def test_async_single_flight_coalesces_and_survives_cancel():
+    async def main():
+        flight = AsyncSingleFlight()
+        release = asyncio.Event()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await release.wait()
+            return "result"
+
+        tasks = [asyncio.ensure_future(flight.do("q", work)) for _ in range(N_CALLERS)]
+        await asyncio.sleep(0)
+        tasks[0].cancel() # ◀ 기다리던 요청 하나가 취소돼도 공유 작업은 계속
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks[1:])
+
+        assert len(calls) == 1
+        assert results == ["result"] * (N_CALLERS - 1)
+        assert flight.shared == N_CALLERS - 1
+        with pytest.raises(asyncio.CancelledError):
+            await tasks[0]
+        assert await flight.do("q", work) == "result" and len(calls) == 2
+
+    asyncio.run(main())
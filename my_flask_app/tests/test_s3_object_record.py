@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# S3 키 기록(analysis_cache.s3_objects)과 update_db_from_s3의 재사용 판단 테스트
+import pytest
+
+import photo_sync
+from analysis_cache import AnalysisCache
+
+KEY = "crawled_data/38576/image_1.jpg"
+
+@pytest.fixture
+def cache(tmp_path):
+    return AnalysisCache(str(tmp_path / "analysis_cache.sqlite3"))
+
+def crawl(cache, status, image_hash="h1"):
+    # animal_crawler.upload_image_to_s3와 같은 방식으로 기록
+    cache.record_object(KEY, image_hash, changed=status == photo_sync.UPLOADED)
+
+def test_legacy_key_crawled_before_first_refresh_is_not_changed(cache):
+    crawl(cache, photo_sync.NOT_MODIFIED)
+    assert cache.object_changed(KEY, '"e1"') is False
+    assert cache.get_object(KEY) == {"image_hash": "h1", "etag": '"e1"', "changed": False}
+    assert cache.object_changed(KEY, '"e1"') is False
+
+def test_legacy_key_crawled_after_refresh_keeps_etag(cache):
+    assert cache.object_changed(KEY, '"e1"') is False # ◀ 첫 갱신: 기록 없음 → ETag만 기록 (해시 없음)
+    crawl(cache, photo_sync.UNCHANGED)
+    assert cache.get_object(KEY) == {"image_hash": "h1", "etag": '"e1"', "changed": False}
+    assert cache.object_changed(KEY, '"e1"') is False
+
+def test_uploaded_photo_is_changed_until_synced(cache):
+    assert cache.object_changed(KEY, '"e1"') is False
+    crawl(cache, photo_sync.UPLOADED, image_hash="h2")
+    assert cache.object_changed(KEY, '"e2"') is True
+    crawl(cache, photo_sync.UNCHANGED, image_hash="h2") # ◀ 갱신 전에 다시 크롤링해도 변경 표시 유지
+    assert cache.object_changed(KEY, '"e2"') is True
+    cache.mark_object_synced(KEY, '"e2"')
+    assert cache.object_changed(KEY, '"e2"') is False
+
+def test_replaced_directly_in_s3_is_changed(cache):
+    crawl(cache, photo_sync.UNCHANGED)
+    assert cache.object_changed(KEY, '"e1"') is False
+    assert cache.object_changed(KEY, '"e9"') is True
+
+def test_unknown_change_compares_hash(cache):
+    cache.record_object(KEY, "h1")
+    cache.mark_object_synced(KEY, '"e1"')
+    cache.record_object(KEY, "h1")
+    assert cache.object_changed(KEY, '"e1"') is False
+    cache.record_object(KEY, "h2")
+    assert cache.object_changed(KEY, '"e1"') is True
+
+# --- update_db_from_s3 (llm_animal 필요) ---
+class FakeS3:
+    def __init__(self, contents):
+        self.contents = contents
+
+    def list_objects_v2(self, Bucket, Prefix):
+        return {"Contents": self.contents}
+
+class FakeStore:
+    def __init__(self, filenames):
+        self.filenames = filenames
+
+    def row_map(self):
+        return {f: i for i, f in enumerate(self.filenames)}
+
+@pytest.fixture
+def llm_animal(llm_animal, monkeypatch, cache):
+    monkeypatch.setattr(llm_animal, "analysis_cache", cache)
+    return llm_animal
+
+def test_crawled_legacy_key_is_reused_on_refresh(llm_animal, cache, monkeypatch):
+    monkeypatch.setattr(llm_animal, "get_s3_client", lambda: FakeS3([{"Key": KEY, "ETag": '"e1"'}]))
+    monkeypatch.setattr(llm_animal.vector_store, "read_current_version", lambda path: 1)
+    monkeypatch.setattr(llm_animal, "load_db", lambda db_file, mmap=True: FakeStore([KEY]))
+
+    def fail_analyze(*args, **kwargs):
+        raise AssertionError("analyze_s3_object가 호출되면 안 됨")
+    monkeypatch.setattr(llm_animal, "analyze_s3_object", fail_analyze)
+
+    crawl(cache, photo_sync.NOT_MODIFIED) # ◀ 기존 공고를 크롤러가 확인 (S3 키 기록 생성)
+    assert llm_animal.update_db_from_s3("crawled_data/", "db.json", "id_map.json") is True
+    assert cache.get_object(KEY)["etag"] == '"e1"'
+
+    cache.record_object(KEY, "h1", changed=False) # ◀ 다음 크롤링도 같은 사진
+    assert llm_animal.update_db_from_s3("crawled_data/", "db.json", "id_map.json") is True
+
+def test_failed_reanalysis_keeps_old_row_and_retries(llm_animal, cache, monkeypatch):
+    monkeypatch.setattr(llm_animal, "get_s3_client", lambda: FakeS3([{"Key": KEY, "ETag": '"e2"'}]))
+    monkeypatch.setattr(llm_animal.vector_store, "read_current_version", lambda path: 1)
+    monkeypatch.setattr(llm_animal, "load_db", lambda db_file, mmap=True: FakeStore([KEY]))
+    calls = []
+    monkeypatch.setattr(llm_animal, "analyze_s3_object", lambda s3_key, **kwargs: calls.append(s3_key))
+    saved = []
+    monkeypatch.setattr(llm_animal, "save_db", lambda *args: saved.append(args))
+
+    cache.mark_object_synced(KEY, '"e1"', image_hash="h1")
+    crawl(cache, photo_sync.UPLOADED, image_hash="h2") # ◀ 사진이 바뀜 → 재분석 대상
+    assert llm_animal.update_db_from_s3("crawled_data/", "db.json", "id_map.json") is True
+
+    assert calls == [KEY]
+    assert saved == [] # ◀ 기존 행을 그대로 유지 (추가 0, 삭제 0)
+    assert cache.object_changed(KEY, '"e2"') is True # ◀ 다음 갱신 때 다시 시도
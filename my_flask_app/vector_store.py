@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+# 속성별 임베딩 컬럼형(binary) 저장소
+# - 기존 dog_cat_features_attr_emb.json / missing_pets.json (속성 25개 x 3072 float를 indent=2 JSON으로 저장)을 대체
+# - 디렉터리 구조 (예: dog_cat_features_attr_emb.store/)
+#     CURRENT              ◀ 현재 버전 디렉터리 이름 (원자적으로 교체)
+#     v000003/meta.json    ◀ 파일명, attributes(LLM 분석 결과), 고정 ID, 속성 키 순서, dtype
+#     v000003/valid.npy    ◀ (N, A) bool, 속성 벡터 존재 여부
+#     v000003/attr_00.npy  ◀ (N, D) 속성별 L2 정규화 벡터 (float32 또는 float16, mmap 가능)
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from hybrid_rerank import PackedEmbeddings, pack_items
+
+STORE_SUFFIX = ".store"
+META_FILE = "meta.json"
+VALID_FILE = "valid.npy"
+CURRENT_FILE = "CURRENT"
+KEEP_VERSIONS = 2 # ◀ 읽는 중인 프로세스를 위해 직전 버전 1개는 남겨둠
+
+def store_path_for(db_file):
+    """
+    'missing_pets.json' -> 'missing_pets.store' 처럼 JSON DB 경로에 대응하는 저장소 경로를 반환합니다.
+    """
+    base, ext = os.path.splitext(db_file)
+    if ext.lower() == ".json":
+        return base + STORE_SUFFIX
+    return db_file + STORE_SUFFIX
+
+def _attr_file(a):
+    return f"attr_{a:02d}.npy"
+
+class VectorStore:
+    """
+    DB 아이템 N개의 메타데이터(파일명, attributes)와 속성별 임베딩 행렬(PackedEmbeddings) 묶음.
+    """
+
+    def __init__(self, filenames, attributes, packed, dtype="float32", version=None, ids=None, next_id=None):
+        self.filenames = list(filenames)
+        self.attributes = list(attributes)
+        self.packed = packed
+        self.dtype = dtype
+        self.version = version
+        # ◀◀ [신규] FAISS 인덱스용 고정 정수 ID (행 순서가 바뀌어도 항목별로 유지됨)
+        self.ids = np.arange(len(self.filenames), dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64)
+        if next_id is None:
+            next_id = int(self.ids.max()) + 1 if len(self.ids) else 0
+        self.next_id = int(next_id)
+        self._row_of_id = None
+
+    def __len__(self):
+        return len(self.filenames)
+
+    @property
+    def keys(self):
+        return self.packed.keys
+
+    def item(self, row):
+        """
+        기존 JSON DB 아이템과 같은 모양의 메타데이터 딕셔너리를 반환합니다. (임베딩 제외)
+        """
+        return {"filename": self.filenames[row], "attributes": self.attributes[row]}
+
+    def row_map(self):
+        return {filename: row for row, filename in enumerate(self.filenames)}
+
+    def rows_for_ids(self, ids):
+        """
+        FAISS가 반환한 고정 ID 배열을 행 번호 리스트로 변환합니다. (-1 또는 모르는 ID는 -1)
+        """
+        if self._row_of_id is None:
+            self._row_of_id = {int(i): row for row, i in enumerate(self.ids)}
+        return [self._row_of_id.get(int(i), -1) for i in ids]
+
+    def merged_vectors(self):
+        """
+        '__merged__' 벡터 행렬(float32)과 유효 마스크를 반환합니다. (FAISS 인덱스 생성용)
+        """
+        a = self.packed.keys.index("__merged__")
+        return np.asarray(self.packed.vectors["__merged__"], dtype=np.float32), self.packed.valid[:, a]
+
+    def nbytes(self):
+        return sum(m.nbytes for m in self.packed.vectors.values()) + self.packed.valid.nbytes
+
+    # --- 생성 / 조합 ---
+    @classmethod
+    def from_items(cls, items, keys, dim, dtype="float32", first_id=0):
+        """
+        기존 JSON DB 아이템 리스트(attr_embeddings 포함)로부터 저장소를 만듭니다.
+        (고정 ID는 first_id부터 순서대로 부여)
+        """
+        packed = pack_items(items, keys, dim, dtype=np.dtype(dtype))
+        ids = np.arange(first_id, first_id + len(items), dtype=np.int64)
+        return cls([it["filename"] for it in items], [it.get("attributes", {}) for it in items], packed, dtype,
+                   ids=ids, next_id=first_id + len(items))
+
+    @classmethod
+    def empty(cls, keys, dim, dtype="float32"):
+        return cls.from_items([], keys, dim, dtype)
+
+    def take(self, rows):
+        """
+        지정한 행(rows)만 골라 새 저장소를 만듭니다. (순서 유지, 배열은 복사됨)
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        packed = PackedEmbeddings(
+            self.packed.keys,
+            {k: np.asarray(m[rows]) for k, m in self.packed.vectors.items()},
+            np.asarray(self.packed.valid[rows])
+        )
+        return VectorStore([self.filenames[r] for r in rows], [self.attributes[r] for r in rows], packed, self.dtype,
+                           ids=self.ids[rows], next_id=self.next_id)
+
+    @classmethod
+    def concat(cls, stores):
+        """
+        속성 키 순서가 같은 저장소들을 이어 붙입니다.
+        """
+        keys = stores[0].keys
+        dtype = stores[0].dtype
+        for st in stores[1:]:
+            if st.keys != keys:
+                raise ValueError("속성 키 순서가 다른 저장소는 합칠 수 없습니다.")
+        packed = PackedEmbeddings(
+            keys,
+            {k: np.concatenate([np.asarray(st.packed.vectors[k], dtype=np.dtype(dtype)) for st in stores]) for k in keys},
+            np.concatenate([st.packed.valid for st in stores])
+        )
+        filenames = [f for st in stores for f in st.filenames]
+        attributes = [a for st in stores for a in st.attributes]
+        ids = np.concatenate([st.ids for st in stores])
+        if len(np.unique(ids)) != len(ids):
+            raise ValueError("합치려는 저장소들 사이에 중복된 고정 ID가 있습니다.")
+        return cls(filenames, attributes, packed, dtype, ids=ids, next_id=max(st.next_id for st in stores))
+
+    # --- 저장 / 로드 ---
+    def save(self, store_path):
+        """
+        새 버전 디렉터리에 모두 쓴 뒤 CURRENT 파일을 원자적으로 교체합니다.
+        (쓰는 도중 다른 프로세스가 읽어도 항상 완전한 이전/새 버전 중 하나를 보게 됨)
+        """
+        os.makedirs(store_path, exist_ok=True)
+        current = read_current_version(store_path)
+        next_num = int(current[1:]) + 1 if current else 1
+        version = f"v{next_num:06d}"
+        version_dir = os.path.join(store_path, version)
+        if os.path.exists(version_dir):
+            shutil.rmtree(version_dir)
+        os.makedirs(version_dir)
+
+        np_dtype = np.dtype(self.dtype)
+        for a, key in enumerate(self.keys):
+            np.save(os.path.join(version_dir, _attr_file(a)), np.asarray(self.packed.vectors[key], dtype=np_dtype))
+        np.save(os.path.join(version_dir, VALID_FILE), np.asarray(self.packed.valid, dtype=bool))
+
+        meta = {
+            "keys": self.keys,
+            "dtype": self.dtype,
+            "dim": int(next(iter(self.packed.vectors.values())).shape[1]),
+            "count": len(self),
+            "saved_at": time.time(),
+            "filenames": self.filenames,
+            "attributes": self.attributes,
+            "ids": [int(i) for i in self.ids],
+            "next_id": self.next_id,
+        }
+        with open(os.path.join(version_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        tmp_current = os.path.join(store_path, CURRENT_FILE + ".tmp")
+        with open(tmp_current, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(tmp_current, os.path.join(store_path, CURRENT_FILE))
+        self.version = version
+
+        _cleanup_old_versions(store_path, version)
+        return version
+
+    @classmethod
+    def load(cls, store_path, mmap=True):
+        """
+        현재 버전을 로드합니다. mmap=True이면 속성 행렬을 읽기 전용 메모리 맵으로 엽니다.
+        """
+        version = read_current_version(store_path)
+        if not version:
+            raise FileNotFoundError(f"저장소 '{store_path}'에 CURRENT 파일이 없습니다.")
+        version_dir = os.path.join(store_path, version)
+
+        with open(os.path.join(version_dir, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        mmap_mode = "r" if mmap else None
+        keys = meta["keys"]
+        vectors = {key: np.load(os.path.join(version_dir, _attr_file(a)), mmap_mode=mmap_mode) for a, key in enumerate(keys)}
+        valid = np.load(os.path.join(version_dir, VALID_FILE), mmap_mode=mmap_mode)
+        packed = PackedEmbeddings(keys, vectors, valid)
+        # (하위 호환) ID가 없는 이전 저장소는 행 번호를 ID로 사용
+        return cls(meta["filenames"], meta["attributes"], packed, meta.get("dtype", "float32"), version,
+                   ids=meta.get("ids"), next_id=meta.get("next_id"))
+
+def read_current_version(store_path):
+    try:
+        with open(os.path.join(store_path, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def _cleanup_old_versions(store_path, current_version):
+    versions = sorted(d for d in os.listdir(store_path)
+                      if d.startswith("v") and os.path.isdir(os.path.join(store_path, d)))
+    for old in versions[:-KEEP_VERSIONS]:
+        if old != current_version:
+            shutil.rmtree(os.path.join(store_path, old), ignore_errors=True)
+
+def load_json_items(db_file):
+    with open(db_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_db(db_file, keys, dim, mmap=True):
+    """
+    DB를 로드합니다. 컬럼형 저장소가 있으면 그것을, 없으면 기존 JSON을 읽어 메모리에서 변환합니다.
+    """
+    store_path = store_path_for(db_file)
+    if read_current_version(store_path):
+        return VectorStore.load(store_path, mmap=mmap)
+
+    print(f"⚠️ [저장소] '{store_path}'가 없어 기존 JSON '{db_file}'을(를) 읽습니다. (migrate 실행 권장)")
+    return VectorStore.from_items(load_json_items(db_file), keys, dim)
+
+def migrate_json_to_store(db_file, keys, dim, dtype="float32"):
+    """
+    기존 JSON DB를 컬럼형 저장소로 1회 변환합니다. (JSON 파일은 삭제하지 않음)
+    """
+    start_time = time.time()
+    items = load_json_items(db_file)
+    store = VectorStore.from_items(items, keys, dim, dtype)
+    store_path = store_path_for(db_file)
+    version = store.save(store_path)
+    json_size = os.path.getsize(db_file)
+    print(f"✅ [저장소 변환] '{db_file}' ({json_size/1e6:.1f}MB) -> '{store_path}/{version}' "
+          f"(벡터 {store.nbytes()/1e6:.1f}MB, {dtype}, {len(store)}개 항목, {time.time() - start_time:.1f}초)")
+    return store